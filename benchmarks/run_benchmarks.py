@@ -0,0 +1,319 @@
+"""
+Benchmarks of material construction, mixing, library I/O and export.
+
+Every benchmark runs on synthetic libraries (see synthetic_library.py) at
+each requested size and the timings are written to a JSON file, so that
+runs with different PyNE versions or code changes can be compared, e.g.
+
+    python run_benchmarks.py --sizes 100 10000 1000000 -o results.json
+"""
+import argparse
+import datetime
+import functools
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+import pyne
+
+from synthetic_library import HERE, synthetic_mat_data, synthetic_mixtures
+
+import binary_library  # noqa: E402
+import exporters  # noqa: E402
+import material_db_tools as mdbt  # noqa: E402
+from library_io import LazyMaterialLibrary  # noqa: E402
+
+
+def timed(name, size, items, func, repeat):
+    """
+    Times a benchmark, keeping the best of `repeat` runs.
+
+    Arguments:
+        name (str): name of the benchmark.
+        size (int): size of the synthetic library.
+        items (int): number of materials the benchmark processes.
+        func (callable): benchmark body, called without arguments.
+        repeat (int): number of runs.
+    """
+    times = []
+    for _ in range(repeat):
+        mdbt.expansion_cache.clear()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    seconds = min(times)
+    print(f"   {name:28s} {size:>9d} {seconds:12.4f} s")
+    return {
+        "benchmark": name,
+        "size": size,
+        "items": items,
+        "seconds": seconds,
+        "seconds_per_item": seconds / max(items, 1),
+        "runs": times,
+    }
+
+
+def _remove(*filenames):
+    for filename in filenames:
+        if os.path.exists(filename):
+            os.remove(filename)
+
+
+# number of materials the synthetic mixtures draw their constituents from,
+# like the pure library the real mixtures are made of
+MIX_POOL_SIZE = 100
+
+
+class SyntheticInputs(object):
+    """
+    Inputs of the benchmarks at one library size. Each input is built the
+    first time a selected benchmark needs it, so --only runs build only
+    what they use.
+    """
+
+    def __init__(self, size, workdir):
+        self.size = size
+        self.path = os.path.join(workdir, f"synthetic{size}")
+
+    @functools.cached_property
+    def entries(self):
+        return synthetic_mat_data(self.size)
+
+    @functools.cached_property
+    def nucvec(self):
+        return [entry for entry in self.entries.values() if "atom_frac" not in entry]
+
+    @functools.cached_property
+    def atom(self):
+        return [entry for entry in self.entries.values() if "atom_frac" in entry]
+
+    @functools.cached_property
+    def mat_lib(self):
+        return self._library(self.entries)
+
+    @functools.cached_property
+    def pool_lib(self):
+        return self._library(synthetic_mat_data(min(self.size, MIX_POOL_SIZE)))
+
+    @functools.cached_property
+    def mixtures(self):
+        return synthetic_mixtures(list(self.pool_lib.keys()), self.size)
+
+    @functools.cached_property
+    def json_file(self):
+        json_file = self.path + ".json"
+        self.mat_lib.write_json(json_file)
+        return json_file
+
+    @staticmethod
+    def _library(entries):
+        mat_lib = mdbt.MaterialLibrary()
+        for name, mat in mdbt.build_materials(entries).items():
+            mat_lib[name] = mat
+        return mat_lib
+
+
+def run_size(size, workdir, repeat, only=None):
+    """
+    Runs every benchmark, or the benchmarks named in `only`, on a synthetic
+    library of the given size.
+    """
+    inputs = SyntheticInputs(size, workdir)
+    path = inputs.path
+    json_file = path + ".json"
+    # name: (inputs needed, number of items, benchmark body)
+    benchmarks = {
+        "make_mat": (
+            ["nucvec"],
+            lambda: len(inputs.nucvec),
+            lambda: [
+                mdbt.make_mat(e["nucvec"], e["density"], e["citation"])
+                for e in inputs.nucvec
+            ],
+        ),
+        "make_mat_from_atom": (
+            ["atom"],
+            lambda: len(inputs.atom),
+            lambda: [
+                mdbt.make_mat_from_atom(e["atom_frac"], e["density"], e["citation"])
+                for e in inputs.atom
+            ],
+        ),
+        "mix_by_volume": (
+            ["pool_lib", "mixtures"],
+            lambda: len(inputs.mixtures),
+            lambda: [
+                mdbt.mix_by_volume(
+                    inputs.pool_lib, m["vol_fracs"], m["mixture_citation"]
+                )
+                for m in inputs.mixtures.values()
+            ],
+        ),
+        "mix_by_volume_batch": (
+            ["pool_lib", "mixtures"],
+            lambda: len(inputs.mixtures),
+            lambda: mdbt.mix_by_volume_batch(inputs.pool_lib, inputs.mixtures),
+        ),
+        "json_save": (
+            ["mat_lib"],
+            lambda: size,
+            lambda: (_remove(json_file), inputs.mat_lib.write_json(json_file)),
+        ),
+        "json_load": (
+            ["json_file"],
+            lambda: size,
+            lambda: mdbt.MaterialLibrary().from_json(inputs.json_file),
+        ),
+        "json_load_lazy": (
+            ["json_file"],
+            lambda: size,
+            lambda: (
+                _remove(inputs.json_file + ".index"),
+                LazyMaterialLibrary(inputs.json_file),
+            ),
+        ),
+        "export_mcnp": (
+            ["mat_lib"],
+            lambda: size,
+            lambda: exporters.write_mcnp(
+                inputs.mat_lib.items(),
+                path + "_mcnpAtomfrac.txt",
+                path + "_mcnpMassfrac.txt",
+            ),
+        ),
+        "export_openmc": (
+            ["mat_lib"],
+            lambda: size,
+            lambda: inputs.mat_lib.write_openmc(path + "_openmc.xml"),
+        ),
+        "export_alara": (
+            ["mat_lib"],
+            lambda: size,
+            lambda: (
+                _remove(path + "_alara.txt"),
+                [
+                    mat.write_alara(path + "_alara.txt")
+                    for _, mat in inputs.mat_lib.items()
+                ],
+            ),
+        ),
+        "export_json_per_material": (
+            ["mat_lib"],
+            lambda: size,
+            lambda: [
+                mat.write_json(os.path.join(workdir, "permat.json"))
+                for _, mat in inputs.mat_lib.items()
+            ],
+        ),
+        "export_hdf5": (
+            ["mat_lib"],
+            lambda: size,
+            lambda: (
+                _remove(path + ".h5"),
+                inputs.mat_lib.write_hdf5(path + ".h5"),
+            ),
+        ),
+        "export_binary": (
+            ["mat_lib"],
+            lambda: size,
+            lambda: binary_library.write_binary_library(
+                inputs.mat_lib, path + ".fmdb"
+            ),
+        ),
+        "export_all_concurrent": (
+            ["mat_lib"],
+            lambda: size,
+            lambda: exporters.export_library(
+                inputs.mat_lib,
+                exporters.output_filenames(
+                    path + "_all",
+                    [
+                        fmt
+                        for fmt in exporters.EXPORT_FORMATS
+                        if fmt != "json_materials"
+                    ],
+                ),
+            ),
+        ),
+    }
+
+    results = []
+    for name, (needs, items, func) in benchmarks.items():
+        if only and name not in only:
+            continue
+        # inputs are built before the clock starts
+        for need in needs:
+            getattr(inputs, need)
+        results.append(timed(name, size, items(), func, repeat))
+    return results
+
+
+def environment():
+    """
+    Describes the environment the benchmarks ran in.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=HERE,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "pyne": pyne.__version__,
+        "numpy": np.__version__,
+        "nuclear_data": mdbt.nuclear_data_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the material tools on synthetic libraries"
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[100, 10000],
+        help="Numbers of materials in the synthetic libraries, "
+        "e.g. 100 10000 1000000",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="Runs per benchmark, best is kept"
+    )
+    parser.add_argument(
+        "--only", nargs="+", help="Names of the benchmarks to run (default: all)"
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="bench_results.json",
+        help="JSON file the results are written to",
+    )
+    args = parser.parse_args()
+
+    report = {"environment": environment(), "results": []}
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            print(f"\n Benchmarking synthetic library of {size} materials...")
+            report["results"] += run_size(size, workdir, args.repeat, args.only)
+
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+    print(f"\n Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
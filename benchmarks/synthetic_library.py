@@ -0,0 +1,77 @@
+"""
+Generator of synthetic material definitions for benchmarking.
+
+Synthetic entries are modeled on the real mat_data entries of
+createPurematlib.py: each one copies a real entry, perturbs its fractions
+and density by a few percent and gets a unique name. Synthetic mixtures
+draw two to five constituents from a pool of materials with random volume
+fractions.
+"""
+import os
+import sys
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "material-db-tools"))
+sys.path.insert(0, os.path.join(HERE, "..", "pureMaterials"))
+
+from createPurematlib import mat_data  # noqa: E402
+
+
+def synthetic_mat_data(size, seed=0, spread=0.05):
+    """
+    Generates synthetic mat_data entries.
+
+    Arguments:
+        size (int): number of entries to generate.
+        seed (int): seed of the random generator, so runs are repeatable.
+        spread (float): maximum relative perturbation of the fractions and
+            density. Defaults to 0.05.
+
+    Returns:
+        synthetic (dict): dictionary of entries in the format of mat_data.
+    """
+    rng = np.random.default_rng(seed)
+    bases = list(mat_data.items())
+    synthetic = {}
+    for index in range(size):
+        base_name, base = bases[index % len(bases)]
+        field = "atom_frac" if "atom_frac" in base else "nucvec"
+        factors = 1.0 + spread * rng.uniform(-1.0, 1.0, len(base[field]) + 1)
+        synthetic[f"{base_name}_syn{index}"] = {
+            field: {
+                key: frac * factor
+                for (key, frac), factor in zip(base[field].items(), factors)
+            },
+            "density": base["density"] * factors[-1],
+            "citation": base["citation"],
+        }
+    return synthetic
+
+
+def synthetic_mixtures(material_names, size, seed=0):
+    """
+    Generates synthetic mixture definitions in the format of the mat_data
+    of mixPureFusionMaterials.py
+
+    Arguments:
+        material_names (list of str): names of the materials to mix, a pool
+            of fixed size so that the mixing matrices stay bounded at any
+            number of mixtures.
+        size (int): number of mixtures to generate.
+        seed (int): seed of the random generator.
+    """
+    rng = np.random.default_rng(seed)
+    mixtures = {}
+    for index in range(size):
+        count = rng.integers(2, min(5, len(material_names)) + 1)
+        chosen = rng.choice(len(material_names), count, replace=False)
+        fracs = rng.dirichlet(np.ones(count))
+        mixtures[f"mix_syn{index}"] = {
+            "vol_fracs": {
+                material_names[col]: float(frac) for col, frac in zip(chosen, fracs)
+            },
+            "mixture_citation": "synthetic",
+        }
+    return mixtures
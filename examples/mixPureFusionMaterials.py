@@ -1,7 +1,9 @@
 
 import os
 
-import material_db_tools as mdbt
+from instrumentation import profiler
+from library_io import LazyMaterialLibrary, write_property_index
+from mix_graph import remix
 
 mat_data = {}
 
@@ -193,19 +195,21 @@ def main():
     except:
         pass
 
-    # Load material library
-    mat_lib = mdbt.MaterialLibrary()
-    mat_lib.from_json("../pureMaterials/PureFusionMaterials_libv1.json")
+    # Load material library, building only the materials that get mixed
+    mat_lib = LazyMaterialLibrary("../pureMaterials/PureFusionMaterials_libv1.json")
 
-    # create material library object
-    mixmat_lib = mdbt.MaterialLibrary()
-    for mat_name, mat_input in mat_data.items():
-        mixmat_lib[mat_name] = mdbt.mix_by_volume(
-            mat_lib, mat_input["vol_fracs"], mat_input["mixture_citation"]
-        )
+    # mix in dependency order, re-mixing only what changed since the last run
+    mixmat_lib, remixed = remix(
+        mat_lib, mat_data, "mixedPureFusionMats_libv1.state.json"
+    )
+    print(f"Re-mixed {len(remixed)} of {len(mat_data)} mixtures")
 
     # write fnsf material library
-    mixmat_lib.write_json("mixedPureFusionMats_libv1.json")
+    with profiler.stage("write_json"):
+        mixmat_lib.write_json("mixedPureFusionMats_libv1.json")
+    with profiler.stage("write_property_index"):
+        write_property_index(mixmat_lib, "mixedPureFusionMats_libv1.json")
+    profiler.finish()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,214 @@
+"""
+Compact, memory-mappable binary format for material libraries.
+
+The file holds the compositions of all materials in compressed sparse row
+(CSR) form so that a reader can map the file and use its arrays directly,
+without parsing or copying. Many processes mapping the same file share one
+copy of it in memory.
+
+Layout, little endian, every section aligned to 8 bytes:
+
+    header      magic b"FMDBLIB1" followed by 10 uint64: number of
+                materials, number of nuclides, number of composition
+                entries, and the byte offsets of the nuclides, offsets,
+                indices, fractions, properties and metadata sections, then
+                the metadata length in bytes
+    nuclides    int64[n_nuclides], sorted nuclide ids
+    offsets     int64[n_materials + 1], entries of material i are
+                offsets[i]:offsets[i + 1]
+    indices     int32[n_entries], column of each entry in nuclides
+    fractions   float64[n_entries], mass fraction of each entry
+    properties  float64[n_materials, 3], density, mass and
+                atoms_per_molecule of each material
+    metadata    UTF-8 JSON with the material names and the metadata
+                (citation, mat_number, ...) of each material
+"""
+import json
+import mmap
+import struct
+from collections.abc import Mapping
+
+import numpy as np
+
+MAGIC = b"FMDBLIB1"
+_HEADER = struct.Struct("<8s10Q")
+
+
+def _align(position):
+    return (position + 7) // 8 * 8
+
+
+def write_binary_library(material_library, filename):
+    """
+    Writes a material library in the binary library format.
+
+    Arguments:
+        material_library (PyNE material library or mapping): library to
+            write.
+        filename (str): name of the binary library file.
+
+    Returns:
+        count (int): number of materials written.
+    """
+    names = []
+    comps = []
+    properties = []
+    metadata = []
+    for key, mat in material_library.items():
+        names.append(key.decode("utf8") if isinstance(key, bytes) else key)
+        comps.append(sorted(mat.comp.items()))
+        properties.append((mat.density, mat.mass, mat.atoms_per_molecule))
+        metadata.append({k: mat.metadata[k] for k in mat.metadata.keys()})
+
+    nucids = np.array(sorted({nuc for comp in comps for nuc, _ in comp}), np.int64)
+    columns = {nuc: col for col, nuc in enumerate(nucids.tolist())}
+    offsets = np.zeros(len(comps) + 1, np.int64)
+    offsets[1:] = np.cumsum([len(comp) for comp in comps])
+    indices = np.array(
+        [columns[nuc] for comp in comps for nuc, _ in comp], np.int32
+    )
+    fractions = np.array([frac for comp in comps for _, frac in comp], np.float64)
+    properties = np.array(properties, np.float64).reshape(len(names), 3)
+    meta = json.dumps({"names": names, "metadata": metadata}).encode("utf8")
+
+    sections = [nucids, offsets, indices, fractions, properties]
+    starts = []
+    position = _HEADER.size
+    for section in sections:
+        position = _align(position)
+        starts.append(position)
+        position += section.nbytes
+    meta_start = _align(position)
+
+    with open(filename, "wb") as lib_file:
+        lib_file.write(
+            _HEADER.pack(
+                MAGIC,
+                len(names),
+                len(nucids),
+                len(indices),
+                *starts,
+                meta_start,
+                len(meta),
+            )
+        )
+        for start, section in zip(starts + [meta_start], sections + [meta]):
+            lib_file.write(b"\0" * (start - lib_file.tell()))
+            lib_file.write(
+                section if isinstance(section, bytes) else section.tobytes()
+            )
+    return len(names)
+
+
+class BinaryMaterialLibrary(Mapping):
+    """
+    Read only material library backed by a memory mapped binary library
+    file. The nuclides, offsets, indices, fractions and properties
+    attributes are zero-copy numpy views of the file. PyNE materials are
+    built only when a material is accessed by name.
+
+    Lifetime: materials and compositions returned by the library are
+    copies and stay valid after close(). The array attributes are views of
+    the map; close() drops the library's references to them, and the file
+    is unmapped once no other reference to a view remains. Views kept by
+    the caller therefore stay readable after close().
+
+    Arguments:
+        filename (str): name of the binary library file.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, "rb") as lib_file:
+            self._mmap = mmap.mmap(lib_file.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            n_materials,
+            n_nuclides,
+            n_entries,
+            nuclides_start,
+            offsets_start,
+            indices_start,
+            fractions_start,
+            properties_start,
+            meta_start,
+            meta_length,
+        ) = _HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError(f"{filename} is not a binary material library")
+
+        def view(dtype, count, start):
+            return np.frombuffer(self._mmap, dtype, count, start)
+
+        self.nuclides = view("<i8", n_nuclides, nuclides_start)
+        self.offsets = view("<i8", n_materials + 1, offsets_start)
+        self.indices = view("<i4", n_entries, indices_start)
+        self.fractions = view("<f8", n_entries, fractions_start)
+        self.properties = view("<f8", 3 * n_materials, properties_start).reshape(
+            n_materials, 3
+        )
+        meta = json.loads(self._mmap[meta_start : meta_start + meta_length])
+        self.names = meta["names"]
+        self.metadata = meta["metadata"]
+        self._rows = {name: row for row, name in enumerate(self.names)}
+
+    @property
+    def density(self):
+        return self.properties[:, 0]
+
+    def _row(self, key):
+        return self._rows[key.decode("utf8") if isinstance(key, bytes) else key]
+
+    def composition(self, key):
+        """
+        Returns the composition of a material, copied out of the map.
+
+        Returns:
+            nucids (numpy array of int): nuclide ids.
+            fractions (numpy array of float): mass fractions.
+        """
+        row = self._row(key)
+        entries = slice(self.offsets[row], self.offsets[row + 1])
+        return self.nuclides[self.indices[entries]], self.fractions[entries].copy()
+
+    def __getitem__(self, key):
+        from pyne.material import Material
+
+        row = self._row(key)
+        nucids, fractions = self.composition(key)
+        density, mass, atoms_per_molecule = self.properties[row].tolist()
+        mat = Material()
+        mat.comp = dict(zip(nucids.tolist(), fractions.tolist()))
+        mat.mass = mass
+        mat.density = density
+        mat.atoms_per_molecule = atoms_per_molecule
+        for meta_key, value in self.metadata[row].items():
+            mat.metadata[meta_key] = value
+        return mat
+
+    def __contains__(self, key):
+        return (key.decode("utf8") if isinstance(key, bytes) else key) in self._rows
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def close(self):
+        # the map can only be closed once every view of it is released,
+        # otherwise it is unmapped when the last view is garbage collected
+        self.nuclides = self.offsets = self.indices = None
+        self.fractions = self.properties = None
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+
+from library_io import material_from_record, material_to_record
+from material_db_tools import nuclear_data_version
+
+
+def _canonical(value):
+    """
+    Converts a mat_data entry into a json serializable form that does not
+    depend on dictionary order. Material keys, such as enriched Li, are
+    replaced by their composition and density.
+    """
+    from pyne.material import Material
+
+    if isinstance(value, Material):
+        return {
+            "comp": sorted(value.comp.items()),
+            "density": value.density,
+            "mass": value.mass,
+        }
+    if isinstance(value, dict):
+        return sorted(
+            json.dumps([_canonical(key), _canonical(item)])
+            for key, item in value.items()
+        )
+    return value
+
+
+def entry_hash(mat_input, data_version):
+    """
+    Returns the content hash of a mat_data entry built with a given nuclear
+    data version.
+    """
+    content = json.dumps([_canonical(mat_input), data_version])
+    return hashlib.sha256(content.encode("utf8")).hexdigest()
+
+
+class BuildCache(object):
+    """
+    Cache of built materials keyed on a hash of their mat_data entry and the
+    nuclear data version, kept in a JSON file next to the library. Only the
+    entries that changed since the last build need to be re-expanded.
+
+    Arguments:
+        filename (str): name of the cache file. It is created on save if it
+            does not exist. Defaults to None, in which case nothing is read or
+            saved and every material is rebuilt.
+    """
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.data_version = nuclear_data_version()
+        self.modified = False
+        self._entries = {}
+        if filename is not None and os.path.exists(filename):
+            with open(filename) as cache_file:
+                cached = json.load(cache_file)
+            if cached.get("nuclear_data") == self.data_version:
+                self._entries = cached["materials"]
+            else:
+                self.modified = True
+
+    def get(self, name, mat_input):
+        """
+        Returns the cached material for a mat_data entry, or None if the
+        entry is new or changed.
+        """
+        entry = self._entries.get(name)
+        if entry is None or entry["hash"] != entry_hash(
+            mat_input, self.data_version
+        ):
+            return None
+        return material_from_record(entry["record"])
+
+    def put(self, name, mat_input, mat):
+        """
+        Stores a freshly built material. Call before adding the material to
+        a library so the record holds only its own metadata.
+        """
+        self._entries[name] = {
+            "hash": entry_hash(mat_input, self.data_version),
+            "record": material_to_record(mat),
+        }
+        self.modified = True
+
+    def prune(self, names):
+        """
+        Drops the materials that are no longer defined and keeps the others
+        in definition order, which sets their mat_number in the library.
+        """
+        entries = {
+            name: self._entries[name] for name in names if name in self._entries
+        }
+        if list(entries) != list(self._entries):
+            self.modified = True
+        self._entries = entries
+
+    def save(self):
+        if self.filename is None:
+            return
+        with open(self.filename, "w") as cache_file:
+            json.dump(
+                {"nuclear_data": self.data_version, "materials": self._entries},
+                cache_file,
+            )
+        self.modified = False
@@ -5,11 +5,138 @@
 #
 #
 import argparse
+import fnmatch
+import json
+import sys
 
 # from pyne import nuc_data # import the pre-built materials database for testing (this causes some file path name trouble so comment out)
-from pyne.material_library import (
-    MaterialLibrary,
-)  # import the material library class from the new location in recent versions of pyne
+# PyNE is only imported when a material is built or an h5 library is read, so
+# listing and querying a JSON library with a property index works without it
+import exporters
+import xs_filter
+from instrumentation import profiler
+from library_io import (
+    RANGE_PROPERTIES,
+    LazyMaterialLibrary,
+    filter_property_index,
+    material_properties,
+    read_property_index,
+)
+
+
+def matname(matkey):
+    # library keys are bytes in older versions of pyne
+    return matkey.decode("utf8") if isinstance(matkey, bytes) else matkey
+
+
+# properties available in query mode; densities in g/cm3 and atoms/b-cm
+QUERY_PROPERTIES = {
+    "mass_density": lambda mat: mat.mass_density(),
+    "atom_density": lambda mat: mat.number_density() / 1.0e24,
+    "molecular_mass": lambda mat: mat.molecular_mass(),
+    "mcnp_atom": lambda mat: mat.mcnp("atom"),
+    "mcnp_mass": lambda mat: mat.mcnp(),
+    "openmc": lambda mat: mat.openmc(),
+}
+
+# metadata available in query mode, read without building the material
+METADATA_PROPERTIES = (
+    "citation",
+    "mixture_citation",
+    "constituent_citation",
+    "mat_number",
+)
+
+
+def material_metadata(matllib, name):
+    if hasattr(matllib, "metadata"):
+        return matllib.metadata(name)
+    mat = matllib[name]
+    return {key: mat.metadata[key] for key in mat.metadata.keys()}
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return " {:14.6e}".format(value)
+    return " {:>14}".format(value)
+
+
+def query_names(matllib, patterns):
+    """
+    Returns the names of the materials matching any of the names or glob
+    patterns, in library order, and the patterns that matched nothing.
+    """
+    names = [matname(matkey) for matkey in matllib.keys()]
+    matched = []
+    unmatched = []
+    for pattern in patterns:
+        hits = [name for name in names if fnmatch.fnmatchcase(name, pattern)]
+        if not hits:
+            unmatched.append(pattern)
+        matched += hits
+    return list(dict.fromkeys(matched)), unmatched
+
+
+def query_materials(
+    matllib, patterns, properties, output_format, out, propindex=None, ranges=None
+):
+    """
+    Writes the requested properties of every material matching the
+    patterns and property ranges, as a table or as JSON lines. Properties
+    found in the property index are not recomputed and metadata is read
+    without building materials.
+
+    Returns:
+        names (list of str): names of the materials written.
+        unmatched (list of str): patterns that matched no material.
+    """
+    names, unmatched = query_names(matllib, patterns)
+    if ranges:
+        summary = propindex or {
+            name: material_properties(matllib[name]) for name in names
+        }
+        names = list(
+            filter_property_index(
+                {name: summary[name] for name in names}, ranges=ranges
+            )
+        )
+    scalars = [
+        prop for prop in properties if not prop.startswith(("mcnp", "openmc"))
+    ]
+    if output_format == "table":
+        out.write(
+            "{:24s}".format("name")
+            + "".join(" {:>14s}".format(prop) for prop in scalars)
+            + "\n"
+        )
+    computed = [prop for prop in properties if prop in QUERY_PROPERTIES]
+    for name in names:
+        values = {}
+        if len(computed) < len(properties):
+            metadata = material_metadata(matllib, name)
+            values = {
+                prop: metadata.get(prop, "")
+                for prop in properties
+                if prop in METADATA_PROPERTIES
+            }
+        if propindex and all(prop in propindex[name] for prop in computed):
+            values.update({prop: propindex[name][prop] for prop in computed})
+        elif computed:
+            mat = matllib[name]
+            values.update({prop: QUERY_PROPERTIES[prop](mat) for prop in computed})
+        if output_format == "jsonl":
+            out.write(json.dumps(dict(name=name, **values)) + "\n")
+            continue
+        out.write(
+            "{:24s}".format(name)
+            + "".join(format_value(values[prop]) for prop in scalars)
+            + "\n"
+        )
+        for prop in properties:
+            if prop not in scalars:
+                out.write(values[prop])
+    return names, unmatched
+
 
 #
 #
@@ -57,7 +184,107 @@ parser.add_argument(
     help="Write out the library in pyne h5m format using default datapath,nucpath",
     action="store_true",
 )
+parser.add_argument(
+    "-b",
+    "--writeBinary",
+    help="Write out the library in the memory-mappable binary library format",
+    action="store_true",
+)
+parser.add_argument(
+    "--writeOpenMCMass",
+    help="Write all materials in OpenMC matl format to mass fraction",
+    action="store_true",
+)
+parser.add_argument(
+    "-a",
+    "--writeAll",
+    help="Write the library in every format except individual json files",
+    action="store_true",
+)
+parser.add_argument(
+    "--prefix",
+    help="Name the output files like db-outputs, e.g. --prefix PureFusionMaterials "
+    "writes PureFusionMaterials_mcnpAtomfrac.txt",
+)
+parser.add_argument(
+    "--workers",
+    type=int,
+    help="Number of formats written at the same time (default: all of them)",
+)
+parser.add_argument(
+    "--processes",
+    help="Write the formats in worker processes instead of threads",
+    action="store_true",
+)
+parser.add_argument(
+    "--xs-library",
+    help="Map or remove the nuclides missing from this MCNP xsdir or OpenMC "
+    "cross_sections.xml file before writing",
+)
+parser.add_argument(
+    "--xs-suffix",
+    help="Library suffix of the xsdir tables to use, e.g. 80c",
+)
+parser.add_argument(
+    "--xs-remove",
+    help="Remove missing nuclides instead of mapping them to available ones",
+    action="store_true",
+)
+parser.add_argument(
+    "--xs-report",
+    help="Write every nuclide substitution to this CSV file",
+)
+parser.add_argument(
+    "-q",
+    "--query",
+    nargs="+",
+    metavar="NAME",
+    help="Print properties of the materials matching these names or glob patterns "
+    "without prompting, '-' reads names from stdin",
+)
+parser.add_argument(
+    "--properties",
+    nargs="+",
+    choices=list(QUERY_PROPERTIES) + list(METADATA_PROPERTIES),
+    default=["mass_density", "atom_density", "molecular_mass"],
+    help="Properties printed in query mode",
+)
+parser.add_argument(
+    "--range",
+    dest="ranges",
+    nargs=3,
+    action="append",
+    metavar=("PROPERTY", "MIN", "MAX"),
+    help="In query mode, keep only materials with MIN <= PROPERTY <= MAX, e.g. "
+    "--range mass_density 1 8 (use inf for an open bound). PROPERTY is one of "
+    + ", ".join(RANGE_PROPERTIES),
+)
+parser.add_argument(
+    "--format",
+    dest="output_format",
+    choices=["table", "jsonl"],
+    default="table",
+    help="Output format of query mode",
+)
 args = parser.parse_args()
+ranges = {}
+for prop, low, high in args.ranges or []:
+    if prop not in RANGE_PROPERTIES:
+        parser.error(
+            f"argument --range: invalid property {prop!r} "
+            f"(choose from {', '.join(RANGE_PROPERTIES)})"
+        )
+    try:
+        ranges[prop] = (float(low), float(high))
+    except ValueError:
+        parser.error(f"argument --range: invalid bounds {low!r} {high!r}")
+
+
+def log(*message):
+    # in query mode stdout carries only the query results
+    print(*message, file=sys.stderr if args.query else sys.stdout)
+
+
 #
 pynematdatabasefilein = (
     args.filenamein
@@ -66,10 +293,12 @@ pynematdatabasefilein = (
 )
 #
 #
-print("\n \n The pyne material database file is:", pynematdatabasefilein)
+log("\n \n The pyne material database file is:", pynematdatabasefilein)
 #
 # read in materials database from the input file
 if args.prebuilt:
+    from pyne.material_library import MaterialLibrary
+
     matllib = MaterialLibrary(
         lib=pynematdatabasefilein,
         datapath="/material_library/materials",
@@ -77,115 +306,148 @@ if args.prebuilt:
     )  # use specific datapath,nucpath
 else:
     if pynematdatabasefilein.lower().endswith('.json'):
-        matllib =MaterialLibrary()
-        matllib.from_json(pynematdatabasefilein)
+        # materials are only built when first used
+        matllib = LazyMaterialLibrary(pynematdatabasefilein)
     else:
+            # import the material library class from the new location in recent
+            # versions of pyne
+            from pyne.material_library import MaterialLibrary
+
             matllib = MaterialLibrary(
                 lib=pynematdatabasefilein)  # use default datapath,nucpath and assumes pyne format
 #
-print("\n The number of entries in the materials database: ", len(matllib))
+log("\n The number of entries in the materials database: ", len(matllib))
+propindex = read_property_index(pynematdatabasefilein)
 # print "Some entries in the materials database: ", matllib.keys()[0:7]
 # matllib.keys()[:7]
 #
-print("All the entries in the materials database: ")
-for matkey, matvalue in matllib.items():
-    print(
-        "   The key is: ",
-        matkey.decode("utf8"),
-        "The mass density is: ",
-        matllib[matkey].mass_density(),
-        "atom density",
-        "{:11.4e}".format(matllib[matkey].number_density() / 1.0e24),
+if args.query:
+    patterns = args.query
+    if "-" in patterns:
+        patterns = [p for p in patterns if p != "-"] + sys.stdin.read().split()
+    names, unmatched = query_materials(
+        matllib,
+        patterns,
+        args.properties,
+        args.output_format,
+        sys.stdout,
+        propindex,
+        ranges,
     )
-#
-# prompt for a entry from the material database to print out information
-input_string = input(
-    "\n Enter a material from the database to print out info: "
-)
-print("The material requested is: \n", input_string)
-#
-print("\n Printing some entries from the database...")
-print("   Material print of: ", input_string)
-print(
-    "            molecular mass: ",
-    matllib[input_string].molecular_mass(),
-    " mass density: ",
-    matllib[input_string].mass_density(),
-)
-print(
-    "\n An mcnp material print of input_string using mass fractions...\n",
-    matllib[input_string].mcnp(),
-)  # mass fraction is the default
-print(
-    "\n An mcnp material print of input_string using atom fractions...\n",
-    matllib[input_string].mcnp("atom"),
-)  # use atom fraction
-print(
-    "\n    Writing the same to a json file (testplayjson.txt) and mcnp format file (testplaymat_mcard.txt) using atom fractions...\n"
-)
-testmat = matllib[input_string]
-testmat.write_mcnp("testplaymcnp.txt", "atom")
-testmat.write_json("testplayjson.txt")
-#
-#
-# if requested, write all the materials in MCNP matl card format to a text file
-if args.writeMCNP:
-    print(
-        "\n Writing all the materials in MCNP matl card format to 2 text files (atom and mass frac format)... \n"
+    for pattern in unmatched:
+        log(" No material matches", pattern)
+    if not names and ranges:
+        log(" No material is in the requested ranges")
+else:
+    log("All the entries in the materials database: ")
+    if propindex is not None:
+        # the property index lists the library without building materials
+        for name, props in propindex.items():
+            log(
+                "   The key is: ",
+                name,
+                "The mass density is: ",
+                props["mass_density"],
+                "atom density",
+                "{:11.4e}".format(props["atom_density"]),
+            )
+    else:
+        for matkey, matvalue in matllib.items():
+            log(
+                "   The key is: ",
+                matname(matkey),
+                "The mass density is: ",
+                matvalue.mass_density(),
+                "atom density",
+                "{:11.4e}".format(matvalue.number_density() / 1.0e24),
+            )
+    #
+    # prompt for a entry from the material database to print out information
+    input_string = input(
+        "\n Enter a material from the database to print out info: "
     )
-    for matkey, matvalue in matllib.items():
-        print(
-            "   Writing ",
-            matkey.decode("utf8"),
-            "to a file (testplayallmat_mcnpxxx.txt) using MCNP format and atom/mass fractions...  \n",
-        )
-        testmat = matllib[matkey]
-        testmat.write_mcnp("testplayallmat_mcnpAtomfrac.txt", "atom")
-        testmat.write_mcnp("testplayallmat_mcnpMassfrac.txt")
-# if requested, write all the materials in OpenMC matl card format to a text file
-if args.writeOpenMC:
-    print(
-        "\n Writing all the materials in OpenMC material format by atom fraction... \n"
+    log("The material requested is: \n", input_string)
+    #
+    log("\n Printing some entries from the database...")
+    log("   Material print of: ", input_string)
+    log(
+        "            molecular mass: ",
+        matllib[input_string].molecular_mass(),
+        " mass density: ",
+        matllib[input_string].mass_density(),
     )
-    matllib.write_openmc('testplayall_openmcAtomfrac.xml')
-#
-# if requested, write all the materials in Alara matl card format to a text file
-if args.writeAlara:
-    print(
-        "\n Writing all the materials in Alara matl card format to a text file... \n"
+    log(
+        "\n An mcnp material print of input_string using mass fractions...\n",
+        matllib[input_string].mcnp(),
+    )  # mass fraction is the default
+    log(
+        "\n An mcnp material print of input_string using atom fractions...\n",
+        matllib[input_string].mcnp("atom"),
+    )  # use atom fraction
+    log(
+        "\n    Writing the same to a json file (testplayjson.txt) and mcnp format file (testplaymat_mcard.txt) using atom fractions...\n"
     )
-    for matkey, matvalue in matllib.items():
-        print(
-            "   Writing ",
-            matkey.decode("utf8"),
-            "to a file (testplayallmat_alara.txt) using Alara format ...  \n",
-        )
-        testmat = matllib[matkey]
-        testmat.write_alara("testplayallmat_alara.txt")
+    testmat = matllib[input_string]
+    testmat.write_mcnp("testplaymcnp.txt", "atom")
+    testmat.write_json("testplayjson.txt")
 #
-# if requested, write all the materials in Json matl card format to a text file
-if args.writeJson:
-    print(
-        "\n Writing all the materials in Json matl card format to a text file... \n"
-    )
-    for matkey, matvalue in matllib.items():
-        jsonFileName = matkey.decode("utf8") + ".json"
-        print(
-            "   Writing ",
-            matkey.decode("utf8"),
-            "to a file ",
-            jsonFileName,
-            " using Json format ...  \n",
-        )
-        testmat = matllib[matkey]
-        testmat.write_json(
-            jsonFileName
-        )  # doesn't append so only last material in list appears
 #
-# if requested, write the library with default datapath nucpath for uwuw workflow
-if args.writedefault:
-    print("\n Writing the library in pyne h5m format with default datapath,nucpath...")
-    matllib.write_hdf5(
-        "testlibdefaultpaths.h5"
-    )  # don't set datapath,nucpath...will be pyne default values
-print("\n \n All done!")
+# collect the requested formats and write them all concurrently
+if args.prefix:
+    defaults = exporters.output_filenames(args.prefix, exporters.EXPORT_FORMATS)
+else:
+    defaults = {
+        "mcnp": (
+            "testplayallmat_mcnpAtomfrac.txt",
+            "testplayallmat_mcnpMassfrac.txt",
+        ),
+        "openmc_atom": "testplayall_openmcAtomfrac.xml",
+        "openmc_mass": "testplayall_openmcMassfrac.xml",
+        "alara": "testplayallmat_alara.txt",
+        "json": "testplayall_libv1.json",
+        "json_materials": ".",
+        "hdf5": "testlibdefaultpaths.h5",
+        "binary": "testlibbinary.fmdb",
+    }
+requested = {
+    "mcnp": args.writeMCNP,
+    "openmc_atom": args.writeOpenMC,
+    "openmc_mass": args.writeOpenMCMass,
+    "alara": args.writeAlara,
+    "json": False,
+    "json_materials": args.writeJson,
+    "hdf5": args.writedefault,
+    "binary": args.writeBinary,
+}
+outputs = {
+    fmt: defaults[fmt]
+    for fmt, wanted in requested.items()
+    if wanted or (args.writeAll and fmt != "json_materials")
+}
+if outputs and args.xs_library:
+    available = xs_filter.availability_index(args.xs_library, args.xs_suffix)
+    matllib, report = xs_filter.filter_library(
+        matllib, available, mode="remove" if args.xs_remove else "map"
+    )
+    log("\n", len(report), "nuclide substitutions for", args.xs_library)
+    xs_filter.print_summary(report, sys.stderr if args.query else sys.stdout)
+    if args.xs_report:
+        xs_filter.write_report(report, args.xs_report)
+if outputs:
+    log(
+        "\n Writing all the materials in",
+        len(outputs),
+        "formats concurrently...",
+    )
+    counts = exporters.export_library(
+        matllib, outputs, args.workers, args.processes
+    )
+    for fmt, filename in outputs.items():
+        if isinstance(filename, tuple):
+            filename = " and ".join(filename)
+        log("   Wrote ", counts[fmt], "materials to", filename, "(" + fmt + ")")
+log("\n \n All done!")
+# with FMDB_PROFILE set, the profile summary goes with the other messages
+profiler.finish(sys.stderr if args.query else sys.stdout)
+if args.query and (unmatched or not names):
+    sys.exit(1)
@@ -0,0 +1,270 @@
+"""
+Deduplication of materials with equivalent compositions.
+
+Materials whose mass fractions all agree within an absolute tolerance and
+whose densities agree within a relative tolerance are merged into one
+shared material, and an alias map records which material each merged name
+now refers to. The representative of a group is its first material in
+library order; it lists the names merged into it in an "aliases" metadata
+entry.
+
+Grouping works in two passes. Compositions are first hashed after
+rounding to the tolerances, which groups the bulk of the duplicates in
+linear time, e.g. from mesh homogenization. The representatives of the
+hashed groups are then compared with each other, vectorized over a density
+window, to merge duplicates that rounding put in neighbouring groups.
+
+Usage:
+    python dedup.py mixedPureFusionMats_libv1.json deduplicated.json \
+        --aliases aliases.json --reference PureFusionMaterials_libv1.json
+
+With --reference, materials equivalent to a reference material are aliased
+to it and left out of the output, e.g. pass-through mixtures that only
+re-wrap a pure material.
+"""
+import argparse
+import bisect
+import json
+import math
+
+import numpy as np
+
+from library_io import (
+    JsonLibraryWriter,
+    LazyMaterialLibrary,
+    material_from_record,
+    material_to_record,
+)
+
+
+def _signature(comp, density, atol, density_rtol):
+    """
+    Returns a hashable key of a composition and density rounded to the
+    tolerances.
+    """
+    total = sum(comp.values())
+    fractions = tuple(
+        sorted(
+            (nuc, steps)
+            for nuc, steps in (
+                (nuc, round(frac / total / atol)) for nuc, frac in comp.items()
+            )
+            if steps != 0
+        )
+    )
+    if density > 0:
+        density = round(math.log(density) / math.log1p(density_rtol))
+    return density, fractions
+
+
+def cluster_compositions(comps, densities, atol=1e-6, density_rtol=1e-6):
+    """
+    Groups equivalent compositions.
+
+    Arguments:
+        comps (list of dict): compositions, mass fractions keyed by nuclide
+            id or name. Normalized before comparison.
+        densities (sequence of float): density of each composition.
+        atol (float): largest difference of any mass fraction between
+            equivalent compositions.
+        density_rtol (float): largest relative difference of the densities
+            of equivalent compositions.
+
+    Returns:
+        representative (numpy array of int): index of the representative
+            of the group of each composition, the smallest index in the
+            group.
+    """
+    n = len(comps)
+    densities = np.asarray(densities, dtype=float)
+
+    # pass 1: hash the rounded compositions
+    leaders = {}
+    leader = np.empty(n, dtype=np.int64)
+    for index, (comp, density) in enumerate(zip(comps, densities)):
+        key = _signature(comp, density, atol, density_rtol)
+        leader[index] = leaders.setdefault(key, index)
+
+    # pass 2: merge leaders within the tolerances, in order of density so
+    # the candidates of each leader are a window of the kept leaders
+    firsts = np.unique(leader)
+    nuclides = sorted({nuc for index in firsts for nuc in comps[index]}, key=str)
+    columns = {nuc: col for col, nuc in enumerate(nuclides)}
+    fractions = np.zeros((len(firsts), len(nuclides)))
+    for row, index in enumerate(firsts):
+        comp = comps[index]
+        total = sum(comp.values())
+        for nuc, frac in comp.items():
+            fractions[row, columns[nuc]] = frac / total
+
+    merged = {}
+    kept_rows = []
+    kept_densities = []
+    for row in np.argsort(densities[firsts], kind="stable"):
+        density = densities[firsts[row]]
+        start = bisect.bisect_left(kept_densities, density * (1.0 - density_rtol))
+        candidates = kept_rows[start:]
+        if candidates:
+            differences = np.abs(fractions[candidates] - fractions[row]).max(axis=1)
+            close = np.nonzero(differences <= atol)[0]
+            if len(close):
+                merged[row] = candidates[close[0]]
+                continue
+        kept_rows.append(row)
+        kept_densities.append(density)
+
+    # every group is represented by its smallest index
+    group = np.arange(len(firsts))
+    for row, target in merged.items():
+        group[row] = target
+    group_min = {}
+    for row, index in enumerate(firsts):
+        group_min[group[row]] = min(group_min.get(group[row], index), index)
+    first_rows = {index: row for row, index in enumerate(firsts)}
+    return np.array(
+        [group_min[group[first_rows[index]]] for index in leader], dtype=np.int64
+    )
+
+
+def deduplicate_records(records, atol=1e-6, density_rtol=1e-6, reference=None):
+    """
+    Merges equivalent materials of a dictionary of JSON library records.
+
+    Arguments:
+        records (dict): dictionary where the keys are material names and the
+            values are records, as in a JSON material library.
+        atol (float): see cluster_compositions.
+        density_rtol (float): see cluster_compositions.
+        reference (dict): records of reference materials, e.g. a pure
+            library. Materials equivalent to a reference material are aliased
+            to it and left out of the result.
+
+    Returns:
+        unique (dict): records of the representative materials, in library
+            order, with an "aliases" metadata entry listing merged names.
+        aliases (dict): dictionary where the keys are the names of merged
+            materials and the values are the names they now refer to.
+    """
+    reference = reference or {}
+    names = list(reference) + list(records)
+    all_records = list(reference.values()) + list(records.values())
+    representative = cluster_compositions(
+        [record["comp"] for record in all_records],
+        [record["density"] for record in all_records],
+        atol,
+        density_rtol,
+    )
+
+    aliases = {}
+    merged_names = {}
+    for index in range(len(reference), len(names)):
+        target = representative[index]
+        if target != index:
+            aliases[names[index]] = names[target]
+            merged_names.setdefault(target, []).append(names[index])
+    unique = {}
+    for index in range(len(reference), len(names)):
+        if representative[index] != index:
+            continue
+        record = all_records[index]
+        if index in merged_names:
+            record = dict(
+                record,
+                metadata=dict(record["metadata"], aliases=merged_names[index]),
+            )
+        unique[names[index]] = record
+    return unique, aliases
+
+
+def _records(material_library):
+    if hasattr(material_library, "record"):
+        return {name: material_library.record(name) for name in material_library}
+    return {
+        (key.decode("utf8") if isinstance(key, bytes) else key): material_to_record(
+            mat
+        )
+        for key, mat in material_library.items()
+    }
+
+
+def deduplicate(material_library, atol=1e-6, density_rtol=1e-6, reference=None):
+    """
+    Merges equivalent materials of a material library.
+
+    Arguments:
+        material_library (PyNE material library or LazyMaterialLibrary):
+            library to deduplicate.
+        atol (float): see cluster_compositions.
+        density_rtol (float): see cluster_compositions.
+        reference (PyNE material library or LazyMaterialLibrary): library of
+            reference materials, see deduplicate_records.
+
+    Returns:
+        unique_lib (PyNE material library): library of the representative
+            materials.
+        aliases (dict): dictionary of the name each merged material now
+            refers to.
+    """
+    from pyne.material_library import MaterialLibrary
+
+    unique, aliases = deduplicate_records(
+        _records(material_library),
+        atol,
+        density_rtol,
+        None if reference is None else _records(reference),
+    )
+    unique_lib = MaterialLibrary()
+    for name, record in unique.items():
+        unique_lib[name] = material_from_record(record)
+    return unique_lib, aliases
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Merges materials with equivalent compositions"
+    )
+    parser.add_argument("library", help="JSON material library to deduplicate")
+    parser.add_argument("output", help="JSON library of the unique materials")
+    parser.add_argument(
+        "--aliases",
+        default="aliases.json",
+        help="JSON file of the alias map (default: aliases.json)",
+    )
+    parser.add_argument(
+        "--reference",
+        help="JSON library of reference materials, e.g. the pure library",
+    )
+    parser.add_argument(
+        "--atol",
+        type=float,
+        default=1e-6,
+        help="Largest mass fraction difference of equivalent materials",
+    )
+    parser.add_argument(
+        "--density-rtol",
+        type=float,
+        default=1e-6,
+        help="Largest relative density difference of equivalent materials",
+    )
+    args = parser.parse_args()
+
+    records = _records(LazyMaterialLibrary(args.library))
+    reference = None
+    if args.reference:
+        reference = _records(LazyMaterialLibrary(args.reference))
+    unique, aliases = deduplicate_records(
+        records, args.atol, args.density_rtol, reference
+    )
+    with JsonLibraryWriter(args.output) as writer:
+        for name, record in unique.items():
+            writer.write(name, record)
+    with open(args.aliases, "w") as alias_file:
+        json.dump(aliases, alias_file, indent=1)
+    print(
+        f" Kept {len(unique)} of {len(records)} materials, "
+        f"{len(aliases)} aliases written to {args.aliases}"
+    )
+
+
+if __name__ == "__main__":
+    main()
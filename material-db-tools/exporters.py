@@ -0,0 +1,239 @@
+"""
+Streaming writers that export a whole material library in one pass.
+
+Each writer opens its output files once, with a large write buffer, and
+walks the library a single time. The per material write_* methods of PyNE
+reopen the output file in append mode for every material.
+
+export_library writes several formats concurrently from a single load of
+the library.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from binary_library import write_binary_library
+from instrumentation import profiler
+from library_io import material_from_record, material_to_record, write_json_stream
+
+# write buffer size for the output files
+BUFFER_SIZE = 1 << 20
+
+
+def write_mcnp(materials, atom_filename, mass_filename):
+    """
+    Writes every material as MCNP material cards using atom fractions and
+    using mass fractions, in a single traversal of the materials. Existing
+    output files are overwritten.
+
+    Arguments:
+        materials (iterable): (name, PyNE material) pairs.
+        atom_filename (str): name of the file for the atom fraction cards.
+        mass_filename (str): name of the file for the mass fraction cards.
+
+    Returns:
+        count (int): number of materials written.
+    """
+    count = 0
+    with open(atom_filename, "w", buffering=BUFFER_SIZE) as atom_file, open(
+        mass_filename, "w", buffering=BUFFER_SIZE
+    ) as mass_file:
+        for _, mat in materials:
+            atom_file.write(mat.mcnp("atom"))
+            mass_file.write(mat.mcnp())
+            count += 1
+    return count
+
+
+def write_cards(materials, filename, card, header="", footer=""):
+    """
+    Writes one card per material to a file in a single traversal.
+
+    Arguments:
+        materials (iterable): (name, PyNE material) pairs.
+        filename (str): name of the output file, overwritten if it exists.
+        card (callable): returns the text of the card of a material.
+        header (str): text written before the first card.
+        footer (str): text written after the last card.
+
+    Returns:
+        count (int): number of materials written.
+    """
+    count = 0
+    with open(filename, "w", buffering=BUFFER_SIZE) as out:
+        out.write(header)
+        for _, mat in materials:
+            out.write(card(mat))
+            count += 1
+        out.write(footer)
+    return count
+
+
+def write_openmc(materials, filename, frac_type="atom"):
+    """
+    Writes an OpenMC materials XML file using atom or mass fractions.
+
+    Arguments:
+        materials (iterable): (name, PyNE material) pairs.
+        filename (str): name of the output file.
+        frac_type (str): "atom" or "mass".
+    """
+    return write_cards(
+        materials,
+        filename,
+        lambda mat: mat.openmc(frac_type),
+        '<?xml version="1.0"?>\n<materials>\n',
+        "</materials>\n",
+    )
+
+
+def write_json_materials(materials, directory):
+    """
+    Writes every material to its own JSON file, named after the material,
+    in a directory.
+    """
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    for name, mat in materials:
+        mat.write_json(os.path.join(directory, name + ".json"))
+        count += 1
+    return count
+
+
+def write_hdf5(materials, filename):
+    """
+    Writes a PyNE HDF5 material library with the default datapath and
+    nucpath. An existing file is replaced.
+    """
+    from pyne.material_library import MaterialLibrary
+
+    if os.path.exists(filename):
+        os.remove(filename)
+    library = MaterialLibrary()
+    for name, mat in materials:
+        # the library sets metadata, so other writers must not share mat
+        library[name] = material_from_record(material_to_record(mat))
+    library.write_hdf5(filename)
+    return len(library)
+
+
+# export formats: name -> (writer, suffix of the output file name). Writers
+# take a list of (name, material) pairs and the output file name. "mcnp"
+# writes two files, its suffix and output file name are (atom, mass) pairs.
+EXPORT_FORMATS = {
+    "mcnp": (
+        lambda mats, filenames: write_mcnp(mats, *filenames),
+        ("_mcnpAtomfrac.txt", "_mcnpMassfrac.txt"),
+    ),
+    "openmc_atom": (
+        lambda mats, filename: write_openmc(mats, filename, "atom"),
+        "_openmcAtomfrac.xml",
+    ),
+    "openmc_mass": (
+        lambda mats, filename: write_openmc(mats, filename, "mass"),
+        "_openmcMassfrac.xml",
+    ),
+    "alara": (
+        lambda mats, filename: write_cards(mats, filename, lambda m: m.alara()),
+        "_alara.txt",
+    ),
+    "json": (write_json_stream, "_libv1.json"),
+    "json_materials": (write_json_materials, "_json"),
+    "hdf5": (write_hdf5, ".h5"),
+    "binary": (
+        lambda mats, filename: write_binary_library(dict(mats), filename),
+        ".fmdb",
+    ),
+}
+
+
+def output_filenames(prefix, formats):
+    """
+    Returns the output file names of formats, in the naming of db-outputs,
+    e.g. "PureFusionMaterials_mcnpAtomfrac.txt" for the prefix
+    "PureFusionMaterials".
+    """
+    filenames = {}
+    for fmt in formats:
+        suffix = EXPORT_FORMATS[fmt][1]
+        if isinstance(suffix, tuple):
+            filenames[fmt] = tuple(prefix + part for part in suffix)
+        else:
+            filenames[fmt] = prefix + suffix
+    return filenames
+
+
+def _export_records(fmt, records, filename):
+    """
+    Rebuilds the materials from their records and writes one format, in a
+    worker process.
+
+    Returns:
+        count (int): number of materials written.
+        stages (dict): stages profiled in the worker, see Profiler.collect.
+    """
+    with profiler.stage("write_" + fmt):
+        materials = [
+            (name, material_from_record(record)) for name, record in records
+        ]
+        count = EXPORT_FORMATS[fmt][0](materials, filename)
+    return count, profiler.collect()
+
+
+def _write_format(fmt, materials, filename):
+    with profiler.stage("write_" + fmt):
+        return EXPORT_FORMATS[fmt][0](materials, filename)
+
+
+def export_library(material_library, outputs, max_workers=None, processes=False):
+    """
+    Loads a library once and writes every requested format concurrently,
+    each writer streaming to its own file.
+
+    Arguments:
+        material_library (PyNE material library or LazyMaterialLibrary):
+            library to export.
+        outputs (dict): dictionary where the keys are names of formats in
+            EXPORT_FORMATS and the values are output file names (a directory
+            for "json_materials", an (atom, mass) pair for "mcnp").
+        max_workers (int): number of concurrent writers. Defaults to None,
+            in which case every format gets a writer.
+        processes (bool): write in worker processes rather than threads, so
+            that writers that hold the interpreter lock run in parallel.
+            Materials are sent to the workers as records.
+
+    Returns:
+        counts (dict): number of materials written for each format.
+    """
+    unknown = set(outputs) - set(EXPORT_FORMATS)
+    if unknown:
+        raise ValueError(f"unknown export formats: {', '.join(sorted(unknown))}")
+    max_workers = max_workers or max(len(outputs), 1)
+    names = [
+        key.decode("utf8") if isinstance(key, bytes) else key
+        for key in material_library.keys()
+    ]
+    if processes:
+        if hasattr(material_library, "record"):
+            records = [(name, material_library.record(name)) for name in names]
+        else:
+            records = [
+                (name, material_to_record(material_library[name])) for name in names
+            ]
+        with profiler.stage("export"), ProcessPoolExecutor(max_workers) as pool:
+            futures = {
+                fmt: pool.submit(_export_records, fmt, records, filename)
+                for fmt, filename in outputs.items()
+            }
+            counts = {}
+            for fmt, future in futures.items():
+                counts[fmt], stages = future.result()
+                profiler.merge(stages)
+            return counts
+
+    materials = [(name, material_library[name]) for name in names]
+    with ThreadPoolExecutor(max_workers) as pool:
+        futures = {
+            fmt: pool.submit(_write_format, fmt, materials, filename)
+            for fmt, filename in outputs.items()
+        }
+        return {fmt: future.result() for fmt, future in futures.items()}
@@ -0,0 +1,305 @@
+"""
+Impurity variants of pure materials for activation calculations.
+
+An impurity specification gives, for each grade, the content of impurity
+elements in wppm, either as a nominal value or as a (min, max) range:
+
+    grades = {
+        "ITER": {"B": 10, "Co": (0, 500), "Nb": 100},
+        "lowact": {"B": 2, "Co": 10, "Nb": 1},
+    }
+
+Each grade sets the content of its elements in the base material, which
+replaces any content the base already has, and the balance element of the
+base (e.g. "balance Fe") absorbs the difference so the mass fractions
+still sum to one. Every grade of a base material is built in one
+vectorized pass over the isotopic composition, and the variants carry
+their base, grade, balance element and impurity contents as metadata.
+
+Usage:
+    python impurities.py PureFusionMaterials_libv1.json grades.csv \
+        impurities_libv1.json --materials SS316LN MF82H EUROFER97
+
+where grades.csv has a grade,element,wppm header and a wppm value is
+either a number or a min-max range, e.g. "0-500".
+"""
+import argparse
+import csv
+import re
+
+import numpy as np
+from pyne import nucname
+from pyne.material import Material
+from pyne.material_library import MaterialLibrary
+
+import material_db_tools as mdbt
+from library_io import LazyMaterialLibrary, write_json_stream
+
+LEVELS = ("min", "nominal", "max")
+
+# a min-max range of wppm values, e.g. "0-500" or "1e-3-2.5e-2"
+_NUMBER = r"(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?"
+_RANGE = re.compile(rf"^\s*({_NUMBER})\s*-\s*({_NUMBER})\s*$")
+
+
+def element_id(key):
+    """
+    Returns the nuclide id of the natural element of a symbol or id, e.g.
+    260000000 for "Fe".
+    """
+    return nucname.znum(nucname.id(key)) * 10000000
+
+
+def impurity_content(value, level="max"):
+    """
+    Returns the content [wppm] of one impurity at a level of its range.
+
+    Arguments:
+        value (float or (float, float)): nominal content or (min, max)
+            range in wppm.
+        level (str): "min", "nominal" (middle of the range) or "max". A
+            nominal value is used at every level.
+    """
+    if np.ndim(value) == 0:
+        return float(value)
+    low, high = value
+    return {"min": low, "nominal": 0.5 * (low + high), "max": high}[level]
+
+
+def read_impurity_table(filename):
+    """
+    Reads impurity grades from a CSV file with grade, element and wppm
+    columns, where wppm is a number, e.g. "1e-3", or a min-max range, e.g.
+    "0-500".
+
+    Returns:
+        grades (dict): dictionary where the keys are grade names and the
+            values are dictionaries of impurity contents by element.
+    """
+    grades = {}
+    with open(filename, newline="") as table:
+        for row in csv.DictReader(table):
+            wppm = row["wppm"].strip()
+            try:
+                value = float(wppm)
+            except ValueError:
+                match = _RANGE.match(wppm)
+                if match is None:
+                    raise ValueError(
+                        f"wppm of {row['element']} in grade {row['grade']} must "
+                        f"be a number or a min-max range, not {wppm!r}"
+                    ) from None
+                value = tuple(float(bound) for bound in match.groups())
+            if min(np.atleast_1d(value)) < 0:
+                raise ValueError(
+                    f"wppm of {row['element']} in grade {row['grade']} must not "
+                    f"be negative, not {wppm!r}"
+                )
+            spec = grades.setdefault(row["grade"].strip(), {})
+            spec[row["element"].strip()] = value
+    return grades
+
+
+def _element_masses(comp):
+    """
+    Groups a composition by element.
+
+    Returns:
+        masses (dict): mass fraction of each element, by element id.
+        isotopes (dict): isotopic mass fractions of each element, by
+            element id.
+    """
+    masses = {}
+    isotopes = {}
+    for nuc, frac in comp.items():
+        elem = nucname.znum(nuc) * 10000000
+        masses[elem] = masses.get(elem, 0.0) + frac
+        isotopes.setdefault(elem, {})[nuc] = frac
+    for elem, isos in isotopes.items():
+        isotopes[elem] = {nuc: frac / masses[elem] for nuc, frac in isos.items()}
+    return masses, isotopes
+
+
+def impurity_variants(base_name, base, grades, balance=None, level="max"):
+    """
+    Builds the impurity variants of one base material.
+
+    Arguments:
+        base_name (str): name of the base material, the variants are named
+            base_name + "_" + grade.
+        base (dict or PyNE material): mat_data entry, as in
+            createPurematlib.py, or a built material.
+        grades (dict): dictionary where the keys are grade names and the
+            values are dictionaries of impurity contents by element, see
+            impurity_content.
+        balance (str or int): element whose content is reduced to make room
+            for the impurities. Defaults to the element with the largest
+            mass fraction in the base material.
+        level (str): level of the impurity ranges, see impurity_content.
+
+    Yields:
+        name (str): name of each variant.
+        mat (PyNE material): the variant, with the density and citation of
+            the base material.
+    """
+    if level not in LEVELS:
+        raise ValueError(f"level must be one of {', '.join(LEVELS)}")
+    if isinstance(base, dict):
+        citation = base["citation"]
+        base = mdbt.build_material(base)
+    else:
+        citation = mdbt.get_citation(base)
+    total = sum(base.comp.values())
+    masses, isotopes = _element_masses(
+        {nuc: frac / total for nuc, frac in base.comp.items()}
+    )
+    if balance is None:
+        balance = max(masses, key=masses.get)
+    else:
+        balance = element_id(balance)
+    if balance not in masses:
+        raise ValueError(f"{base_name} contains no {nucname.name(balance)}")
+
+    impurities = sorted(
+        {element_id(elem) for spec in grades.values() for elem in spec}
+    )
+    if balance in impurities:
+        raise ValueError("the balance element cannot be an impurity")
+    # impurities keep the isotopic composition they have in the base
+    # material, e.g. enriched B, or get the natural one
+    for elem in impurities:
+        if elem not in isotopes:
+            isotopes[elem] = mdbt.make_mat({elem: 1.0}, 1.0, "").comp
+
+    nucids = sorted(
+        {nuc for elem in impurities + [balance] for nuc in isotopes[elem]}
+        | set(base.comp)
+    )
+    columns = {nuc: col for col, nuc in enumerate(nucids)}
+
+    def distribution(elem):
+        row = np.zeros(len(nucids))
+        for nuc, frac in isotopes[elem].items():
+            row[columns[nuc]] = frac
+        return row
+
+    # content of each impurity (column) in each grade (row), the base
+    # content where a grade leaves an impurity out
+    contents = np.tile(
+        [masses.get(elem, 0.0) for elem in impurities], (len(grades), 1)
+    )
+    for row, spec in enumerate(grades.values()):
+        for elem, value in spec.items():
+            contents[row, impurities.index(element_id(elem))] = (
+                impurity_content(value, level) * 1.0e-6
+            )
+
+    rest = np.zeros(len(nucids))
+    for elem, mass in masses.items():
+        if elem != balance and elem not in impurities:
+            rest += mass * distribution(elem)
+    balance_mass = 1.0 - rest.sum() - contents.sum(axis=1)
+    for grade, mass in zip(grades, balance_mass):
+        if mass < 0:
+            raise ValueError(
+                f"impurities of grade {grade} exceed the {nucname.name(balance)} "
+                f"content of {base_name}"
+            )
+    impurity_isotopes = np.zeros((len(impurities), len(nucids)))
+    for row, elem in enumerate(impurities):
+        impurity_isotopes[row] = distribution(elem)
+    mass_fracs = (
+        rest
+        + contents @ impurity_isotopes
+        + balance_mass[:, None] * distribution(balance)
+    )
+
+    for row, (grade, spec) in enumerate(grades.items()):
+        present = np.nonzero(mass_fracs[row])[0]
+        mat = Material(
+            {nucids[col]: float(mass_fracs[row, col]) for col in present},
+            mass=1.0,
+            density=base.density,
+            atoms_per_molecule=-1.0,
+        )
+        mat.metadata["citation"] = citation
+        mat.metadata["impurity_base"] = base_name
+        mat.metadata["impurity_grade"] = grade
+        mat.metadata["impurity_balance"] = nucname.name(balance)
+        mat.metadata["impurity_level"] = level
+        mat.metadata["impurities_wppm"] = {
+            str(elem): impurity_content(value, level) for elem, value in spec.items()
+        }
+        yield f"{base_name}_{grade}", mat
+
+
+def impurity_library(materials, grades, balance=None, level="max"):
+    """
+    Builds the impurity variants of several base materials.
+
+    Arguments:
+        materials (dict): dictionary where the keys are names of base
+            materials and the values are mat_data entries or built
+            materials.
+        grades (dict): impurity grades, see impurity_variants.
+        balance (str, int or dict): balance element of every base material,
+            or a dictionary of balance elements by base material name.
+            Defaults to the element with the largest mass fraction.
+        level (str): level of the impurity ranges, see impurity_content.
+
+    Returns:
+        mat_lib (PyNE material library): library of the variants.
+    """
+    mat_lib = MaterialLibrary()
+    for base_name, base in materials.items():
+        base_balance = balance.get(base_name) if isinstance(balance, dict) else balance
+        for name, mat in impurity_variants(
+            base_name, base, grades, base_balance, level
+        ):
+            mat_lib[name] = mat
+    return mat_lib
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Builds impurity variants of materials of a library"
+    )
+    parser.add_argument("library", help="JSON material library of base materials")
+    parser.add_argument("grades", help="CSV file of impurity grades")
+    parser.add_argument("output", help="JSON library of the variants")
+    parser.add_argument(
+        "--materials",
+        nargs="+",
+        required=True,
+        help="Base materials to build variants of",
+    )
+    parser.add_argument(
+        "--balance",
+        help="Balance element (default: largest element of each material)",
+    )
+    parser.add_argument(
+        "--level",
+        choices=LEVELS,
+        default="max",
+        help="Level of the impurity ranges (default: max)",
+    )
+    args = parser.parse_args()
+
+    base_lib = LazyMaterialLibrary(args.library)
+    grades = read_impurity_table(args.grades)
+    variants = (
+        variant
+        for base_name in args.materials
+        for variant in impurity_variants(
+            base_name, base_lib[base_name], grades, args.balance, args.level
+        )
+    )
+    write_json_stream(variants, args.output)
+    print(
+        f" Wrote {len(grades) * len(args.materials)} impurity variants "
+        f"to {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+Opt-in profiling of the build, mix, load and export stages.
+
+Profiling is off unless the FMDB_PROFILE environment variable names a JSON
+report file, e.g.
+
+    FMDB_PROFILE=build_profile.json python createPurematlib.py
+
+Stages are recorded with the shared profiler:
+
+    with profiler.stage("element_expansion", material_name):
+        ...
+
+For each stage the profiler records the number of calls, the wall time and
+the peak memory allocated by Python (tracemalloc) while it ran, both in
+aggregate and per material. Stages nest: a stage without a material
+belongs to the material of the stage it runs in. The scripts call
+profiler.finish() at the end of a run to write the report and print a
+compact summary.
+
+tracemalloc traces the whole process, so the memory of a stage that runs
+while a stage of another thread is open, e.g. the writers of
+exporters.export_library, cannot be told apart. Such calls are counted as
+concurrent_calls and record the peak traced memory of the process while
+they ran as process_peak_memory_bytes, in place of peak_memory_bytes.
+Worker processes profile themselves and send their stages back with
+collect(), for the parent to merge().
+"""
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def _max_rss_kb():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class _Frame(object):
+    __slots__ = (
+        "name",
+        "material",
+        "start",
+        "memory_start",
+        "memory_max",
+        "concurrent",
+    )
+
+    def __init__(self, name, material, memory_start, concurrent):
+        self.name = name
+        self.material = material
+        self.start = time.perf_counter()
+        self.memory_start = memory_start
+        self.memory_max = memory_start
+        self.concurrent = concurrent
+
+
+class Profiler(object):
+    """
+    Records wall time, call counts and peak memory of named stages.
+
+    Arguments:
+        report_filename (str): JSON file written by finish(). Defaults to
+            None, in which case the profiler is disabled and stage() costs
+            next to nothing.
+    """
+
+    def __init__(self, report_filename=None):
+        self.report_filename = report_filename
+        self.stages = {}
+        self.materials = {}
+        self._lock = threading.Lock()
+        # open stages of every thread, by thread id
+        self._stacks = {}
+        if self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @property
+    def enabled(self):
+        return self.report_filename is not None
+
+    def _update_peaks(self):
+        """
+        Gives the traced peak since the last reset to every open stage of
+        every thread. Called with the lock held, before the peak is reset.
+        """
+        peak = tracemalloc.get_traced_memory()[1]
+        for stack in self._stacks.values():
+            for frame in stack:
+                frame.memory_max = max(frame.memory_max, peak)
+
+    def stage(self, name, material=None):
+        """
+        Returns a context manager that records one call of a stage.
+
+        Arguments:
+            name (str): name of the stage, e.g. "mixing" or "write_openmc".
+            material (str): name of the material the stage works on.
+                Defaults to the material of the enclosing stage.
+        """
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._record(name, material)
+
+    @contextlib.contextmanager
+    def _record(self, name, material):
+        thread = threading.get_ident()
+        with self._lock:
+            stack = self._stacks.setdefault(thread, [])
+            if stack and material is None:
+                material = stack[-1].material
+            others = [
+                frame
+                for other, other_stack in self._stacks.items()
+                if other != thread
+                for frame in other_stack
+            ]
+            for other_frame in others:
+                other_frame.concurrent = True
+            self._update_peaks()
+            tracemalloc.reset_peak()
+            frame = _Frame(
+                name,
+                material,
+                tracemalloc.get_traced_memory()[0],
+                bool(others),
+            )
+            stack.append(frame)
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - frame.start
+            with self._lock:
+                self._update_peaks()
+                stack.pop()
+                if not stack:
+                    del self._stacks[thread]
+            self._add(name, material, seconds, frame)
+
+    def _add(self, name, material, seconds, frame):
+        if frame.concurrent:
+            self._add_totals(
+                name,
+                material,
+                {"calls": 1, "seconds": seconds, "concurrent_calls": 1},
+                {"process_peak_memory_bytes": frame.memory_max},
+            )
+        else:
+            self._add_totals(
+                name,
+                material,
+                {"calls": 1, "seconds": seconds},
+                {"peak_memory_bytes": frame.memory_max - frame.memory_start},
+            )
+
+    def _add_totals(self, name, material, sums, maxima):
+        with self._lock:
+            totals = [self.stages.setdefault(name, _empty_totals())]
+            if material is not None:
+                per_material = self.materials.setdefault(material, {})
+                totals.append(per_material.setdefault(name, _empty_totals()))
+            for total in totals:
+                for key, value in sums.items():
+                    total[key] += value
+                for key, value in maxima.items():
+                    total[key] = max(total[key], value)
+
+    def _forget(self):
+        """
+        Drops the stages a forked worker process inherits from its parent,
+        so that the worker only reports its own.
+        """
+        self.stages = {}
+        self.materials = {}
+        self._lock = threading.Lock()
+        self._stacks = {}
+
+    def collect(self):
+        """
+        Returns the stages recorded so far and clears them, so that a worker
+        process can send the stages of each task to its parent.
+
+        Returns:
+            stages (dict): the stages and materials entries of report().
+        """
+        with self._lock:
+            stages = {"stages": self.stages, "materials": self.materials}
+            self.stages = {}
+            self.materials = {}
+        return stages
+
+    def merge(self, stages):
+        """
+        Adds stages returned by collect() in another process.
+        """
+        with self._lock:
+            targets = [(self.stages, stages["stages"])] + [
+                (self.materials.setdefault(material, {}), by_name)
+                for material, by_name in stages["materials"].items()
+            ]
+            for target, by_name in targets:
+                for name, total in by_name.items():
+                    merged = target.setdefault(name, _empty_totals())
+                    for key in _SUMMED:
+                        merged[key] += total[key]
+                    for key in _MAXIMA:
+                        merged[key] = max(merged[key], total[key])
+
+    def report(self):
+        """
+        Returns the recorded stages as a json serializable dict.
+        """
+        return {
+            "stages": self.stages,
+            "materials": self.materials,
+            "max_rss_kb": _max_rss_kb(),
+            "command": sys.argv,
+        }
+
+    def summary(self, out=sys.stdout, slowest=5):
+        """
+        Writes a compact summary: one line per stage and the materials that
+        took the longest.
+        """
+        out.write(
+            "\n {:28s} {:>8s} {:>12s} {:>14s}\n".format(
+                "stage", "calls", "seconds", "peak MiB"
+            )
+        )
+        concurrent = False
+        for name, total in self.stages.items():
+            peak = total["peak_memory_bytes"]
+            marker = ""
+            if total["concurrent_calls"]:
+                peak = max(peak, total["process_peak_memory_bytes"])
+                marker = "*"
+                concurrent = True
+            out.write(
+                " {:28s} {:8d} {:12.4f} {:14.3f}{}\n".format(
+                    name,
+                    total["calls"],
+                    total["seconds"],
+                    peak / 2**20,
+                    marker,
+                )
+            )
+        if concurrent:
+            out.write(" * peak traced memory of the process, ran concurrently\n")
+        times = sorted(
+            (
+                (sum(total["seconds"] for total in stages.values()), material)
+                for material, stages in self.materials.items()
+            ),
+            reverse=True,
+        )
+        if times:
+            out.write(" slowest materials:\n")
+            for seconds, material in times[:slowest]:
+                out.write(f"   {material:26s} {seconds:12.4f} s\n")
+        rss = _max_rss_kb()
+        if rss is not None:
+            out.write(f" max resident memory {rss / 1024:.1f} MiB\n")
+
+    def finish(self, out=sys.stdout):
+        """
+        Writes the JSON report and prints the summary, if profiling is on.
+        """
+        if not self.enabled:
+            return
+        with open(self.report_filename, "w") as report_file:
+            json.dump(self.report(), report_file, indent=1)
+        self.summary(out)
+        out.write(f" profile written to {self.report_filename}\n")
+
+
+_SUMMED = ("calls", "seconds", "concurrent_calls")
+_MAXIMA = ("peak_memory_bytes", "process_peak_memory_bytes")
+
+
+def _empty_totals():
+    return {
+        "calls": 0,
+        "seconds": 0.0,
+        "concurrent_calls": 0,
+        "peak_memory_bytes": 0,
+        "process_peak_memory_bytes": 0,
+    }
+
+
+# shared by the build, mix and export tools of the process
+profiler = Profiler(os.environ.get("FMDB_PROFILE") or None)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=profiler._forget)
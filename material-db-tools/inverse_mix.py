@@ -0,0 +1,268 @@
+"""
+Inverse mixing: volume fractions from target compositions.
+
+mix_by_volume goes from volume fractions to a composition. The functions
+here go the other way for many design targets at once: they fit the volume
+fractions of a set of constituents from a pure library so that the mixture
+best matches a target nuclide number density vector and/or a target mass
+density. They also give the analytic Jacobian of the mixed number
+densities with respect to the volume fractions, for use in optimization
+loops in place of finite differences of mix_by_volume.
+
+Mixing by volume is linear in the normalized volume fractions v:
+
+    N_mix = v @ N
+
+where row i of N holds the number densities of constituent i. The fit is a
+least-squares problem over the simplex (v >= 0, sum(v) = 1), solved for all
+targets together with an accelerated projected gradient method.
+"""
+import numpy as np
+from pyne import data
+
+import material_db_tools as mdbt
+
+
+def mixture_jacobian(number_densities, vol_fracs):
+    """
+    Computes mixed number densities and their Jacobian with respect to the
+    volume fractions for a batch of mixtures.
+
+    The volume fractions do not need to sum to one; they are normalized as
+    in mix_by_volume, and the Jacobian accounts for the normalization:
+
+        dN_mix[j] / dv[i] = (N[i, j] - N_mix[j]) / sum(v)
+
+    Arguments:
+        number_densities (numpy array of float): number densities
+            [atoms/cm3] of each nuclide (column) in each constituent (row),
+            as returned by material_db_tools.library_matrix.
+        vol_fracs (numpy array of float): volume fraction of each
+            constituent (column) in each mixture (row).
+
+    Returns:
+        mixed (numpy array of float): number densities [atoms/cm3] of each
+            nuclide (column) in each mixture (row).
+        jacobian (numpy array of float): derivative of the number density
+            of nuclide j in mixture k with respect to the volume fraction of
+            constituent i, at index [k, i, j].
+    """
+    vol_fracs = np.atleast_2d(np.asarray(vol_fracs, dtype=float))
+    total = vol_fracs.sum(axis=1)
+    mixed = (vol_fracs / total[:, None]) @ number_densities
+    jacobian = (number_densities[None, :, :] - mixed[:, None, :]) / total[
+        :, None, None
+    ]
+    return mixed, jacobian
+
+
+def library_jacobian(material_library, constituents, vol_fracs):
+    """
+    Computes mixed number densities and mass densities of a batch of
+    mixtures of library materials, and their Jacobians with respect to the
+    volume fractions.
+
+    Arguments:
+        material_library (PyNE material library): library containing the
+            constituent materials.
+        constituents (list of str): names of the constituents, in the order
+            of the columns of vol_fracs.
+        vol_fracs (numpy array of float): volume fraction of each
+            constituent (column) in each mixture (row).
+
+    Returns:
+        nucids (numpy array of int): nuclide id of each nuclide column.
+        mixed (numpy array of float): number densities [atoms/cm3], indexed
+            [mixture, nuclide].
+        jacobian (numpy array of float): derivatives of the number
+            densities, indexed [mixture, constituent, nuclide].
+        densities (numpy array of float): mass density [g/cm3] of each
+            mixture.
+        density_jacobian (numpy array of float): derivatives of the mass
+            densities, indexed [mixture, constituent].
+    """
+    _, nucids, number_densities = mdbt.library_matrix(
+        material_library, constituents
+    )
+    mixed, jacobian = mixture_jacobian(number_densities, vol_fracs)
+    grams_per_atom = mdbt.atomic_masses(nucids) / data.N_A
+    return (
+        nucids,
+        mixed,
+        jacobian,
+        mixed @ grams_per_atom,
+        jacobian @ grams_per_atom,
+    )
+
+
+def project_simplex(points):
+    """
+    Projects each row of an array onto the probability simplex
+    {v : v >= 0, sum(v) = 1} in Euclidean norm.
+    """
+    ordered = -np.sort(-points, axis=1)
+    cumulative = np.cumsum(ordered, axis=1) - 1.0
+    counts = np.arange(1, points.shape[1] + 1)
+    support = np.count_nonzero(ordered - cumulative / counts > 0, axis=1)
+    shift = cumulative[np.arange(len(points)), support - 1] / support
+    return np.maximum(points - shift[:, None], 0.0)
+
+
+def _align_targets(nucids, target_nucids, target_number_densities):
+    """
+    Places the target number densities in the columns of nucids, adding
+    the columns of target nuclides that no constituent contains.
+    """
+    target_nucids = np.asarray(target_nucids, dtype=np.int64)
+    columns = np.union1d(nucids, target_nucids)
+    targets = np.zeros((len(target_number_densities), len(columns)))
+    targets[:, np.searchsorted(columns, target_nucids)] = target_number_densities
+    return columns, np.searchsorted(columns, nucids), targets
+
+
+def fit_vol_fracs(
+    material_library,
+    constituents,
+    target_nucids=None,
+    target_number_densities=None,
+    target_density=None,
+    density_weight=1.0,
+    max_iter=10000,
+    tol=1e-12,
+):
+    """
+    Finds, for each target, the volume fractions of the constituents whose
+    mixture best matches the target number densities and/or mass density.
+
+    Each target k minimizes
+
+        |v @ N - t_k|^2 / |t_k|^2
+            + density_weight * (v @ rho - rho_k)^2 / rho_k^2
+
+    over v >= 0 with sum(v) = 1, so both terms are relative errors. Nuclides
+    of the constituents missing from a target count with a target of zero.
+
+    Arguments:
+        material_library (PyNE material library): library containing the
+            constituent materials.
+        constituents (list of str): names of the candidate constituents.
+        target_nucids (sequence of int): nuclide id of each column of
+            target_number_densities.
+        target_number_densities (numpy array of float): target number
+            densities [atoms/cm3], one row per target. Can be built from a
+            library of target materials with
+            material_db_tools.library_matrix.
+        target_density (float or sequence of float): target mass densities
+            [g/cm3], one per target or one for all.
+        density_weight (float): weight of the density term when both
+            targets are given. Defaults to 1.
+        max_iter (int): maximum number of iterations.
+        tol (float): iterations stop when no volume fraction changes by more
+            than tol.
+
+    Returns:
+        vol_fracs (numpy array of float): volume fraction of each
+            constituent (column) for each target (row). Rows sum to one.
+        residuals (numpy array of float): value of the objective for each
+            target at the solution.
+    """
+    if target_number_densities is None and target_density is None:
+        raise ValueError("a target number density or mass density is required")
+
+    _, nucids, number_densities = mdbt.library_matrix(
+        material_library, constituents
+    )
+    densities = number_densities @ (mdbt.atomic_masses(nucids) / data.N_A)
+
+    # features of each constituent (rows of A) and of each target (rows of T),
+    # scaled per target so that the objective is a relative error
+    blocks_a = []
+    blocks_t = []
+    scales = []
+    if target_number_densities is not None:
+        target_number_densities = np.atleast_2d(
+            np.asarray(target_number_densities, dtype=float)
+        )
+        columns, placed, targets = _align_targets(
+            nucids, target_nucids, target_number_densities
+        )
+        features = np.zeros((len(constituents), len(columns)))
+        features[:, placed] = number_densities
+        blocks_a.append(features)
+        blocks_t.append(targets)
+        norms = np.linalg.norm(targets, axis=1)
+        if np.any(norms == 0):
+            raise ValueError("target number densities must not all be zero")
+        scales.append(np.repeat(1.0 / norms[:, None], len(columns), axis=1))
+    n_targets = len(blocks_t[0]) if blocks_t else np.size(target_density)
+    if target_density is not None:
+        rho = np.broadcast_to(
+            np.asarray(target_density, dtype=float), (n_targets,)
+        )
+        if np.any(rho <= 0):
+            raise ValueError("target densities must be positive")
+        blocks_a.append(densities[:, None])
+        blocks_t.append(rho[:, None])
+        weight = density_weight if target_number_densities is not None else 1.0
+        scales.append(np.sqrt(weight) / rho[:, None])
+
+    features = np.hstack(blocks_a)
+    targets = np.hstack(blocks_t) * np.hstack(scales)
+    scales = np.hstack(scales)
+
+    # objective of target k: |A_k^T v - t_k|^2 with A_k = features * scales[k]
+    scaled = features[None, :, :] * scales[:, None, :]
+    gram = np.einsum("kif,kjf->kij", scaled, scaled)
+    linear = np.einsum("kif,kf->ki", scaled, targets)
+    lipschitz = 2.0 * np.linalg.eigvalsh(gram)[:, -1]
+    step = 1.0 / np.where(lipschitz > 0, lipschitz, 1.0)
+
+    # FISTA over the simplex
+    n_constituents = len(constituents)
+    vol_fracs = np.full((n_targets, n_constituents), 1.0 / n_constituents)
+    momentum = vol_fracs.copy()
+    t = 1.0
+    for _ in range(max_iter):
+        gradient = 2.0 * (np.einsum("kij,kj->ki", gram, momentum) - linear)
+        updated = project_simplex(momentum - step[:, None] * gradient)
+        t_next = 0.5 * (1.0 + np.sqrt(1.0 + 4.0 * t * t))
+        momentum = updated + (t - 1.0) / t_next * (updated - vol_fracs)
+        change = np.max(np.abs(updated - vol_fracs))
+        vol_fracs = updated
+        t = t_next
+        if change < tol:
+            break
+
+    residuals = np.sum(
+        (np.einsum("ki,kif->kf", vol_fracs, scaled) - targets) ** 2, axis=1
+    )
+    return vol_fracs, residuals
+
+
+def fitted_mixtures(target_names, constituents, vol_fracs, citation, cutoff=0.0):
+    """
+    Turns fitted volume fractions into mixture definitions that can be
+    passed to mix_by_volume_batch.
+
+    Arguments:
+        target_names (list of str): name of the mixture of each row.
+        constituents (list of str): name of the constituent of each column.
+        vol_fracs (numpy array of float): fitted volume fractions.
+        citation (str): mixture citation of the mixtures.
+        cutoff (float): volume fractions at or below cutoff are left out.
+
+    Returns:
+        mixtures (dict): mixture definitions in the format of the mat_data
+            of mixPureFusionMaterials.py
+    """
+    return {
+        name: {
+            "vol_fracs": {
+                constituent: float(frac)
+                for constituent, frac in zip(constituents, row)
+                if frac > cutoff
+            },
+            "mixture_citation": citation,
+        }
+        for name, row in zip(target_names, vol_fracs)
+    }
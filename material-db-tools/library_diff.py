@@ -0,0 +1,255 @@
+"""
+Tolerance-aware comparison of two versions of a JSON material library.
+
+Both libraries are read straight from their JSON files, without building
+PyNE materials, and aligned by material name and nuclide into sparse
+(material, nuclide) arrays. The comparison itself is vectorized, so
+libraries of 10^5 materials are compared in seconds.
+
+Usage:
+    python library_diff.py old_libv1.json new_libv1.json --rtol 1e-6
+
+The exit code is 1 if the libraries differ, so the diff can gate a release.
+"""
+import argparse
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+def _citation(record):
+    metadata = record.get("metadata", {})
+    return metadata.get("citation", metadata.get("mixture_citation", ""))
+
+
+def load_library_arrays(filename):
+    """
+    Reads a JSON material library into flat arrays.
+
+    Arguments:
+        filename (str): name of the JSON material library.
+
+    Returns:
+        arrays (dict): dictionary with the entries
+            "names" (numpy array of str): name of each material.
+            "rows" (numpy array of int): material of each composition entry.
+            "nuclides" (numpy array of str): names of the nuclides.
+            "codes" (numpy array of int): index in nuclides of each entry.
+            "fractions" (numpy array of float): mass fraction of each entry.
+            "densities" (numpy array of float): density of each material.
+            "citations" (numpy array of str): citation of each material.
+    """
+    with open(filename) as lib_file:
+        library = json.load(lib_file)
+    records = list(library.values())
+    counts = np.fromiter(
+        (len(record["comp"]) for record in records), np.int64, len(records)
+    )
+    total = int(counts.sum())
+    vocabulary = {}
+    codes = np.fromiter(
+        (
+            vocabulary.setdefault(nuc, len(vocabulary))
+            for record in records
+            for nuc in record["comp"]
+        ),
+        np.int64,
+        total,
+    )
+    return {
+        "names": np.array(list(library), dtype=str),
+        "rows": np.repeat(np.arange(len(records)), counts),
+        "nuclides": np.array(list(vocabulary), dtype=str),
+        "codes": codes,
+        "fractions": np.fromiter(
+            (frac for record in records for frac in record["comp"].values()),
+            float,
+            total,
+        ),
+        "densities": np.array([record["density"] for record in records], float),
+        "citations": np.array([_citation(record) for record in records], dtype=str),
+    }
+
+
+def _is_changed(old, new, rtol, atol):
+    # symmetric in old and new, unlike numpy.isclose
+    return np.abs(new - old) > atol + rtol * np.maximum(np.abs(old), np.abs(new))
+
+
+def diff_libraries(
+    old, new, rtol=1e-6, atol=1e-12, density_rtol=None, density_atol=0.0
+):
+    """
+    Compares two libraries loaded with load_library_arrays.
+
+    A value counts as changed when |new - old| > atol + rtol * max(|old|,
+    |new|). A nuclide missing from one version of a material has a fraction
+    of zero in that version.
+
+    Arguments:
+        old (dict): arrays of the previous library version.
+        new (dict): arrays of the new library version.
+        rtol (float): relative tolerance on mass fractions.
+        atol (float): absolute tolerance on mass fractions.
+        density_rtol (float): relative tolerance on densities. Defaults to
+            None, in which case rtol is used.
+        density_atol (float): absolute tolerance on densities [g/cm3].
+
+    Returns:
+        report (dict): dictionary with the entries
+            "added", "removed" (list of str): material names.
+            "densities" (list of [name, old, new]): changed densities.
+            "fractions" (list of [name, nuclide, old, new]): changed mass
+                fractions.
+            "citations" (list of [name, old, new]): changed citations.
+    """
+    if density_rtol is None:
+        density_rtol = rtol
+    common, old_index, new_index = np.intersect1d(
+        old["names"], new["names"], assume_unique=True, return_indices=True
+    )
+    report = {
+        "added": np.setdiff1d(new["names"], common).tolist(),
+        "removed": np.setdiff1d(old["names"], common).tolist(),
+    }
+
+    old_density = old["densities"][old_index]
+    new_density = new["densities"][new_index]
+    changed = np.nonzero(
+        _is_changed(old_density, new_density, density_rtol, density_atol)
+    )[0]
+    report["densities"] = [
+        [name, old_value, new_value]
+        for name, old_value, new_value in zip(
+            common[changed].tolist(),
+            old_density[changed].tolist(),
+            new_density[changed].tolist(),
+        )
+    ]
+
+    # key every (common material, nuclide) entry as material * n + nuclide
+    nuclides = np.union1d(old["nuclides"], new["nuclides"])
+    n_nuclides = len(nuclides)
+    keyed = []
+    for arrays, index in ((old, old_index), (new, new_index)):
+        cols = np.searchsorted(nuclides, arrays["nuclides"])[arrays["codes"]]
+        position = np.full(len(arrays["names"]), -1)
+        position[index] = np.arange(len(common))
+        material = position[arrays["rows"]]
+        kept = material >= 0
+        keyed.append(
+            (material[kept] * n_nuclides + cols[kept], arrays["fractions"][kept])
+        )
+    # sorted union of the keys of both versions
+    keys = np.unique(np.concatenate([keyed[0][0], keyed[1][0]]))
+    aligned = []
+    for entry_keys, fractions in keyed:
+        values = np.zeros(len(keys))
+        values[np.searchsorted(keys, entry_keys)] = fractions
+        aligned.append(values)
+    changed = np.nonzero(_is_changed(aligned[0], aligned[1], rtol, atol))[0]
+    report["fractions"] = [
+        [name, nuc, old_value, new_value]
+        for name, nuc, old_value, new_value in zip(
+            common[keys[changed] // n_nuclides].tolist(),
+            nuclides[keys[changed] % n_nuclides].tolist(),
+            aligned[0][changed].tolist(),
+            aligned[1][changed].tolist(),
+        )
+    ]
+
+    old_citation = old["citations"][old_index]
+    new_citation = new["citations"][new_index]
+    changed = np.nonzero(old_citation != new_citation)[0]
+    report["citations"] = [
+        [name, old_value, new_value]
+        for name, old_value, new_value in zip(
+            common[changed].tolist(),
+            old_citation[changed].tolist(),
+            new_citation[changed].tolist(),
+        )
+    ]
+    return report
+
+
+def has_differences(report):
+    return any(report[key] for key in report)
+
+
+def print_report(report, out=sys.stdout, max_lines=50):
+    """
+    Writes a readable summary of a diff report, listing at most max_lines
+    entries of each kind.
+    """
+    for key in ("added", "removed"):
+        out.write(f"{key.capitalize()} materials: {len(report[key])}\n")
+        for name in report[key][:max_lines]:
+            out.write(f"   {name}\n")
+    out.write(f"Density changes: {len(report['densities'])}\n")
+    for name, old_value, new_value in report["densities"][:max_lines]:
+        out.write(f"   {name:24s} {old_value:14.6e} -> {new_value:14.6e}\n")
+    out.write(f"Mass fraction changes: {len(report['fractions'])}\n")
+    for name, nuc, old_value, new_value in report["fractions"][:max_lines]:
+        out.write(
+            f"   {name:24s} {nuc:8s} {old_value:14.6e} -> {new_value:14.6e}\n"
+        )
+    out.write(f"Citation changes: {len(report['citations'])}\n")
+    for name, old_value, new_value in report["citations"][:max_lines]:
+        out.write(f"   {name:24s} {old_value} -> {new_value}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compares two versions of a JSON material library within "
+        "tolerances, exits with 1 if they differ"
+    )
+    parser.add_argument("old", help="Previous version of the library")
+    parser.add_argument("new", help="New version of the library")
+    parser.add_argument(
+        "--rtol", type=float, default=1e-6, help="Relative tolerance on fractions"
+    )
+    parser.add_argument(
+        "--atol", type=float, default=1e-12, help="Absolute tolerance on fractions"
+    )
+    parser.add_argument(
+        "--density-rtol",
+        type=float,
+        help="Relative tolerance on densities (default: --rtol)",
+    )
+    parser.add_argument(
+        "--density-atol",
+        type=float,
+        default=0.0,
+        help="Absolute tolerance on densities in g/cm3",
+    )
+    parser.add_argument(
+        "--max-lines",
+        type=int,
+        default=50,
+        help="Entries of each kind listed in the summary",
+    )
+    parser.add_argument("--json", dest="json_file", help="Write the full report here")
+    args = parser.parse_args()
+
+    # parsing the JSON dominates, so the two libraries are read in parallel
+    with ProcessPoolExecutor(2) as pool:
+        old, new = pool.map(load_library_arrays, [args.old, args.new])
+    report = diff_libraries(
+        old,
+        new,
+        args.rtol,
+        args.atol,
+        args.density_rtol,
+        args.density_atol,
+    )
+    print_report(report, max_lines=args.max_lines)
+    if args.json_file:
+        with open(args.json_file, "w") as json_file:
+            json.dump(report, json_file, indent=1)
+    sys.exit(1 if has_differences(report) else 0)
+
+
+if __name__ == "__main__":
+    main()
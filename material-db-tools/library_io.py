@@ -0,0 +1,403 @@
+import fnmatch
+import hashlib
+import json
+import mmap
+import os
+import re
+from collections.abc import Mapping
+
+from instrumentation import profiler
+
+
+def material_to_record(mat):
+    """
+    Converts a material into a json serializable dict with the layout of an
+    entry of a PyNE JSON material library.
+
+    Arguments:
+        mat (PyNE material): material to convert.
+
+    Returns:
+        record (dict): dictionary with "atoms_per_molecule", "comp",
+            "density", "mass" and "metadata" entries. The composition is
+            keyed by nuclide name.
+    """
+    from pyne import nucname
+
+    return {
+        "atoms_per_molecule": mat.atoms_per_molecule,
+        "comp": {nucname.name(nuc): frac for nuc, frac in mat.comp.items()},
+        "density": mat.density,
+        "mass": mat.mass,
+        "metadata": {key: mat.metadata[key] for key in mat.metadata.keys()},
+    }
+
+
+def material_from_record(record):
+    """
+    Builds a material from a dict made by material_to_record or read from a
+    PyNE JSON material library. The composition is set as is, without
+    renormalization, so records round trip exactly.
+
+    Arguments:
+        record (dict): material record.
+
+    Returns:
+        mat (PyNE material): the material.
+    """
+    from pyne import nucname
+    from pyne.material import Material
+
+    mat = Material()
+    mat.comp = {nucname.id(nuc): frac for nuc, frac in record["comp"].items()}
+    mat.mass = record["mass"]
+    mat.density = record["density"]
+    mat.atoms_per_molecule = record["atoms_per_molecule"]
+    for key, value in record["metadata"].items():
+        mat.metadata[key] = value
+    return mat
+
+
+class JsonLibraryWriter(object):
+    """
+    Streams materials to a JSON material library file one at a time, so a
+    library can be written without holding it in memory. The file can be
+    read back with MaterialLibrary.from_json. As in a MaterialLibrary, each
+    material gets "name" metadata and keeps its "mat_number" metadata, or
+    gets its position in the stream as mat_number if it has none.
+
+    Arguments:
+        filename (str): name of the library file to write.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.count = 0
+        self._file = open(filename, "w")
+        self._file.write("{")
+
+    def write(self, name, mat):
+        """
+        Appends a material to the library file.
+
+        Arguments:
+            name (str): name of the material in the library.
+            mat (PyNE material or dict): material, or record as returned by
+                material_to_record.
+        """
+        record = mat if isinstance(mat, dict) else material_to_record(mat)
+        self.count += 1
+        record = dict(
+            record,
+            metadata=dict(
+                record["metadata"],
+                name=name,
+                mat_number=record["metadata"].get("mat_number", self.count),
+            ),
+        )
+        self._file.write("," if self.count > 1 else "")
+        self._file.write("\n   " + json.dumps(name) + " : ")
+        self._file.write(json.dumps(record, sort_keys=True))
+
+    def close(self):
+        if not self._file.closed:
+            self._file.write("\n}\n")
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_json_stream(materials, filename):
+    """
+    Writes (name, material) pairs from any iterable, such as the generators
+    in sweep.py, to a JSON material library file as they are produced.
+
+    Arguments:
+        materials (iterable): (name, PyNE material) pairs.
+        filename (str): name of the library file to write.
+
+    Returns:
+        count (int): number of materials written.
+    """
+    with JsonLibraryWriter(filename) as writer:
+        for name, mat in materials:
+            writer.write(name, mat)
+    return writer.count
+
+
+# JSON strings and structural brackets, enough to track nesting depth
+_JSON_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|[{}\[\]]')
+
+
+def scan_library_offsets(filename):
+    """
+    Finds the byte range of every material of a JSON material library
+    without building any material.
+
+    Arguments:
+        filename (str): name of the JSON library file.
+
+    Returns:
+        offsets (dict): dictionary where the keys are material names (str)
+            and the values are [start, end] byte offsets of the material
+            object in the file.
+    """
+    offsets = {}
+    if os.path.getsize(filename) == 0:
+        return offsets
+    with open(filename, "rb") as lib_file, mmap.mmap(
+        lib_file.fileno(), 0, access=mmap.ACCESS_READ
+    ) as buf:
+        depth = 0
+        name = None
+        start = 0
+        for token in _JSON_TOKEN.finditer(buf):
+            char = token.group()[:1]
+            if char == b'"':
+                if depth == 1:
+                    # top level strings alternate between names and values
+                    name = json.loads(token.group()) if name is None else None
+            elif char in b"{[":
+                if depth == 1 and name is not None:
+                    start = token.start()
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 1 and name is not None:
+                    offsets[name] = [start, token.end()]
+                    name = None
+    return offsets
+
+
+class LazyMaterialLibrary(Mapping):
+    """
+    Read only view of a JSON material library that builds a material only
+    when it is first accessed.
+
+    On first open, the byte offset of every material in the file is found
+    and kept in a sidecar index file (filename + ".index"). The index is
+    rebuilt when the library file changes.
+
+    Arguments:
+        filename (str): name of the JSON library file.
+        index_filename (str): name of the sidecar index file. Defaults to
+            filename + ".index"
+    """
+
+    def __init__(self, filename, index_filename=None):
+        self.filename = filename
+        self.index_filename = index_filename or filename + ".index"
+        with profiler.stage("json_index"):
+            self._offsets = self._load_index()
+        self._materials = {}
+
+    def _load_index(self):
+        stat = os.stat(self.filename)
+        stamp = [stat.st_size, stat.st_mtime_ns]
+        try:
+            with open(self.index_filename) as index_file:
+                index = json.load(index_file)
+            if index["stamp"] == stamp:
+                return index["offsets"]
+        except (OSError, ValueError, KeyError):
+            pass
+        offsets = scan_library_offsets(self.filename)
+        try:
+            with open(self.index_filename, "w") as index_file:
+                json.dump({"stamp": stamp, "offsets": offsets}, index_file)
+        except OSError:
+            pass  # read only location, keep the index in memory
+        return offsets
+
+    @staticmethod
+    def _name(key):
+        return key.decode("utf8") if isinstance(key, bytes) else key
+
+    def __getitem__(self, key):
+        name = self._name(key)
+        if name not in self._materials:
+            with profiler.stage("json_load", name):
+                self._materials[name] = material_from_record(self.record(name))
+        return self._materials[name]
+
+    def __contains__(self, key):
+        return self._name(key) in self._offsets
+
+    def __iter__(self):
+        return iter(self._offsets)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def record(self, key):
+        """
+        Returns the raw JSON record of a material as a dict, without
+        building a PyNE material.
+        """
+        start, end = self._offsets[self._name(key)]
+        with open(self.filename, "rb") as lib_file:
+            lib_file.seek(start)
+            return json.loads(lib_file.read(end - start))
+
+    def metadata(self, key):
+        """
+        Returns the metadata of a material, without building it.
+        """
+        return self.record(key)["metadata"]
+
+    def to_library(self, names=None):
+        """
+        Builds a PyNE MaterialLibrary holding some or all of the materials.
+
+        Arguments:
+            names (list of str): names of the materials to include. Defaults
+                to every material in the file.
+        """
+        from pyne.material_library import MaterialLibrary
+
+        mat_lib = MaterialLibrary()
+        for name in self if names is None else names:
+            mat_lib[name] = self[name]
+        return mat_lib
+
+    def write_json(self, filename):
+        self.to_library().write_json(filename)
+
+    def write_openmc(self, filename):
+        self.to_library().write_openmc(filename)
+
+    def write_hdf5(self, filename, *args, **kwargs):
+        self.to_library().write_hdf5(filename, *args, **kwargs)
+
+
+def composition_hash(comp):
+    """
+    Returns a hash of a composition that does not depend on its order.
+
+    Arguments:
+        comp (dict): dictionary where the keys are nuclide ids (int) and the
+            values are mass fractions (float).
+    """
+    content = json.dumps(sorted((int(nuc), frac) for nuc, frac in comp.items()))
+    return hashlib.sha256(content.encode("utf8")).hexdigest()
+
+
+# numeric properties of a property index, which ranges may select on
+RANGE_PROPERTIES = (
+    "mass_density",
+    "atom_density",
+    "molecular_mass",
+    "nuclides",
+    "mat_number",
+)
+
+
+def material_properties(mat):
+    """
+    Returns the summary properties of a material stored in a property
+    index: mass density [g/cm3], atom density [atoms/b-cm], molecular mass
+    [g/mol], number of nuclides, mat_number and composition hash.
+    """
+    comp = dict(mat.comp.items())
+    return {
+        "mass_density": mat.mass_density(),
+        "atom_density": mat.number_density() / 1.0e24,
+        "molecular_mass": mat.molecular_mass(),
+        "nuclides": len(comp),
+        "mat_number": mat.metadata["mat_number"]
+        if "mat_number" in mat.metadata.keys()
+        else None,
+        "composition_hash": composition_hash(comp),
+    }
+
+
+def property_index_filename(library_filename):
+    """
+    Returns the name of the property index of a library file, e.g.
+    PureFusionMaterials_libv1.props.json for PureFusionMaterials_libv1.json
+    """
+    return os.path.splitext(library_filename)[0] + ".props.json"
+
+
+def _file_stamp(filename):
+    stat = os.stat(filename)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def write_property_index(material_library, library_filename):
+    """
+    Writes the property index of a library next to its (already written)
+    library file, so listings and filters do not need to build materials.
+
+    Arguments:
+        material_library (PyNE material library): the library.
+        library_filename (str): name of the library file.
+
+    Returns:
+        index_filename (str): name of the property index file.
+    """
+    index_filename = property_index_filename(library_filename)
+    materials = {}
+    for key, mat in material_library.items():
+        name = key.decode("utf8") if isinstance(key, bytes) else key
+        materials[name] = material_properties(mat)
+    with open(index_filename, "w") as index_file:
+        json.dump(
+            {"stamp": _file_stamp(library_filename), "materials": materials},
+            index_file,
+            indent=1,
+        )
+    return index_filename
+
+
+def read_property_index(library_filename):
+    """
+    Reads the property index of a library file.
+
+    Returns:
+        materials (dict): dictionary where the keys are material names (str)
+            and the values are dictionaries of properties (see
+            material_properties), or None if the library has no index or the
+            index is older than the library file.
+    """
+    try:
+        with open(property_index_filename(library_filename)) as index_file:
+            index = json.load(index_file)
+    except (OSError, ValueError):
+        return None
+    if index.get("stamp") != _file_stamp(library_filename):
+        return None
+    return index["materials"]
+
+
+def filter_property_index(index, patterns=("*",), ranges=None):
+    """
+    Selects materials from a property index without building them.
+
+    Arguments:
+        index (dict): property index as returned by read_property_index.
+        patterns (sequence of str): names or glob patterns to match.
+        ranges (dict): dictionary where the keys are property names (str)
+            and the values are (min, max) bounds. Either bound may be None.
+            Materials without a value of the property do not match.
+
+    Returns:
+        selected (dict): the matching part of the index, in index order.
+    """
+    selected = {}
+    for name, props in index.items():
+        if not any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns):
+            continue
+        if all(
+            props.get(prop) is not None
+            and (low is None or props[prop] >= low)
+            and (high is None or props[prop] <= high)
+            for prop, (low, high) in (ranges or {}).items()
+        ):
+            selected[name] = props
+    return selected
+
@@ -1,25 +1,334 @@
-from pyne import material
-from pyne.material import Material, MultiMaterial
-from pyne.material_library import MaterialLibrary
+import atexit
+import importlib
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from instrumentation import profiler
+from library_io import JsonLibraryWriter, material_from_record, material_to_record
+
+# PyNE is imported by the functions that need it, so tools that only read
+# names and metadata start quickly and work without PyNE. The PyNE names
+# this module used to export are still available as attributes.
+_PYNE_ATTRIBUTES = {
+    "pyne": ("pyne", None),
+    "data": ("pyne.data", None),
+    "material": ("pyne.material", None),
+    "nucname": ("pyne.nucname", None),
+    "Material": ("pyne.material", "Material"),
+    "MultiMaterial": ("pyne.material", "MultiMaterial"),
+    "MaterialLibrary": ("pyne.material_library", "MaterialLibrary"),
+}
+
+
+def __getattr__(name):
+    if name not in _PYNE_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attribute = _PYNE_ATTRIBUTES[name]
+    value = importlib.import_module(module_name)
+    if attribute is not None:
+        value = getattr(value, attribute)
+    globals()[name] = value
+    return value
+
+
+def nuclear_data_version():
+    """
+    Returns a string identifying the installed PyNE and its nuclear data
+    file. Anything derived from nuclear data with a different version is
+    rebuilt.
+    """
+    import pyne
+
+    try:
+        stat = os.stat(pyne.nuc_data)
+    except (AttributeError, OSError):
+        return pyne.__version__
+    return f"{pyne.__version__}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class ElementExpansionCache(object):
+    """
+    Bounded least recently used cache of the natural isotopic breakdown of
+    elements, keyed on element id. Each entry maps the natural isotopes of
+    an element to their (natural abundance, isotope mass, element mass),
+    from which expand_elements computes the mass fractions as PyNE does.
+
+    Arguments:
+        maxsize (int): maximum number of elements to keep. Defaults to 256.
+    """
+
+    # layout of the entries in saved files
+    FORMAT = 2
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getitem__(self, elem):
+        elem = int(elem)
+        if elem in self._entries:
+            self._entries.move_to_end(elem)
+            return self._entries[elem]
+        from pyne import data, nucname
+
+        isotopes = {}
+        elem_mass = data.atomic_mass(elem)
+        znum = nucname.znum(elem)
+        for anum in range(1, 300):
+            iso = znum * 10000000 + anum * 10000
+            abund = data.natural_abund(iso)
+            if abund > 0:
+                isotopes[iso] = (abund, data.atomic_mass(iso), elem_mass)
+        self._entries[elem] = isotopes
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return isotopes
+
+    def clear(self):
+        self._entries.clear()
+
+    def load(self, filename):
+        """
+        Loads expansions saved by save(). Files written with a different
+        nuclear data version are ignored.
+        """
+        if not os.path.exists(filename):
+            return
+        with open(filename) as cache_file:
+            cached = json.load(cache_file)
+        if cached.get("nuclear_data") != nuclear_data_version():
+            return
+        if cached.get("format") != self.FORMAT:
+            return
+        for elem, isotopes in cached["elements"].items():
+            self._entries[int(elem)] = {
+                int(iso): tuple(factors) for iso, factors in isotopes.items()
+            }
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def save(self, filename):
+        """
+        Saves the cached expansions to a JSON file.
+        """
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(filename, "w") as cache_file:
+            json.dump(
+                {
+                    "nuclear_data": nuclear_data_version(),
+                    "format": self.FORMAT,
+                    "elements": self._entries,
+                },
+                cache_file,
+            )
+
+
+# shared by every make_mat and make_mat_from_atom call in the process
+expansion_cache = ElementExpansionCache()
+
+
+def persist_expansion_cache(filename=None):
+    """
+    Loads the shared expansion cache from disk and saves it back when the
+    process exits, so each element is expanded once per machine. Nothing is
+    written to disk unless this is called, as createPurematlib.py does with
+    --persist-expansion.
+
+    Arguments:
+        filename (str): cache file. Defaults to the FMDB_EXPANSION_CACHE
+            environment variable, or
+            ~/.cache/fusion-material-db/expansion_cache.json
+    """
+    if filename is None:
+        filename = os.environ.get(
+            "FMDB_EXPANSION_CACHE",
+            os.path.join(
+                os.path.expanduser("~"),
+                ".cache",
+                "fusion-material-db",
+                "expansion_cache.json",
+            ),
+        )
+    expansion_cache.load(filename)
+    atexit.register(expansion_cache.save, filename)
+
+
+def expand_elements(mat):
+    """
+    Replaces the elements of a material by their natural isotopes, like
+    Material.expand_elements(), using the shared expansion cache.
+
+    The result matches PyNE's: nuclides are visited in id order, each
+    isotope gets abund * frac * A_iso / A_elem evaluated in PyNE's order,
+    and an isotope that is listed next to its element and also produced by
+    the element's expansion takes the expansion's value, not the sum.
+    Unlike PyNE, an element without natural isotopes is kept as is rather
+    than dropped.
+    """
+    from pyne import nucname
+    from pyne.material import Material
+
+    comp = {}
+    for nuc in sorted(mat.comp):
+        frac = mat.comp[nuc]
+        isotopes = expansion_cache[nuc] if nucname.anum(nuc) == 0 else None
+        if not isotopes:
+            comp.setdefault(nuc, frac)
+            continue
+        for iso, (abund, iso_mass, elem_mass) in isotopes.items():
+            comp[iso] = abund * frac * iso_mass / elem_mass
+    expanded = Material(
+        comp,
+        mass=mat.mass,
+        density=mat.density,
+        atoms_per_molecule=mat.atoms_per_molecule,
+    )
+    for key in mat.metadata.keys():
+        expanded.metadata[key] = mat.metadata[key]
+    return expanded
+
 
 def make_mat(nucvec, density, citation, molecular_mass = None):
+    from pyne.material import Material
+
     mat = Material(nucvec, density = density, metadata = {'citation' : citation})
     if molecular_mass:
         mat.molecular_mass = molecular_mass
-    return mat.expand_elements()
+    with profiler.stage("element_expansion"):
+        return expand_elements(mat)
 
 def make_mat_from_atom(atom_frac, density, citation):
+    from pyne.material import Material
+
     mat = Material()
     mat.from_atom_frac(atom_frac)
     mat.density = density
     mat.metadata['citation'] = citation
-    return mat.expand_elements()
+    with profiler.stage("element_expansion"):
+        return expand_elements(mat)
+
+
+def build_material(mat_input):
+    """
+    Builds a material from a mat_data entry of createPurematlib.py
+
+    Arguments:
+        mat_input (dict): dictionary with a "nucvec" (mass fractions) or
+            "atom_frac" (atom fractions) entry, a "density" entry, a
+            "citation" entry and an optional "molecular_mass" entry.
+    """
+    if "atom_frac" in mat_input:
+        return make_mat_from_atom(
+            mat_input["atom_frac"],
+            mat_input["density"],
+            mat_input["citation"],
+        )
+    return make_mat(
+        mat_input["nucvec"],
+        mat_input["density"],
+        mat_input["citation"],
+        mat_input.get("molecular_mass"),
+    )
+
+
+def _portable_entry(mat_input):
+    """
+    Replaces the material keys of a mat_data entry, such as enriched Li, by
+    records so the entry can be sent to a worker process.
+    """
+    from pyne.material import Material
+
+    portable = dict(mat_input)
+    for field in ("nucvec", "atom_frac"):
+        if field in mat_input:
+            portable[field] = [
+                (
+                    material_to_record(key) if isinstance(key, Material) else key,
+                    frac,
+                )
+                for key, frac in mat_input[field].items()
+            ]
+    return portable
+
+
+def _build_portable(item):
+    """
+    Builds one material in a worker process from a (name, portable entry)
+    pair and returns it as a (name, record, stages) triple, where stages
+    are the profiled stages of the build, see Profiler.collect.
+    """
+    name, portable = item
+    mat_input = dict(portable)
+    for field in ("nucvec", "atom_frac"):
+        if field in portable:
+            mat_input[field] = {
+                material_from_record(key) if isinstance(key, dict) else key: frac
+                for key, frac in portable[field]
+            }
+    with profiler.stage("build", name):
+        record = material_to_record(build_material(mat_input))
+    return name, record, profiler.collect()
+
+
+def build_materials(mat_data, processes=1):
+    """
+    Builds the materials of a mat_data dictionary, optionally fanning the
+    construction out over a process pool. The materials are identical to a
+    serial build and come back in the order of mat_data.
+
+    Arguments:
+        mat_data (dict): dictionary where the keys are names of materials
+            (str) and the values are entries accepted by build_material.
+        processes (int): number of worker processes. Defaults to 1, which
+            builds serially in this process. None uses every CPU.
+
+    Returns:
+        materials (dict): dictionary of the built materials by name.
+    """
+    if processes == 1 or len(mat_data) < 2:
+        materials = {}
+        for name, mat_input in mat_data.items():
+            with profiler.stage("build", name):
+                materials[name] = build_material(mat_input)
+        return materials
+    items = [
+        (name, _portable_entry(mat_input)) for name, mat_input in mat_data.items()
+    ]
+    workers = processes or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        built = executor.map(
+            _build_portable, items, chunksize=max(1, len(items) // (4 * workers))
+        )
+        materials = {}
+        for name, record, stages in built:
+            profiler.merge(stages)
+            materials[name] = material_from_record(record)
+        return materials
+
+
+def get_citation(mat):
+    """
+    Returns the citation of a pure material, or the mixture citation of a
+    mixed material.
+    """
+    if "citation" in mat.metadata.keys():
+        return mat.metadata["citation"]
+    return mat.metadata["mixture_citation"]
 
 
 def get_consituent_citations(materials):
     citation_str = ""
     for mat in materials:
-        citation_str = " ".join([citation_str, mat.metadata["citation"]])
+        citation_str = " ".join([citation_str, get_citation(mat)])
     return citation_str
 
 
@@ -38,6 +347,7 @@ def mix_by_volume(material_library, vol_fracs, citation, density_factor=1):
         density_factor (float): Value by which to scale the volume of the
             mixed material. Defaults to 1.
     """
+    from pyne.material import MultiMaterial
 
     mix_dict = {}
 
@@ -45,7 +355,8 @@ def mix_by_volume(material_library, vol_fracs, citation, density_factor=1):
         mix_dict[material_library[name]] = volume_fraction
 
     mix = MultiMaterial(mix_dict)
-    mat = mix.mix_by_volume()
+    with profiler.stage("mixing"):
+        mat = mix.mix_by_volume()
     mat.density *= density_factor
     mat.metadata["mixture_citation"] = citation
     mat.metadata["constituent_citation"] = get_consituent_citations(
@@ -53,3 +364,690 @@ def mix_by_volume(material_library, vol_fracs, citation, density_factor=1):
     )
     return mat
 
+
+def library_names(material_library):
+    """
+    Returns the names of the materials in a library as str, whatever the
+    key type used by the installed PyNE version.
+    """
+    return [
+        key.decode("utf8") if isinstance(key, bytes) else key
+        for key in material_library.keys()
+    ]
+
+
+def atomic_masses(nucids):
+    """
+    Returns the atomic masses [g/mol] of an array of nuclide ids.
+    """
+    from pyne import data
+
+    return np.array([data.atomic_mass(int(nuc)) for nuc in nucids])
+
+
+def library_matrix(material_library, names=None):
+    """
+    Builds a dense materials x nuclides number density matrix from a
+    material library.
+
+    Arguments:
+        material_library (PyNE material library): library containing the
+            materials.
+        names (list of str): names of the materials to place in the rows of
+            the matrix, in order. Defaults to every material in the library.
+
+    Returns:
+        names (list of str): material name of each row.
+        nucids (numpy array of int): nuclide id of each column, sorted.
+        number_densities (numpy array of float): number density [atoms/cm3]
+            of each nuclide (column) in each material (row).
+    """
+    from pyne import data
+
+    if names is None:
+        names = library_names(material_library)
+    mats = [material_library[name] for name in names]
+
+    nucids = sorted({nuc for mat in mats for nuc in mat.comp})
+    columns = {nuc: col for col, nuc in enumerate(nucids)}
+    mass_fracs = np.zeros((len(mats), len(nucids)))
+    for row, mat in enumerate(mats):
+        comp = mat.comp
+        for nuc, frac in comp.items():
+            mass_fracs[row, columns[nuc]] = frac
+    # constituents are mixed by their normalized mass fractions
+    mass_fracs /= mass_fracs.sum(axis=1, keepdims=True)
+
+    nucids = np.array(nucids, dtype=np.int64)
+    densities = np.array([mat.density for mat in mats])
+    number_densities = (
+        mass_fracs * densities[:, None] * data.N_A / atomic_masses(nucids)
+    )
+    return names, nucids, number_densities
+
+
+def matrix_to_materials(nucids, number_densities):
+    """
+    Converts rows of a number density matrix back into mass densities and
+    mass fractions.
+
+    Arguments:
+        nucids (numpy array of int): nuclide id of each column.
+        number_densities (numpy array of float): number density [atoms/cm3]
+            of each nuclide (column) in each material (row).
+
+    Returns:
+        densities (numpy array of float): mass density [g/cm3] of each row.
+        mass_fracs (numpy array of float): mass fraction of each nuclide in
+            each row.
+    """
+    from pyne import data
+
+    partial_densities = number_densities * (atomic_masses(nucids) / data.N_A)
+    densities = partial_densities.sum(axis=1)
+    mass_fracs = partial_densities / densities[:, None]
+    return densities, mass_fracs
+
+
+# number of mixtures mixed per matrix product by the batch mixers
+MIX_CHUNK_SIZE = 4096
+
+
+def _mix_batch(
+    material_library,
+    mixtures,
+    field,
+    amount_per_volume,
+    density_factor,
+    chunk_size=MIX_CHUNK_SIZE,
+):
+    """
+    Mixes many materials with matrix products. The fractions in the `field`
+    entry of each mixture are amounts (volume, mass or atoms) of each
+    constituent, and are turned into volume fractions by dividing by the
+    amount per unit volume of the constituent. Mixtures are mixed in chunks
+    of chunk_size, so the dense volume fraction matrix of a chunk is the
+    largest array built, whatever the number of mixtures.
+
+    Arguments:
+        material_library (PyNE material library): library containing
+            constituent materials.
+        mixtures (dict): mixture definitions, see mix_by_volume_batch.
+        field (str): "vol_fracs", "mass_fracs" or "atom_fracs".
+        amount_per_volume (callable): called with the nuclide ids and the
+            number density matrix of the constituents, returns the amount
+            per unit volume of each constituent, or None for volume.
+        density_factor (float or sequence of float): see
+            mix_by_volume_batch.
+        chunk_size (int): number of mixtures per matrix product.
+    """
+    from pyne.material import Material
+    from pyne.material_library import MaterialLibrary
+
+    constituents = list(
+        dict.fromkeys(name for mix in mixtures.values() for name in mix[field])
+    )
+    with profiler.stage("mixing"):
+        names, nucids, number_densities = library_matrix(
+            material_library, constituents
+        )
+        rows = {name: row for row, name in enumerate(names)}
+        if amount_per_volume is None:
+            amounts = np.ones(len(names))
+        else:
+            amounts = amount_per_volume(nucids, number_densities)
+    density_factor = np.broadcast_to(density_factor, (len(mixtures),))
+
+    citations = {name: get_citation(material_library[name]) for name in names}
+    mix_lib = MaterialLibrary()
+    items = list(mixtures.items())
+    for start in range(0, len(items), chunk_size):
+        chunk = items[start : start + chunk_size]
+        with profiler.stage("mixing"):
+            vol_fracs = np.zeros((len(chunk), len(names)))
+            for mix_row, (_, mix) in enumerate(chunk):
+                for name, frac in mix[field].items():
+                    vol_fracs[mix_row, rows[name]] = frac
+            vol_fracs /= amounts
+            vol_fracs /= vol_fracs.sum(axis=1, keepdims=True)
+            densities, mass_fracs = matrix_to_materials(
+                nucids, vol_fracs @ number_densities
+            )
+            densities *= density_factor[start : start + len(chunk)]
+
+        for mix_row, (mix_name, mix) in enumerate(chunk):
+            present = np.nonzero(mass_fracs[mix_row])[0]
+            mat = Material(
+                dict(
+                    zip(
+                        nucids[present].tolist(),
+                        mass_fracs[mix_row, present].tolist(),
+                    )
+                ),
+                mass=1.0,
+                density=float(densities[mix_row]),
+            )
+            mat.metadata["mixture_citation"] = mix["mixture_citation"]
+            mat.metadata["constituent_citation"] = " ".join(
+                [""] + [citations[name] for name in mix[field]]
+            )
+            mix_lib[mix_name] = mat
+    return mix_lib
+
+
+def mix_by_volume_batch(material_library, mixtures, density_factor=1):
+    """
+    Mixes many materials by volume in batched matrix products. Gives the
+    same density and metadata as calling mix_by_volume for each mixture.
+
+    Arguments:
+        material_library (PyNE material library): library containing
+            constituent materials.
+        mixtures (dict): dictionary where the keys are names of the mixed
+            materials (str) and the values are dictionaries with a
+            "vol_fracs" entry (see mix_by_volume) and a "mixture_citation"
+            entry (str), as in the mat_data of mixPureFusionMaterials.py
+        density_factor (float or sequence of float): Value by which to scale
+            the density of the mixed materials, either one value for all
+            mixtures or one value per mixture. Defaults to 1.
+
+    Returns:
+        mix_lib (PyNE material library): library of the mixed materials in
+            the order of `mixtures`.
+    """
+    return _mix_batch(material_library, mixtures, "vol_fracs", None, density_factor)
+
+
+def _mass_per_volume(nucids, number_densities):
+    from pyne import data
+
+    return number_densities @ (atomic_masses(nucids) / data.N_A)
+
+
+def _atoms_per_volume(nucids, number_densities):
+    return number_densities.sum(axis=1)
+
+
+def mix_by_mass_batch(material_library, mixtures, density_factor=1):
+    """
+    Mixes many materials by mass fraction in batched matrix products, like
+    MultiMaterial.mix_by_mass: the mass fractions are normalized and the
+    volumes of the constituents are additive, so the density of a mixture
+    is 1 / sum(mass_frac / density). Metadata as in mix_by_volume.
+
+    Arguments:
+        material_library (PyNE material library): library containing
+            constituent materials.
+        mixtures (dict): dictionary where the keys are names of the mixed
+            materials (str) and the values are dictionaries with a
+            "mass_fracs" entry, mapping names of constituents to their mass
+            fractions, and a "mixture_citation" entry (str).
+        density_factor (float or sequence of float): Value by which to scale
+            the density of the mixed materials, either one value for all
+            mixtures or one value per mixture. Defaults to 1.
+
+    Returns:
+        mix_lib (PyNE material library): library of the mixed materials in
+            the order of `mixtures`.
+    """
+    return _mix_batch(
+        material_library, mixtures, "mass_fracs", _mass_per_volume, density_factor
+    )
+
+
+def mix_by_atom_batch(material_library, mixtures, density_factor=1):
+    """
+    Mixes many materials by atom fraction in batched matrix products. The
+    atom fraction of a constituent is the fraction of all atoms of the
+    mixture that come from it. The fractions are normalized and the volumes
+    of the constituents are additive. Metadata as in mix_by_volume.
+
+    Arguments:
+        material_library (PyNE material library): library containing
+            constituent materials.
+        mixtures (dict): dictionary where the keys are names of the mixed
+            materials (str) and the values are dictionaries with an
+            "atom_fracs" entry, mapping names of constituents to their atom
+            fractions, and a "mixture_citation" entry (str).
+        density_factor (float or sequence of float): Value by which to scale
+            the density of the mixed materials, either one value for all
+            mixtures or one value per mixture. Defaults to 1.
+
+    Returns:
+        mix_lib (PyNE material library): library of the mixed materials in
+            the order of `mixtures`.
+    """
+    return _mix_batch(
+        material_library, mixtures, "atom_fracs", _atoms_per_volume, density_factor
+    )
+
+
+# nuclide data table of the tools, generated from the installed PyNE by
+# write_nuclide_data() or ensure_nuclide_data(), which createPurematlib.py
+# runs before building the library
+NUCLIDE_DATA_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "nuclide_data.npz"
+)
+
+
+def write_nuclide_data(filename=NUCLIDE_DATA_FILE):
+    """
+    Writes a table of the nuclide ids, names, atomic masses [g/mol] and
+    natural abundances of every element and of every nuclide PyNE has an
+    atomic mass or a natural abundance for, from the installed PyNE.
+
+    Arguments:
+        filename (str): name of the .npz file. Defaults to
+            NUCLIDE_DATA_FILE.
+    """
+    from pyne import data, nucname
+
+    nucids = []
+    for znum in range(1, 119):
+        for anum in range(0, 300):
+            nuc = znum * 10000000 + anum * 10000
+            if anum == 0 or data.natural_abund(nuc) > 0:
+                nucids.append(nuc)
+            elif data.atomic_mass(nuc) != float(anum):
+                # PyNE falls back to the mass number for unknown nuclides
+                nucids.append(nuc)
+    np.savez_compressed(
+        filename,
+        nucids=np.array(nucids, dtype=np.int64),
+        names=np.array([nucname.name(nuc) for nuc in nucids]),
+        atomic_mass=np.array([data.atomic_mass(nuc) for nuc in nucids]),
+        natural_abund=np.array([data.natural_abund(nuc) for nuc in nucids]),
+        avogadro=np.array(data.N_A),
+        nuclear_data=np.array(nuclear_data_version()),
+    )
+    global _nuclide_data
+    _nuclide_data = None
+    return len(nucids)
+
+
+def ensure_nuclide_data(filename=NUCLIDE_DATA_FILE):
+    """
+    Writes the nuclide table if it is missing or was generated from other
+    nuclear data than the installed PyNE's.
+
+    Returns:
+        written (bool): True if the table was (re)written.
+    """
+    if os.path.exists(filename):
+        with np.load(filename) as table:
+            if str(table["nuclear_data"]) == nuclear_data_version():
+                return False
+    write_nuclide_data(filename)
+    return True
+
+
+class NuclideData(object):
+    """
+    Vectorized lookups of nuclide names, atomic masses and natural
+    abundances from the nuclide table, without importing PyNE. Nuclides
+    missing from the table, or every nuclide if the table has not been
+    generated, are looked up in PyNE, and an ImportError says how to
+    generate the table if PyNE is not installed.
+
+    Arguments:
+        filename (str): name of the table written by write_nuclide_data.
+    """
+
+    def __init__(self, filename=NUCLIDE_DATA_FILE):
+        self.filename = filename
+        self.nucids = np.zeros(0, dtype=np.int64)
+        self.names = np.zeros(0, dtype=str)
+        self.atomic_mass = np.zeros(0)
+        self.natural_abund = np.zeros(0)
+        self.avogadro = None
+        if os.path.exists(filename):
+            with np.load(filename) as table:
+                order = np.argsort(table["nucids"])
+                self.nucids = table["nucids"][order]
+                self.names = table["names"][order]
+                self.atomic_mass = table["atomic_mass"][order]
+                self.natural_abund = table["natural_abund"][order]
+                self.avogadro = float(table["avogadro"])
+        self._names = dict(zip(self.nucids.tolist(), self.names.tolist()))
+        self._ids = dict(zip(self.names.tolist(), self.nucids.tolist()))
+
+    def _pyne(self, module, missing):
+        """
+        Imports a PyNE module to look up what the table lacks.
+        """
+        try:
+            return importlib.import_module("pyne." + module)
+        except ImportError:
+            if os.path.exists(self.filename):
+                reason = f"{missing} is not in the nuclide table {self.filename}"
+            else:
+                reason = f"the nuclide table {self.filename} has not been generated"
+            raise ImportError(
+                f"{reason} and PyNE is not installed. Generate the table with "
+                "material_db_tools.write_nuclide_data(), or by running "
+                "createPurematlib.py, where PyNE is installed."
+            ) from None
+
+    def masses(self, nucids):
+        """
+        Returns the atomic masses [g/mol] of an array of nuclide ids.
+        """
+        nucids = np.asarray(nucids, dtype=np.int64)
+        rows = np.searchsorted(self.nucids, nucids)
+        found = rows < len(self.nucids)
+        found[found] = self.nucids[rows[found]] == nucids[found]
+        masses = np.empty(len(nucids))
+        masses[found] = self.atomic_mass[rows[found]]
+        if not found.all():
+            self._pyne("data", f"nuclide {nucids[~found][0]}")
+            masses[~found] = atomic_masses(nucids[~found])
+        return masses
+
+    def abundances(self, nucids):
+        """
+        Returns the natural abundances of an array of nuclide ids, zero for
+        nuclides that do not occur in nature and for elements.
+        """
+        nucids = np.asarray(nucids, dtype=np.int64)
+        rows = np.searchsorted(self.nucids, nucids)
+        found = rows < len(self.nucids)
+        found[found] = self.nucids[rows[found]] == nucids[found]
+        abundances = np.empty(len(nucids))
+        abundances[found] = self.natural_abund[rows[found]]
+        if not found.all():
+            data = self._pyne("data", f"nuclide {nucids[~found][0]}")
+            abundances[~found] = [
+                data.natural_abund(nuc) for nuc in nucids[~found].tolist()
+            ]
+        return abundances
+
+    def natural_isotopes(self, elem):
+        """
+        Returns the natural isotopes of an element, in the layout of the
+        entries of ElementExpansionCache.
+
+        Arguments:
+            elem (int): element id, e.g. 260000000 for Fe.
+
+        Returns:
+            isotopes (dict): dictionary where the keys are the ids of the
+                natural isotopes and the values are their (natural
+                abundance, isotope mass, element mass), in id order.
+        """
+        first = elem // 10000000 * 10000000
+        if len(self.nucids) == 0:
+            data = self._pyne("data", f"element {elem}")
+            nucids = np.arange(first + 10000, first + 3000000, 10000)
+            abundances = np.array([data.natural_abund(nuc) for nuc in nucids.tolist()])
+        else:
+            start, stop = np.searchsorted(self.nucids, [first + 1, first + 10000000])
+            nucids = self.nucids[start:stop]
+            abundances = self.natural_abund[start:stop]
+        natural = abundances > 0
+        nucids, abundances = nucids[natural], abundances[natural]
+        elem_mass = self.masses([elem])[0]
+        return {
+            iso: (abund, mass, elem_mass)
+            for iso, abund, mass in zip(
+                nucids.tolist(), abundances.tolist(), self.masses(nucids).tolist()
+            )
+        }
+
+    def n_a(self):
+        """
+        Returns Avogadro's number as used by the nuclear data.
+        """
+        if self.avogadro is None:
+            self.avogadro = self._pyne("data", "Avogadro's number").N_A
+        return self.avogadro
+
+    def name(self, nuc):
+        if nuc in self._names:
+            return self._names[nuc]
+        return self._pyne("nucname", f"nuclide {nuc}").name(nuc)
+
+    def id(self, name):
+        if name in self._ids:
+            return self._ids[name]
+        return self._pyne("nucname", f"nuclide {name}").id(name)
+
+
+_nuclide_data = None
+
+
+def nuclide_data():
+    """
+    Returns the shared NuclideData, loading the nuclide table on first use.
+    """
+    global _nuclide_data
+    if _nuclide_data is None:
+        _nuclide_data = NuclideData()
+    return _nuclide_data
+
+
+# interned nuclide id arrays, shared by every compact material with the same
+# set of nuclides
+_interned_nucids = {}
+
+
+def intern_nucids(nucids):
+    """
+    Returns the shared read only array of a sorted set of nuclide ids.
+    """
+    nucids = np.asarray(nucids, dtype=np.int64)
+    key = nucids.tobytes()
+    shared = _interned_nucids.get(key)
+    if shared is None:
+        shared = nucids.copy()
+        shared.setflags(write=False)
+        _interned_nucids[key] = shared
+    return shared
+
+
+class CompactMaterial(object):
+    """
+    Array backed material for holding very many materials in memory. The
+    nuclide ids are an interned array shared with every other compact
+    material made of the same nuclides and the mass fractions are a float
+    array. Converts to and from PyNE materials on demand.
+
+    Arguments:
+        nucids (sequence of int): nuclide ids, sorted.
+        fractions (sequence of float): mass fraction of each nuclide.
+        density (float): density [g/cm3].
+        mass (float): mass of the material.
+        atoms_per_molecule (float): atoms per molecule, -1 if unknown.
+        metadata (dict): metadata such as the citation. Defaults to None.
+    """
+
+    __slots__ = (
+        "nucids",
+        "fractions",
+        "density",
+        "mass",
+        "atoms_per_molecule",
+        "metadata",
+    )
+
+    def __init__(
+        self,
+        nucids,
+        fractions,
+        density=-1.0,
+        mass=-1.0,
+        atoms_per_molecule=-1.0,
+        metadata=None,
+    ):
+        self.nucids = intern_nucids(nucids)
+        self.fractions = np.asarray(fractions, dtype=np.float64)
+        self.density = density
+        self.mass = mass
+        self.atoms_per_molecule = atoms_per_molecule
+        self.metadata = metadata
+
+    @classmethod
+    def from_material(cls, mat):
+        """
+        Converts a PyNE material, or anything with comp, density, mass,
+        atoms_per_molecule and metadata attributes.
+        """
+        comp = sorted(mat.comp.items())
+        metadata = {key: mat.metadata[key] for key in mat.metadata.keys()}
+        return cls(
+            [nuc for nuc, _ in comp],
+            [frac for _, frac in comp],
+            mat.density,
+            mat.mass,
+            mat.atoms_per_molecule,
+            metadata or None,
+        )
+
+    @classmethod
+    def from_record(cls, record):
+        """
+        Builds a compact material from a JSON library record, without PyNE
+        if the nuclide table covers its nuclides.
+        """
+        table = nuclide_data()
+        comp = sorted(
+            (table.id(name), frac) for name, frac in record["comp"].items()
+        )
+        return cls(
+            [nuc for nuc, _ in comp],
+            [frac for _, frac in comp],
+            record["density"],
+            record["mass"],
+            record["atoms_per_molecule"],
+            dict(record["metadata"]) or None,
+        )
+
+    @property
+    def comp(self):
+        return dict(zip(self.nucids.tolist(), self.fractions.tolist()))
+
+    def __len__(self):
+        return len(self.nucids)
+
+    def to_material(self):
+        """
+        Returns the equivalent PyNE material.
+        """
+        from pyne.material import Material
+
+        mat = Material()
+        mat.comp = self.comp
+        mat.mass = self.mass
+        mat.density = self.density
+        mat.atoms_per_molecule = self.atoms_per_molecule
+        for key, value in (self.metadata or {}).items():
+            mat.metadata[key] = value
+        return mat
+
+    def to_record(self):
+        """
+        Returns the JSON library record of the material, like
+        library_io.material_to_record.
+        """
+        table = nuclide_data()
+        return {
+            "atoms_per_molecule": self.atoms_per_molecule,
+            "comp": {
+                table.name(nuc): frac
+                for nuc, frac in zip(self.nucids.tolist(), self.fractions.tolist())
+            },
+            "density": self.density,
+            "mass": self.mass,
+            "metadata": dict(self.metadata or {}),
+        }
+
+    def expand_elements(self):
+        """
+        Returns a copy of the material with its elements replaced by their
+        natural isotopes, computed like expand_elements but from the nuclide
+        table, so PyNE is not needed once the table has been generated.
+        """
+        table = nuclide_data()
+        comp = {}
+        for nuc, frac in zip(self.nucids.tolist(), self.fractions.tolist()):
+            isotopes = table.natural_isotopes(nuc) if nuc % 10000000 == 0 else None
+            if not isotopes:
+                comp.setdefault(nuc, frac)
+                continue
+            for iso, (abund, iso_mass, elem_mass) in isotopes.items():
+                comp[iso] = abund * frac * iso_mass / elem_mass
+        comp = sorted(comp.items())
+        fractions = [frac for _, frac in comp]
+        # normalized as PyNE normalizes the expanded material
+        total = sum(fractions)
+        if total != 1.0:
+            fractions = [frac / total for frac in fractions]
+        return CompactMaterial(
+            [nuc for nuc, _ in comp],
+            fractions,
+            self.density,
+            self.mass,
+            self.atoms_per_molecule,
+            dict(self.metadata) if self.metadata else None,
+        )
+
+    def number_densities(self):
+        """
+        Returns the number density [atoms/cm3] of each nuclide.
+        """
+        table = nuclide_data()
+        return (
+            self.density
+            * (self.fractions / self.fractions.sum())
+            * table.n_a()
+            / table.masses(self.nucids)
+        )
+
+
+class CompactLibrary(dict):
+    """
+    Dictionary of CompactMaterial by name, with conversions to and from
+    PyNE material libraries and JSON library files.
+    """
+
+    @classmethod
+    def from_library(cls, material_library):
+        """
+        Converts a PyNE material library, or any mapping of materials.
+        """
+        return cls(
+            (name, CompactMaterial.from_material(material_library[name]))
+            for name in library_names(material_library)
+        )
+
+    @classmethod
+    def from_json(cls, filename):
+        """
+        Reads a JSON material library, without building PyNE materials.
+        """
+        with open(filename) as lib_file:
+            records = json.load(lib_file)
+        return cls(
+            (name, CompactMaterial.from_record(record))
+            for name, record in records.items()
+        )
+
+    def to_library(self, names=None):
+        """
+        Builds a PyNE MaterialLibrary of some or all of the materials.
+        """
+        from pyne.material_library import MaterialLibrary
+
+        mat_lib = MaterialLibrary()
+        for name in self if names is None else names:
+            mat_lib[name] = self[name].to_material()
+        return mat_lib
+
+    def write_json(self, filename):
+        """
+        Writes the materials to a JSON material library file, streaming
+        one record at a time.
+        """
+        with JsonLibraryWriter(filename) as writer:
+            for name, mat in self.items():
+                writer.write(name, mat.to_record())
+        return writer.count
@@ -0,0 +1,294 @@
+"""
+Homogenization of voxel or mesh element compositions from volume fraction
+arrays.
+
+The input is an array of volume fractions with one row per voxel and one
+column per material of a library, read from a .npy file (memory mapped), a
+.npz file or an HDF5 dataset (requires h5py). The voxels are mixed by
+volume, as in mix_by_volume, in vectorized blocks of rows, and each block
+is written out before the next one is read, so the mesh never has to fit
+in memory.
+
+Usage:
+    python mesh_homogenize.py PureFusionMaterials_libv1.json fracs.npy mesh \
+        --materials MF82H HeT410P80 W
+
+writes mesh_nucids.npy, mesh_density.npy and mesh_mass_fracs.npy. An
+output name ending in .h5 writes the same arrays as datasets of one HDF5
+file.
+"""
+import argparse
+
+import numpy as np
+
+import material_db_tools as mdbt
+from instrumentation import profiler
+from library_io import LazyMaterialLibrary
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+HDF5_EXTENSIONS = (".h5", ".hdf5", ".h5m")
+
+COMPOSITIONS = ("mass_fracs", "number_densities")
+
+
+def _require_h5py(filename):
+    if h5py is None:
+        raise ImportError(f"h5py is required to read or write {filename}")
+
+
+def _is_hdf5(filename):
+    return filename.lower().endswith(HDF5_EXTENSIONS)
+
+
+def _names(values):
+    return [
+        value.decode("utf8") if isinstance(value, bytes) else str(value)
+        for value in values
+    ]
+
+
+def open_vol_fracs(filename, dataset="vol_fracs"):
+    """
+    Opens an array of volume fractions without reading it into memory,
+    except for .npz files, which cannot be memory mapped.
+
+    Arguments:
+        filename (str): .npy, .npz or HDF5 file.
+        dataset (str): name of the array in a .npz or HDF5 file. Defaults to
+            "vol_fracs".
+
+    Returns:
+        vol_fracs (array like): (voxels, materials) array, sliceable by
+            rows.
+        materials (list of str): names of the materials of the columns, read
+            from a "materials" array of a .npz file or a "materials"
+            attribute of the HDF5 dataset, or None.
+        handle (file): file to close when done, or None.
+    """
+    if _is_hdf5(filename):
+        _require_h5py(filename)
+        handle = h5py.File(filename, "r")
+        vol_fracs = handle[dataset]
+        materials = vol_fracs.attrs.get("materials")
+        return vol_fracs, None if materials is None else _names(materials), handle
+    if filename.lower().endswith(".npz"):
+        with np.load(filename) as arrays:
+            materials = arrays["materials"] if "materials" in arrays else None
+            return (
+                arrays[dataset],
+                None if materials is None else _names(materials),
+                None,
+            )
+    return np.load(filename, mmap_mode="r"), None, None
+
+
+def homogenize_blocks(
+    vol_fracs, number_densities, nucids, chunk_size=65536, normalize=True
+):
+    """
+    Mixes the voxels of a volume fraction array block by block.
+
+    Voxels whose volume fractions are all zero are void and get a density
+    and composition of zero.
+
+    Arguments:
+        vol_fracs (array like): (voxels, materials) volume fractions.
+        number_densities (numpy array of float): number densities
+            [atoms/cm3] of each nuclide (column) in each material (row), as
+            returned by material_db_tools.library_matrix.
+        nucids (numpy array of int): nuclide id of each column of
+            number_densities.
+        chunk_size (int): number of voxels per block.
+        normalize (bool): scale the volume fractions of each voxel to sum to
+            one, as mix_by_volume does. If False, the rest of each voxel is
+            void and lowers its density.
+
+    Yields:
+        start (int): index of the first voxel of the block.
+        densities (numpy array of float): density [g/cm3] of each voxel.
+        number_densities (numpy array of float): number density
+            [atoms/cm3] of each nuclide (column) in each voxel (row).
+    """
+    grams_per_atom = mdbt.atomic_masses(nucids) / mdbt.data.N_A
+    for start in range(0, len(vol_fracs), chunk_size):
+        block = np.asarray(vol_fracs[start : start + chunk_size], dtype=np.float64)
+        if normalize:
+            totals = block.sum(axis=1, keepdims=True)
+            block = np.divide(
+                block, totals, out=np.zeros_like(block), where=totals > 0
+            )
+        mixed = block @ number_densities
+        yield start, mixed @ grams_per_atom, mixed
+
+
+class _Writer(object):
+    """
+    Writes the homogenized arrays to .npy files or HDF5 datasets as blocks
+    arrive.
+    """
+
+    def __init__(self, output, nucids, n_voxels, composition, dtype):
+        self.composition = composition
+        self._grams_per_atom = mdbt.atomic_masses(nucids) / mdbt.data.N_A
+        shape = (n_voxels, len(nucids))
+        if _is_hdf5(output):
+            _require_h5py(output)
+            self._file = h5py.File(output, "w")
+            self._file.create_dataset("nucids", data=nucids)
+            self.density = self._file.create_dataset("density", (n_voxels,), dtype)
+            self.values = self._file.create_dataset(
+                composition,
+                shape,
+                dtype,
+                chunks=(max(1, min(n_voxels, 4096)), len(nucids)),
+            )
+        else:
+            self._file = None
+            np.save(output + "_nucids.npy", nucids)
+            self.density = np.lib.format.open_memmap(
+                output + "_density.npy", "w+", dtype, (n_voxels,)
+            )
+            self.values = np.lib.format.open_memmap(
+                output + f"_{composition}.npy", "w+", dtype, shape
+            )
+
+    def write(self, start, densities, number_densities):
+        stop = start + len(densities)
+        self.density[start:stop] = densities
+        if self.composition == "number_densities":
+            self.values[start:stop] = number_densities
+            return
+        partial = number_densities * self._grams_per_atom
+        self.values[start:stop] = np.divide(
+            partial,
+            densities[:, None],
+            out=np.zeros_like(partial),
+            where=densities[:, None] > 0,
+        )
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        else:
+            self.density.flush()
+            self.values.flush()
+
+
+def homogenize(
+    material_library,
+    input_filename,
+    output,
+    materials=None,
+    dataset="vol_fracs",
+    chunk_size=65536,
+    normalize=True,
+    composition="mass_fracs",
+    dtype=np.float64,
+):
+    """
+    Homogenizes every voxel of a volume fraction file and streams the
+    densities and compositions to disk.
+
+    Arguments:
+        material_library (PyNE material library or LazyMaterialLibrary):
+            library containing the materials of the columns.
+        input_filename (str): .npy, .npz or HDF5 file of volume fractions.
+        output (str): name of an HDF5 file (.h5), or prefix of the .npy
+            files, for the nuclide ids, densities and compositions.
+        materials (list of str): material of each column. Defaults to the
+            names stored with the volume fractions.
+        dataset (str): name of the volume fractions in a .npz or HDF5 file.
+        chunk_size (int): number of voxels mixed per block.
+        normalize (bool): see homogenize_blocks.
+        composition (str): "mass_fracs" to write mass fractions or
+            "number_densities" to write number densities [atoms/cm3].
+        dtype (numpy dtype): type of the output arrays, float32 halves the
+            size on disk.
+
+    Returns:
+        n_voxels (int): number of voxels homogenized.
+    """
+    if composition not in COMPOSITIONS:
+        raise ValueError(f"composition must be one of {', '.join(COMPOSITIONS)}")
+    vol_fracs, stored_materials, handle = open_vol_fracs(input_filename, dataset)
+    try:
+        materials = materials or stored_materials
+        if materials is None:
+            raise ValueError(
+                f"{input_filename} does not name the material of each column"
+            )
+        if len(materials) != vol_fracs.shape[1]:
+            raise ValueError(
+                f"{len(materials)} materials given for {vol_fracs.shape[1]} columns"
+            )
+        _, nucids, number_densities = mdbt.library_matrix(
+            material_library, list(materials)
+        )
+        writer = _Writer(output, nucids, len(vol_fracs), composition, dtype)
+        try:
+            with profiler.stage("homogenize"):
+                for start, densities, mixed in homogenize_blocks(
+                    vol_fracs, number_densities, nucids, chunk_size, normalize
+                ):
+                    writer.write(start, densities, mixed)
+        finally:
+            writer.close()
+    finally:
+        if handle is not None:
+            handle.close()
+    return len(vol_fracs)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Homogenizes voxel compositions from volume fraction arrays"
+    )
+    parser.add_argument("library", help="JSON material library of the columns")
+    parser.add_argument("vol_fracs", help=".npy, .npz or HDF5 volume fractions")
+    parser.add_argument("output", help="Output .h5 file or prefix of .npy files")
+    parser.add_argument(
+        "--materials", nargs="+", help="Material of each column, in order"
+    )
+    parser.add_argument(
+        "--dataset", default="vol_fracs", help="Array name in .npz or HDF5 input"
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=65536, help="Voxels mixed per block"
+    )
+    parser.add_argument(
+        "--no-normalize",
+        help="Treat the rest of a voxel whose volume fractions sum to less "
+        "than one as void",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--composition", choices=COMPOSITIONS, default="mass_fracs"
+    )
+    parser.add_argument("--dtype", choices=["float64", "float32"], default="float64")
+    args = parser.parse_args()
+
+    if args.library.lower().endswith(".json"):
+        material_library = LazyMaterialLibrary(args.library)
+    else:
+        material_library = mdbt.MaterialLibrary(args.library)
+    n_voxels = homogenize(
+        material_library,
+        args.vol_fracs,
+        args.output,
+        args.materials,
+        args.dataset,
+        args.chunk_size,
+        not args.no_normalize,
+        args.composition,
+        np.dtype(args.dtype),
+    )
+    print(f" Homogenized {n_voxels} voxels into {args.output}")
+    profiler.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Mixtures of mixtures with incremental re-mixing.
+
+A constituent of a mixture may name another mixture of the same mat_data
+dictionary (e.g. breeding zone -> blanket module -> sector). A pure
+material takes precedence over a mixture of the same name, as it did
+before mixtures could be nested, so a constituent only refers to a
+mixture when the pure library has no material of that name. A mixture
+that names itself, such as the "Pb" pass-through entry, always refers to
+the pure material.
+
+Mixtures are mixed in dependency order, one batch per generation of the
+dependency graph. Every mixture gets a fingerprint built from its own
+definition and the fingerprints of its constituents. Only mixtures whose
+fingerprint changed since the last run are re-mixed, which covers every
+mixture downstream of a changed pure material.
+"""
+import hashlib
+import json
+import os
+from graphlib import CycleError, TopologicalSorter
+
+import material_db_tools as mdbt
+from library_io import material_from_record, material_to_record
+
+
+def is_mixture_reference(mat_data, mix_name, constituent, pure_library=()):
+    """
+    Returns True if a constituent of a mixture refers to another mixture
+    rather than to a pure material of pure_library.
+    """
+    return (
+        constituent in mat_data
+        and constituent != mix_name
+        and constituent not in pure_library
+    )
+
+
+def dependency_graph(mat_data, pure_library=()):
+    """
+    Returns a dictionary where the keys are mixture names and the values
+    are the sets of mixtures each one references.
+    """
+    return {
+        name: {
+            constituent
+            for constituent in mix["vol_fracs"]
+            if is_mixture_reference(mat_data, name, constituent, pure_library)
+        }
+        for name, mix in mat_data.items()
+    }
+
+
+def mixing_generations(mat_data, pure_library=()):
+    """
+    Orders the mixtures so that every mixture comes after the mixtures it
+    references, given the names of the pure materials.
+
+    Returns:
+        generations (list of list of str): groups of mixtures that only
+            depend on earlier groups and can be mixed in one batch.
+    """
+    sorter = TopologicalSorter(dependency_graph(mat_data, pure_library))
+    try:
+        sorter.prepare()
+    except CycleError as error:
+        raise ValueError(
+            "mixtures reference each other in a cycle: "
+            + " -> ".join(error.args[1])
+        )
+    position = {name: index for index, name in enumerate(mat_data)}
+    generations = []
+    while sorter.is_active():
+        ready = sorted(sorter.get_ready(), key=position.get)
+        generations.append(ready)
+        sorter.done(*ready)
+    return generations
+
+
+def _digest(content):
+    return hashlib.sha256(
+        json.dumps(content, sort_keys=True).encode("utf8")
+    ).hexdigest()
+
+
+def _pure_fingerprint(pure_library, name):
+    """
+    Fingerprint of a pure material from its composition, density and
+    citation. The library's mat_number and name metadata are left out.
+    """
+    if hasattr(pure_library, "record"):
+        record = pure_library.record(name)
+    else:
+        record = material_to_record(pure_library[name])
+    return _digest(
+        [record["comp"], record["density"], record["metadata"].get("citation")]
+    )
+
+
+def fingerprints(pure_library, mat_data, generations=None):
+    """
+    Computes the fingerprint of every mixture.
+
+    Arguments:
+        pure_library (PyNE material library or LazyMaterialLibrary):
+            library of the pure constituents.
+        mat_data (dict): mixture definitions, as in
+            mixPureFusionMaterials.py
+        generations (list of list of str): mixing order as returned by
+            mixing_generations. Computed if not given.
+
+    Returns:
+        fingerprints (dict): dictionary of fingerprints (str) by mixture.
+    """
+    generations = generations or mixing_generations(mat_data, pure_library)
+    pure_prints = {}
+    mix_prints = {}
+    for generation in generations:
+        for name in generation:
+            mix = mat_data[name]
+            constituents = []
+            for constituent, frac in sorted(mix["vol_fracs"].items()):
+                if is_mixture_reference(mat_data, name, constituent, pure_library):
+                    constituent_print = mix_prints[constituent]
+                else:
+                    if constituent not in pure_prints:
+                        pure_prints[constituent] = _pure_fingerprint(
+                            pure_library, constituent
+                        )
+                    constituent_print = pure_prints[constituent]
+                constituents.append([constituent, frac, constituent_print])
+            mix_prints[name] = _digest(
+                [
+                    constituents,
+                    mix["mixture_citation"],
+                    mix.get("density_factor", 1),
+                ]
+            )
+    return mix_prints
+
+
+def _mixture_record(mat):
+    """
+    Record of a mixed material without the name and mat_number metadata
+    given to it by a library.
+    """
+    record = material_to_record(mat)
+    for key in ("name", "mat_number"):
+        record["metadata"].pop(key, None)
+    return record
+
+
+def remix(pure_library, mat_data, state_filename=None):
+    """
+    Mixes every mixture of mat_data, re-mixing only the mixtures whose
+    definition or constituents changed since the previous run.
+
+    Arguments:
+        pure_library (PyNE material library or LazyMaterialLibrary):
+            library of the pure constituents.
+        mat_data (dict): mixture definitions with "vol_fracs",
+            "mixture_citation" and optional "density_factor" entries.
+            Constituents may name other mixtures of mat_data.
+        state_filename (str): JSON file holding the fingerprints and mixed
+            materials of the previous run. Defaults to None, in which case
+            everything is mixed and no state is kept.
+
+    Returns:
+        mix_lib (PyNE material library): library of all mixtures in the
+            order of mat_data.
+        remixed (list of str): names of the mixtures that were re-mixed.
+    """
+    generations = mixing_generations(mat_data, pure_library)
+    prints = fingerprints(pure_library, mat_data, generations)
+
+    state = {"fingerprints": {}, "records": {}}
+    if state_filename is not None and os.path.exists(state_filename):
+        with open(state_filename) as state_file:
+            state = json.load(state_file)
+
+    mixed = {}
+    remixed = []
+    for generation in generations:
+        stale = []
+        for name in generation:
+            if state["fingerprints"].get(name) == prints[name]:
+                mixed[name] = material_from_record(state["records"][name])
+            else:
+                stale.append(name)
+        if not stale:
+            continue
+        constituents = {}
+        for name in stale:
+            for constituent in mat_data[name]["vol_fracs"]:
+                if is_mixture_reference(mat_data, name, constituent, pure_library):
+                    constituents[constituent] = mixed[constituent]
+                else:
+                    constituents[constituent] = pure_library[constituent]
+        batch = {name: mat_data[name] for name in stale}
+        density_factors = [mix.get("density_factor", 1) for mix in batch.values()]
+        batch_lib = mdbt.mix_by_volume_batch(constituents, batch, density_factors)
+        for name in stale:
+            state["records"][name] = _mixture_record(batch_lib[name])
+            mixed[name] = material_from_record(state["records"][name])
+            state["fingerprints"][name] = prints[name]
+        remixed += stale
+
+    mix_lib = mdbt.MaterialLibrary()
+    for mat_number, name in enumerate(mat_data, 1):
+        mixed[name].metadata["mat_number"] = mat_number
+        mix_lib[name] = mixed[name]
+
+    if state_filename is not None:
+        state = {
+            key: {name: state[key][name] for name in mat_data}
+            for key in ("fingerprints", "records")
+        }
+        with open(state_filename, "w") as state_file:
+            json.dump(state, state_file)
+    return mix_lib, remixed
@@ -0,0 +1,200 @@
+"""
+Densities of gases and liquid coolants and breeders at many state points.
+
+The densities are computed in one vectorized pass over arrays of
+temperatures and pressures, and materials are emitted in bulk from a single
+expansion of the base composition. Names follow the scheme of
+createPurematlib.py, e.g. "HeT410P80" for He at 410 C and 80 bar, or
+"LiNatT500" for natural Li at 500 C.
+
+Temperatures are in degrees Celsius and pressures in bar, as in the names
+of the existing entries. Densities are in g/cm3.
+
+Helium state points use the "helium" model, the KTA 3102.1 correlation that
+the HeT410P1 and HeT410P80 entries are computed with. Helium is less dense
+than an ideal gas, by about 1.4% at 410 C and 80 bar.
+"""
+import numpy as np
+from pyne.material import Material
+
+import material_db_tools as mdbt
+
+# molar gas constant in J/(mol K)
+GAS_CONSTANT = 8.314462618
+
+# temperatures in C are converted to K by adding this offset
+KELVIN = 273.15
+
+# helium density correlation of KTA 3102.1, as given in WidodoJoPCS_2018:
+# rho = a p / T / (1 + b p / T**1.2) in kg/m3, p in bar, T in K
+HELIUM_CORRELATION = (48.14, 0.4446, "WidodoJoPCS_2018")
+
+# liquid density correlations: name -> (a, b, (Tmin, Tmax), citation) with
+# rho = a - b * T in g/cm3, T in K, valid from Tmin to Tmax in K
+LIQUID_CORRELATIONS = {
+    # reproduces 0.485 g/cm3 at 500 C used by LiNatT500
+    "Li": (0.562, 1.0e-4, (453.7, 1500.0), "DavisonNASATND4650_1968"),
+    # Pb-17Li eutectic
+    "LiPb": (10.52035, 1.19051e-3, (508.0, 880.0), "MasDeLesVallsJNM_2008"),
+    "Flibe": (2.413, 4.88e-4, (732.2, 4498.8), "SohalINLEXT-10-18297_2013"),
+}
+
+
+def _state_arrays(*values):
+    """
+    Broadcasts state point values to flat float arrays of a common length.
+    """
+    arrays = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(value, dtype=float)) for value in values)
+    )
+    return [array.ravel() for array in arrays]
+
+
+def ideal_gas_density(temperature, pressure, molar_mass):
+    """
+    Computes ideal gas densities.
+
+    Arguments:
+        temperature (float or array of float): temperatures in C.
+        pressure (float or array of float): pressures in bar, broadcast
+            against temperature.
+        molar_mass (float): molar mass of the gas in g/mol.
+
+    Returns:
+        density (numpy array of float): densities in g/cm3.
+    """
+    temperature, pressure = _state_arrays(temperature, pressure)
+    kelvin = temperature + KELVIN
+    if np.any(kelvin <= 0):
+        raise ValueError("temperatures must be above absolute zero")
+    # P [Pa] M [g/mol] / (R T) is in g/m3
+    return pressure * 1.0e5 * molar_mass / (GAS_CONSTANT * kelvin) * 1.0e-6
+
+
+def helium_density(temperature, pressure):
+    """
+    Computes helium densities from HELIUM_CORRELATION.
+
+    Arguments:
+        temperature (float or array of float): temperatures in C.
+        pressure (float or array of float): pressures in bar, broadcast
+            against temperature.
+
+    Returns:
+        density (numpy array of float): densities in g/cm3.
+    """
+    temperature, pressure = _state_arrays(temperature, pressure)
+    kelvin = temperature + KELVIN
+    if np.any(kelvin <= 0):
+        raise ValueError("temperatures must be above absolute zero")
+    a, b, _ = HELIUM_CORRELATION
+    return a * pressure / kelvin / (1.0 + b * pressure / kelvin**1.2) * 1.0e-3
+
+
+def liquid_density(liquid, temperature):
+    """
+    Computes liquid densities from the correlations in LIQUID_CORRELATIONS.
+
+    Arguments:
+        liquid (str): name of the correlation, e.g. "Li", "LiPb" or "Flibe".
+        temperature (float or array of float): temperatures in C.
+
+    Returns:
+        density (numpy array of float): densities in g/cm3.
+    """
+    if liquid not in LIQUID_CORRELATIONS:
+        raise ValueError(
+            f"no density correlation for {liquid}, "
+            f"expected one of {', '.join(LIQUID_CORRELATIONS)}"
+        )
+    a, b, (t_min, t_max), _ = LIQUID_CORRELATIONS[liquid]
+    (temperature,) = _state_arrays(temperature)
+    kelvin = temperature + KELVIN
+    outside = (kelvin < t_min) | (kelvin > t_max)
+    if np.any(outside):
+        raise ValueError(
+            f"temperature {temperature[outside][0]:g} C is outside the range "
+            f"of the {liquid} correlation, {t_min - KELVIN:g} to "
+            f"{t_max - KELVIN:g} C"
+        )
+    return a - b * kelvin
+
+
+def state_point_name(base_name, temperature, pressure=None):
+    """
+    Returns the name of a material at one state point, e.g. "HeT410P80".
+    """
+    name = f"{base_name}T{temperature:g}"
+    if pressure is not None:
+        name += f"P{pressure:g}"
+    return name
+
+
+def state_point_materials(
+    base_name, mat_input, model, temperature, pressure=None, atoms_per_molecule=1
+):
+    """
+    Builds a material for each state point of a gas or liquid.
+
+    Temperatures and pressures are paired point by point, with scalars
+    broadcast against arrays, so per-zone state points of a thermal
+    calculation can be passed directly. Identical state points give
+    identical names.
+
+    Arguments:
+        base_name (str): name of the base material, used to name the
+            materials, e.g. "He" or "LiNat".
+        mat_input (dict): mat_data entry with "nucvec" or "atom_frac",
+            "density" and "citation" entries, as in createPurematlib.py.
+            The density of the entry is not used.
+        model (str): "ideal_gas", "helium" for HELIUM_CORRELATION, which
+            matches the existing He entries, or the name of a liquid
+            correlation in LIQUID_CORRELATIONS.
+        temperature (float or array of float): temperatures in C.
+        pressure (float or array of float): pressures in bar. Required for
+            "ideal_gas" and "helium" and not used for liquids.
+        atoms_per_molecule (int): atoms per gas molecule, used to compute
+            the molar mass of an ideal gas. Defaults to 1, as for He.
+
+    Yields:
+        name (str): name of the material at each state point.
+        mat (PyNE material): the material at each state point.
+    """
+    base = mdbt.build_material(mat_input)
+    if model == "ideal_gas":
+        if pressure is None:
+            raise ValueError("a pressure is required for an ideal gas")
+        temperature, pressure = _state_arrays(temperature, pressure)
+        nucids = list(base.comp)
+        fracs = np.array([base.comp[nuc] for nuc in nucids])
+        mean_mass = 1.0 / np.sum(fracs / mdbt.atomic_masses(nucids))
+        densities = ideal_gas_density(
+            temperature, pressure, atoms_per_molecule * mean_mass
+        )
+        citation = mat_input["citation"]
+        pressures = pressure.tolist()
+    elif model == "helium":
+        if pressure is None:
+            raise ValueError("a pressure is required for helium")
+        temperature, pressure = _state_arrays(temperature, pressure)
+        densities = helium_density(temperature, pressure)
+        citation = HELIUM_CORRELATION[2]
+        pressures = pressure.tolist()
+    else:
+        densities = liquid_density(model, temperature)
+        (temperature,) = _state_arrays(temperature)
+        citation = LIQUID_CORRELATIONS[model][3]
+        pressures = [None] * len(temperature)
+
+    for temp, pres, density in zip(temperature.tolist(), pressures, densities):
+        mat = Material(
+            dict(base.comp),
+            mass=base.mass,
+            density=float(density),
+            atoms_per_molecule=base.atoms_per_molecule,
+        )
+        mat.metadata["citation"] = citation
+        mat.metadata["temperature"] = temp
+        if pres is not None:
+            mat.metadata["pressure"] = pres
+        yield state_point_name(base_name, temp, pres), mat
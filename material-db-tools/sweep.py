@@ -0,0 +1,247 @@
+"""
+Parametric sweeps over material definitions.
+
+Each sweep builds a whole family of materials over a grid of parameters in
+one vectorized pass and yields (name, material) pairs, so families can be
+streamed to a library with library_io.write_json_stream. Names are built
+deterministically from the base name and the parameter values, e.g.
+"Li4SiO4nat_Li6_0.9_DF_0.85".
+"""
+import numpy as np
+from pyne import data, nucname
+from pyne.material import Material
+
+import material_db_tools as mdbt
+
+# enrichable elements: element -> (enriched isotope, balance isotope)
+ENRICHED_ISOTOPES = {
+    "Li": ("Li6", "Li7"),
+    "B": ("B10", "B11"),
+}
+
+
+def parameter_grid(axes):
+    """
+    Builds the cartesian product of parameter ranges.
+
+    Arguments:
+        axes (dict): dictionary where the keys are parameter labels (str)
+            and the values are sequences of parameter values (float).
+
+    Returns:
+        grid (dict): dictionary with the same keys, where each value is a
+            flat numpy array holding the parameter value at every point.
+    """
+    values = [
+        np.atleast_1d(np.asarray(axis, dtype=float)) for axis in axes.values()
+    ]
+    mesh = np.meshgrid(*values, indexing="ij")
+    return {label: points.ravel() for label, points in zip(axes, mesh)}
+
+
+def sweep_name(base_name, grid, point):
+    """
+    Returns the deterministic name of one point of a sweep.
+
+    Arguments:
+        base_name (str): name of the material the sweep is based on.
+        grid (dict): parameter grid as returned by parameter_grid.
+        point (int): index of the point in the grid.
+    """
+    return base_name + "".join(
+        f"_{label}_{values[point]:.6g}" for label, values in grid.items()
+    )
+
+
+def _enrichable_element(key):
+    """
+    Returns the symbol of an enrichable element, or None for any other
+    key of a nucvec or atom_frac dictionary. The element is either natural,
+    e.g. "Li" or 30000000, or a material made of its isotopes only, like
+    li_enriched_90 in createPurematlib.py.
+    """
+    if isinstance(key, Material):
+        elements = {nucname.znum(nuc) for nuc in key.comp}
+        if len(elements) != 1:
+            return None
+        symbol = nucname.name(elements.pop() * 10000000)
+        return symbol if symbol in ENRICHED_ISOTOPES else None
+    nuc = nucname.id(key)
+    if nucname.anum(nuc) != 0:
+        return None
+    symbol = nucname.name(nuc)
+    return symbol if symbol in ENRICHED_ISOTOPES else None
+
+
+def _key_mass(key):
+    """
+    Returns the mass of one atom (or molecule, for material keys) of an
+    atom_frac key in g/mol.
+    """
+    if isinstance(key, Material):
+        return key.molecular_mass()
+    return data.atomic_mass(nucname.id(key))
+
+
+def sweep_material(
+    base_name,
+    mat_input,
+    li6_enrichment=None,
+    b10_enrichment=None,
+    density_factor=None,
+):
+    """
+    Builds a family of materials from a mat_data entry over a grid of Li-6
+    enrichment, B-10 enrichment and density factor.
+
+    The Li or B of the entry, natural or already enriched like
+    liXweightfraction in createPurematlib.py, is replaced by Li or B
+    enriched to each value of the grid. The other constituents are expanded
+    once and shared by every point.
+
+    Arguments:
+        base_name (str): name of the base material, used to name the family.
+        mat_input (dict): mat_data entry with "nucvec" or "atom_frac",
+            "density" and "citation" entries, as in createPurematlib.py.
+        li6_enrichment (sequence of float): weight fractions of Li-6 in Li.
+        b10_enrichment (sequence of float): weight fractions of B-10 in B.
+        density_factor (sequence of float): values by which to scale the
+            density, e.g. packing fractions of a pebble bed.
+
+    Yields:
+        name (str): name of the material at each grid point.
+        mat (PyNE material): the material at each grid point.
+    """
+    enrichments = {}
+    if li6_enrichment is not None:
+        enrichments["Li"] = li6_enrichment
+    if b10_enrichment is not None:
+        enrichments["B"] = b10_enrichment
+
+    axes = {
+        ENRICHED_ISOTOPES[elem][0]: values for elem, values in enrichments.items()
+    }
+    if density_factor is not None:
+        axes["DF"] = density_factor
+    grid = parameter_grid(axes) if axes else {}
+    n_points = len(next(iter(grid.values()))) if grid else 1
+
+    by_atom = "atom_frac" in mat_input
+    fracs = mat_input["atom_frac"] if by_atom else mat_input["nucvec"]
+    amounts = dict.fromkeys(enrichments, 0.0)
+    rest = {}
+    for key, frac in fracs.items():
+        elem = _enrichable_element(key)
+        if elem in amounts:
+            amounts[elem] += frac
+        else:
+            rest[key] = frac
+    for elem, amount in amounts.items():
+        if amount == 0:
+            raise ValueError(f"{base_name} contains no {elem} to enrich")
+
+    # mass of each nuclide per unit of the base definition at every point
+    masses = {}
+    if rest:
+        if by_atom:
+            rest_mat = mdbt.make_mat_from_atom(rest, 1.0, "")
+            rest_mass = sum(frac * _key_mass(key) for key, frac in rest.items())
+        else:
+            rest_mat = mdbt.make_mat(rest, 1.0, "")
+            rest_mass = sum(rest.values())
+        for nuc, frac in rest_mat.comp.items():
+            masses[nuc] = np.full(n_points, rest_mass * frac)
+    for elem, amount in amounts.items():
+        light, heavy = (nucname.id(iso) for iso in ENRICHED_ISOTOPES[elem])
+        enrichment = grid[ENRICHED_ISOTOPES[elem][0]]
+        elem_mass = np.full(n_points, amount)
+        if by_atom:
+            elem_mass *= 1.0 / (
+                enrichment / data.atomic_mass(light)
+                + (1.0 - enrichment) / data.atomic_mass(heavy)
+            )
+        masses[light] = masses.get(light, 0.0) + elem_mass * enrichment
+        masses[heavy] = masses.get(heavy, 0.0) + elem_mass * (1.0 - enrichment)
+
+    nucids = sorted(masses)
+    mass_matrix = np.column_stack([masses[nuc] for nuc in nucids])
+    total_mass = mass_matrix.sum(axis=1)
+    mass_fracs = mass_matrix / total_mass[:, None]
+    densities = mat_input["density"] * grid.get("DF", np.ones(n_points))
+    atoms_per_molecule = sum(fracs.values()) if by_atom else -1.0
+
+    for point in range(n_points):
+        present = np.nonzero(mass_fracs[point])[0]
+        mat = Material(
+            {nucids[col]: float(mass_fracs[point, col]) for col in present},
+            mass=float(total_mass[point]),
+            density=float(densities[point]),
+            atoms_per_molecule=atoms_per_molecule,
+        )
+        mat.metadata["citation"] = mat_input["citation"]
+        mat.metadata["sweep_base"] = base_name
+        yield sweep_name(base_name, grid, point), mat
+
+
+def sweep_mixture(
+    material_library,
+    base_name,
+    mix_input,
+    vol_fracs=None,
+    balance=None,
+    density_factor=None,
+):
+    """
+    Builds a family of mixtures from a mixture definition over a grid of
+    volume fractions and density factor, mixing all of them in one batch
+    with mix_by_volume_batch.
+
+    Arguments:
+        material_library (PyNE material library): library containing
+            constituent materials.
+        base_name (str): name of the base mixture, used to name the family.
+        mix_input (dict): mixture definition with "vol_fracs" and
+            "mixture_citation" entries, as in mixPureFusionMaterials.py
+        vol_fracs (dict): dictionary where the keys are names of
+            constituents (str) and the values are sequences of volume
+            fractions to sweep. Other constituents keep their volume fraction.
+        balance (str): constituent whose volume fraction is set so that the
+            volume fractions of each point sum to one. Defaults to None, in
+            which case the volume fractions are normalized as in
+            mix_by_volume.
+        density_factor (sequence of float): values by which to scale the
+            density of the mixtures.
+
+    Yields:
+        name (str): name of the mixture at each grid point.
+        mat (PyNE material): the mixture at each grid point.
+    """
+    axes = dict(vol_fracs or {})
+    if density_factor is not None:
+        axes["DF"] = density_factor
+    grid = parameter_grid(axes) if axes else {}
+    n_points = len(next(iter(grid.values()))) if grid else 1
+
+    mixtures = {}
+    for point in range(n_points):
+        point_fracs = dict(mix_input["vol_fracs"])
+        for name in vol_fracs or {}:
+            point_fracs[name] = float(grid[name][point])
+        if balance is not None:
+            point_fracs[balance] = 0.0
+            point_fracs[balance] = 1.0 - sum(point_fracs.values())
+            if point_fracs[balance] < 0:
+                raise ValueError(
+                    f"volume fractions of {sweep_name(base_name, grid, point)} "
+                    "exceed one"
+                )
+        mixtures[sweep_name(base_name, grid, point)] = {
+            "vol_fracs": point_fracs,
+            "mixture_citation": mix_input["mixture_citation"],
+        }
+
+    mix_lib = mdbt.mix_by_volume_batch(
+        material_library, mixtures, grid.get("DF", np.ones(n_points))
+    )
+    for name in mixtures:
+        yield name, mix_lib[name]
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the tools are flat modules, imported as in the scripts that use them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from binary_library import BinaryMaterialLibrary, write_binary_library
+from material_db_tools import CompactMaterial
+
+LIBRARY = {
+    "steel": CompactMaterial(
+        [240520000, 260560000], [0.1, 0.9], 7.9, 1.0, -1.0, {"citation": "s"}
+    ),
+    "water": CompactMaterial(
+        [10010000, 80160000], [0.111, 0.889], 1.0, 2.0, 3.0, {"mat_number": 7}
+    ),
+    "tungsten": CompactMaterial([741840000], [1.0], 19.3, 1.0, -1.0, {}),
+}
+
+
+@pytest.fixture
+def filename(tmp_path):
+    filename = str(tmp_path / "lib.fmdb")
+    assert write_binary_library(LIBRARY, filename) == len(LIBRARY)
+    return filename
+
+
+def test_write_then_read_round_trip(filename):
+    with BinaryMaterialLibrary(filename) as lib:
+        assert list(lib) == list(LIBRARY)
+        for row, (name, mat) in enumerate(LIBRARY.items()):
+            nucids, fractions = lib.composition(name)
+            np.testing.assert_array_equal(nucids, mat.nucids)
+            np.testing.assert_array_equal(fractions, mat.fractions)
+            assert lib.properties[row].tolist() == [
+                mat.density,
+                mat.mass,
+                mat.atoms_per_molecule,
+            ]
+            assert lib.metadata[row] == (mat.metadata or {})
+
+
+def test_close_with_live_views(filename):
+    lib = BinaryMaterialLibrary(filename)
+    fractions = lib.fractions
+    nucids, copied = lib.composition("water")
+    lib.close()
+    lib.close()
+    np.testing.assert_array_equal(copied, [0.111, 0.889])
+    assert fractions[-1] == 1.0
+
+
+def test_materials_outlive_the_library(filename):
+    pytest.importorskip("pyne")
+    with BinaryMaterialLibrary(filename) as lib:
+        steel = lib["steel"]
+    assert steel.comp == {240520000: 0.1, 260560000: 0.9}
+    assert steel.density == 7.9
+    assert steel.metadata["citation"] == "s"
@@ -0,0 +1,86 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("pyne")
+
+import material_db_tools as mdbt  # noqa: E402
+from build_cache import BuildCache, entry_hash  # noqa: E402
+
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        "pureMaterials",
+    ),
+)
+import createPurematlib  # noqa: E402
+
+NAMES = ["SS316LN", "Pb157Li90", "HeT410P1", "W"]
+
+
+def subset():
+    return {name: dict(createPurematlib.mat_data[name]) for name in NAMES}
+
+
+def test_entry_hash():
+    steel = {"nucvec": {"Fe": 0.9, "Cr": 0.1}, "density": 7.9, "citation": "a"}
+    reordered = {"citation": "a", "density": 7.9, "nucvec": {"Cr": 0.1, "Fe": 0.9}}
+    assert entry_hash(steel, "v1") == entry_hash(reordered, "v1")
+    assert entry_hash(steel, "v1") != entry_hash(steel, "v2")
+    assert entry_hash(steel, "v1") != entry_hash(dict(steel, density=8.0), "v1")
+    # material keys hash by content
+    lithium = createPurematlib.mat_data["Pb157Li90"]
+    assert entry_hash(lithium, "v1") == entry_hash(dict(lithium), "v1")
+
+
+def test_build_cache_reuses_unchanged_entries(tmp_path):
+    filename = str(tmp_path / "cache.json")
+    entries = subset()
+    cache = BuildCache(filename)
+    for name, mat in mdbt.build_materials(entries).items():
+        cache.put(name, entries[name], mat)
+    cache.save()
+
+    cache = BuildCache(filename)
+    assert not cache.modified
+    cached = cache.get("W", entries["W"])
+    built = mdbt.build_material(entries["W"])
+    assert cached.comp == pytest.approx(built.comp)
+    assert cached.density == built.density
+    assert cache.get("W", dict(entries["W"], density=19.0)) is None
+    assert cache.get("Be", createPurematlib.mat_data["Be"]) is None
+
+    cache.prune(["W", "SS316LN"])
+    assert cache.modified
+    assert cache.get("HeT410P1", entries["HeT410P1"]) is None
+
+
+def run_main(monkeypatch, capsys, entries, use_cache=True):
+    monkeypatch.setattr(createPurematlib, "mat_data", entries)
+    createPurematlib.main(use_cache=use_cache)
+    with open("PureFusionMaterials_libv1.json") as lib_file:
+        return capsys.readouterr().out, lib_file.read()
+
+
+def test_incremental_rebuild(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(mdbt, "NUCLIDE_DATA_FILE", str(tmp_path / "nuclides.npz"))
+    entries = subset()
+    out, first = run_main(monkeypatch, capsys, entries)
+    assert f"Rebuilt {len(NAMES)} of {len(NAMES)}" in out
+
+    out, second = run_main(monkeypatch, capsys, entries)
+    assert f"Rebuilt 0 of {len(NAMES)}" in out
+    assert "up to date" in out
+    assert second == first
+
+    entries["W"] = dict(entries["W"], density=19.0)
+    out, cached = run_main(monkeypatch, capsys, entries)
+    assert f"Rebuilt 1 of {len(NAMES)}" in out
+    assert cached != first
+
+    out, uncached = run_main(monkeypatch, capsys, entries, use_cache=False)
+    assert f"Rebuilt {len(NAMES)} of {len(NAMES)}" in out
+    assert uncached == cached
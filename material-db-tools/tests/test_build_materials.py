@@ -0,0 +1,49 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("pyne")
+
+from pyne.material_library import MaterialLibrary  # noqa: E402
+
+import material_db_tools as mdbt  # noqa: E402
+from instrumentation import profiler  # noqa: E402
+
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        "pureMaterials",
+    ),
+)
+from createPurematlib import mat_data  # noqa: E402
+
+# nucvec and atom_frac entries, and entries with material keys
+NAMES = ["SS316LN", "W", "Pb157Li90", "Li4SiO4Li60.0", "HeT410P1", "YBa2Cu3O7"]
+
+
+def written_library(tmp_path, processes):
+    mat_lib = MaterialLibrary()
+    entries = {name: mat_data[name] for name in NAMES}
+    for name, mat in mdbt.build_materials(entries, processes).items():
+        mat_lib[name] = mat
+    filename = str(tmp_path / f"lib{processes}.json")
+    mat_lib.write_json(filename)
+    with open(filename) as lib_file:
+        return lib_file.read()
+
+
+def test_process_pool_build_matches_serial(tmp_path):
+    assert written_library(tmp_path, 2) == written_library(tmp_path, 1)
+
+
+def test_process_pool_build_is_profiled(tmp_path, monkeypatch):
+    monkeypatch.setenv("FMDB_PROFILE", str(tmp_path / "profile.json"))
+    monkeypatch.setattr(profiler, "report_filename", str(tmp_path / "profile.json"))
+    monkeypatch.setattr(profiler, "stages", {})
+    monkeypatch.setattr(profiler, "materials", {})
+    written_library(tmp_path, 2)
+    assert profiler.stages["build"]["calls"] == len(NAMES)
+    assert profiler.stages["element_expansion"]["calls"] == len(NAMES)
+    assert set(profiler.materials) == set(NAMES)
@@ -0,0 +1,133 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("pyne")
+
+from pyne.material_library import MaterialLibrary  # noqa: E402
+
+import material_db_tools as mdbt  # noqa: E402
+from library_io import property_index_filename, write_property_index  # noqa: E402
+
+SCRIPT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "convertPyneMatLib.py"
+)
+
+
+@pytest.fixture
+def library(tmp_path):
+    mat_lib = MaterialLibrary()
+    mat_lib["steel"] = mdbt.make_mat({"Fe": 0.9, "Cr": 0.1}, 7.9, "steel_ref")
+    mat_lib["water"] = mdbt.make_mat({"H1": 0.111, "O16": 0.889}, 1.0, "water_ref")
+    mat_lib["tungsten"] = mdbt.make_mat({"W": 1.0}, 19.3, "tungsten_ref")
+    filename = str(tmp_path / "lib.json")
+    mat_lib.write_json(filename)
+    write_property_index(mat_lib, filename)
+    return filename
+
+
+def convert(library, *args, stdin=""):
+    return subprocess.run(
+        [sys.executable, SCRIPT, "-f", library] + list(args),
+        input=stdin,
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(library),
+    )
+
+
+def jsonl(result):
+    return [json.loads(line) for line in result.stdout.splitlines()]
+
+
+def test_query_table(library):
+    result = convert(library, "-q", "steel", "w*")
+    assert result.returncode == 0
+    lines = result.stdout.splitlines()
+    assert lines[0].split() == [
+        "name",
+        "mass_density",
+        "atom_density",
+        "molecular_mass",
+    ]
+    rows = {line.split()[0]: line.split()[1:] for line in lines[1:]}
+    assert sorted(rows) == ["steel", "water"]
+    assert float(rows["steel"][0]) == pytest.approx(7.9)
+
+
+def test_query_names_from_stdin(library):
+    result = convert(
+        library, "-q", "-", "--format", "jsonl", stdin="tungsten\nsteel\n"
+    )
+    assert result.returncode == 0
+    assert [row["name"] for row in jsonl(result)] == ["tungsten", "steel"]
+
+
+def test_query_jsonl(library):
+    result = convert(
+        library,
+        "-q",
+        "*",
+        "--format",
+        "jsonl",
+        "--properties",
+        "mass_density",
+        "citation",
+    )
+    assert result.returncode == 0
+    rows = jsonl(result)
+    assert [set(row) for row in rows] == [{"name", "mass_density", "citation"}] * 3
+    tungsten = {row["name"]: row for row in rows}["tungsten"]
+    assert tungsten["citation"] == "tungsten_ref"
+    assert tungsten["mass_density"] == pytest.approx(19.3)
+
+
+@pytest.mark.parametrize("indexed", [True, False])
+def test_query_range(library, indexed):
+    if not indexed:
+        os.remove(property_index_filename(library))
+    result = convert(
+        library, "-q", "*", "--format", "jsonl", "--range", "mass_density", "5", "inf"
+    )
+    assert result.returncode == 0
+    assert sorted(row["name"] for row in jsonl(result)) == ["steel", "tungsten"]
+
+    result = convert(
+        library,
+        "-q",
+        "*",
+        "--format",
+        "jsonl",
+        "--range",
+        "mass_density",
+        "0",
+        "10",
+        "--range",
+        "nuclides",
+        "3",
+        "inf",
+    )
+    assert [row["name"] for row in jsonl(result)] == ["steel"]
+
+
+def test_query_range_of_unknown_property(library):
+    result = convert(library, "-q", "*", "--range", "density", "1", "2")
+    assert result.returncode == 2
+    assert "invalid property 'density'" in result.stderr
+    result = convert(library, "-q", "*", "--range", "mass_density", "low", "2")
+    assert result.returncode == 2
+
+
+def test_query_without_match_fails(library):
+    result = convert(library, "-q", "steel", "concrete")
+    assert result.returncode == 1
+    assert [line.split()[0] for line in result.stdout.splitlines()[1:]] == ["steel"]
+    assert "No material matches concrete" in result.stderr
+
+    result = convert(library, "-q", "*", "--range", "mass_density", "100", "inf")
+    assert result.returncode == 1
+    assert result.stdout.splitlines()[1:] == []
+    assert "No material is in the requested ranges" in result.stderr
@@ -0,0 +1,61 @@
+import numpy as np
+
+from dedup import cluster_compositions, deduplicate_records
+
+
+def record(comp, density, citation="ref"):
+    return {
+        "atoms_per_molecule": -1.0,
+        "comp": comp,
+        "density": density,
+        "mass": 1.0,
+        "metadata": {"citation": citation},
+    }
+
+
+RECORDS = {
+    "steel": record({"Fe56": 0.9, "Cr52": 0.1}, 7.9),
+    "water": record({"H1": 0.111, "O16": 0.889}, 1.0),
+    # same composition, unnormalized
+    "steel_copy": record({"Fe56": 1.8, "Cr52": 0.2}, 7.9),
+    # within the tolerances, across a rounding boundary of the hash
+    "steel_near": record({"Fe56": 0.9 + 6e-7, "Cr52": 0.1 - 6e-7}, 7.9 * (1 + 5e-7)),
+    # outside the density tolerance
+    "steel_dense": record({"Fe56": 0.9, "Cr52": 0.1}, 8.0),
+    "water_copy": record({"O16": 0.889, "H1": 0.111}, 1.0, "other"),
+}
+
+
+def test_cluster_compositions():
+    representative = cluster_compositions(
+        [rec["comp"] for rec in RECORDS.values()],
+        [rec["density"] for rec in RECORDS.values()],
+    )
+    np.testing.assert_array_equal(representative, [0, 1, 0, 0, 4, 1])
+
+
+def test_deduplicate_records():
+    unique, aliases = deduplicate_records(RECORDS)
+    assert list(unique) == ["steel", "water", "steel_dense"]
+    assert aliases == {
+        "steel_copy": "steel",
+        "steel_near": "steel",
+        "water_copy": "water",
+    }
+    assert unique["steel"]["metadata"]["aliases"] == ["steel_copy", "steel_near"]
+    assert "aliases" not in unique["steel_dense"]["metadata"]
+    assert "aliases" not in RECORDS["steel"]["metadata"]
+
+
+def test_deduplicate_is_idempotent():
+    unique, _ = deduplicate_records(RECORDS)
+    again, aliases = deduplicate_records(unique)
+    assert again == unique
+    assert aliases == {}
+
+
+def test_reference_materials():
+    reference = {"Fe_steel": RECORDS["steel"]}
+    unique, aliases = deduplicate_records(RECORDS, reference=reference)
+    assert list(unique) == ["water", "steel_dense"]
+    assert aliases["steel"] == aliases["steel_copy"] == "Fe_steel"
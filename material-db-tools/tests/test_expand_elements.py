@@ -0,0 +1,68 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("pyne")
+
+from pyne.material import Material  # noqa: E402
+
+import material_db_tools as mdbt  # noqa: E402
+
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        "pureMaterials",
+    ),
+)
+from createPurematlib import mat_data  # noqa: E402
+
+
+def pyne_build(mat_input):
+    """
+    Builds a mat_data entry with Material.expand_elements(), as the tools
+    did before the expansion cache.
+    """
+    if "atom_frac" in mat_input:
+        mat = Material()
+        mat.from_atom_frac(mat_input["atom_frac"])
+    else:
+        mat = Material(mat_input["nucvec"])
+    mat.density = mat_input["density"]
+    return mat.expand_elements()
+
+
+@pytest.mark.parametrize("name", list(mat_data))
+def test_matches_pyne_expand_elements(name):
+    mdbt.expansion_cache.clear()
+    built = mdbt.build_material(mat_data[name])
+    expected = pyne_build(mat_data[name])
+    assert built.comp == expected.comp
+    assert built.density == expected.density
+    assert built.mass == expected.mass
+    assert built.atoms_per_molecule == expected.atoms_per_molecule
+
+
+def test_element_next_to_its_isotope():
+    nucvec = {"Fe": 0.5, "Fe56": 0.3, "Fe60": 0.1, "Cr52": 0.1}
+    built = mdbt.make_mat(nucvec, 7.9, "")
+    expected = Material(nucvec, density=7.9).expand_elements()
+    assert built.comp == expected.comp
+
+
+def test_expansion_cache_file(tmp_path):
+    filename = str(tmp_path / "expansion.json")
+    cache = mdbt.ElementExpansionCache()
+    iron = cache[260000000]
+    cache.save(filename)
+    loaded = mdbt.ElementExpansionCache()
+    loaded.load(filename)
+    assert loaded[260000000] == iron
+
+
+def test_building_writes_nothing_to_home(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.delenv("FMDB_EXPANSION_CACHE", raising=False)
+    mdbt.build_materials({"W": mat_data["W"]})
+    assert os.listdir(tmp_path) == []
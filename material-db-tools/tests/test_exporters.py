@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+pytest.importorskip("pyne")
+
+import exporters  # noqa: E402
+import material_db_tools as mdbt  # noqa: E402
+
+MATERIALS = [
+    ("steel", mdbt.make_mat({"Fe": 0.9, "Cr": 0.1}, 7.9, "steel_ref")),
+    ("water", mdbt.make_mat({"H1": 0.111, "O16": 0.889}, 1.0, "water_ref")),
+    ("tungsten", mdbt.make_mat({"W": 1.0}, 19.3, "tungsten_ref")),
+]
+
+# the HDF5 writer is left out, the files it writes are not byte for byte
+# reproducible
+FORMATS = [fmt for fmt in exporters.EXPORT_FORMATS if fmt != "hdf5"]
+
+
+def read_output(filename):
+    if isinstance(filename, tuple):
+        return [read_output(part) for part in filename]
+    if os.path.isdir(filename):
+        return {name: read_output(os.path.join(filename, name))
+                for name in sorted(os.listdir(filename))}
+    with open(filename, "rb") as out:
+        return out.read()
+
+
+def test_write_mcnp_matches_material_cards(tmp_path):
+    atom_filename = str(tmp_path / "atom.txt")
+    mass_filename = str(tmp_path / "mass.txt")
+    count = exporters.write_mcnp(MATERIALS, atom_filename, mass_filename)
+    assert count == len(MATERIALS)
+    with open(atom_filename) as atom_file:
+        assert atom_file.read() == "".join(mat.mcnp("atom") for _, mat in MATERIALS)
+    with open(mass_filename) as mass_file:
+        assert mass_file.read() == "".join(mat.mcnp() for _, mat in MATERIALS)
+
+
+def test_output_filenames():
+    filenames = exporters.output_filenames("lib", ["mcnp", "json"])
+    assert filenames == {
+        "mcnp": ("lib_mcnpAtomfrac.txt", "lib_mcnpMassfrac.txt"),
+        "json": "lib_libv1.json",
+    }
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_export_library_matches_serial_writers(tmp_path, processes):
+    serial = exporters.output_filenames(str(tmp_path / "serial"), FORMATS)
+    for fmt, filename in serial.items():
+        exporters.EXPORT_FORMATS[fmt][0](list(MATERIALS), filename)
+
+    concurrent = exporters.output_filenames(str(tmp_path / "concurrent"), FORMATS)
+    counts = exporters.export_library(
+        dict(MATERIALS), concurrent, max_workers=2, processes=processes
+    )
+    assert counts == {fmt: len(MATERIALS) for fmt in FORMATS}
+    for fmt in FORMATS:
+        assert read_output(concurrent[fmt]) == read_output(serial[fmt]), fmt
+
+
+def test_export_library_rejects_unknown_formats(tmp_path):
+    with pytest.raises(ValueError):
+        exporters.export_library(
+            dict(MATERIALS), {"mcnp_atom": str(tmp_path / "atom.txt")}
+        )
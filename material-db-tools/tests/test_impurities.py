@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip("pyne")
+
+from impurities import impurity_variants, read_impurity_table  # noqa: E402
+
+
+def write_table(tmp_path, rows):
+    filename = tmp_path / "grades.csv"
+    filename.write_text(
+        "grade,element,wppm\n" + "".join(f"{row}\n" for row in rows)
+    )
+    return str(filename)
+
+
+def test_read_impurity_table(tmp_path):
+    filename = write_table(
+        tmp_path,
+        [
+            "ITER,B,10",
+            "ITER,Co,0-500",
+            "ITER,Nb, 1e-3 ",
+            "lowact,Co,1e-3-2.5E-2",
+            "lowact,Nb,.5 - 1.5",
+        ],
+    )
+    assert read_impurity_table(filename) == {
+        "ITER": {"B": 10.0, "Co": (0.0, 500.0), "Nb": 1e-3},
+        "lowact": {"Co": (1e-3, 2.5e-2), "Nb": (0.5, 1.5)},
+    }
+
+
+@pytest.mark.parametrize("wppm", ["-5", "1-2-3", "ten", "-1-5"])
+def test_read_impurity_table_rejects(tmp_path, wppm):
+    with pytest.raises(ValueError, match="wppm of Co in grade ITER"):
+        read_impurity_table(write_table(tmp_path, [f"ITER,Co,{wppm}"]))
+
+
+def test_variants_keep_balance(tmp_path):
+    base = {
+        "nucvec": {"Fe": 0.9, "Cr": 0.1},
+        "density": 7.9,
+        "citation": "steel_ref",
+    }
+    grades = {"ITER": {"Co": (0, 500), "Nb": 100}, "lowact": {"Co": 10}}
+    variants = dict(impurity_variants("steel", base, grades))
+    for name, mat in variants.items():
+        assert sum(mat.comp.values()) == pytest.approx(1.0)
+        assert mat.density == 7.9
+    co = sum(
+        frac
+        for nuc, frac in variants["steel_ITER"].comp.items()
+        if nuc // 10000000 == 27
+    )
+    assert co == pytest.approx(500e-6)
@@ -0,0 +1,63 @@
+import io
+import threading
+
+from instrumentation import Profiler
+
+MIB = 2**20
+
+
+def test_nested_stages():
+    profiler = Profiler("unused.json")
+    with profiler.stage("outer", "steel"):
+        with profiler.stage("inner"):
+            block = bytearray(4 * MIB)
+        del block
+    outer = profiler.stages["outer"]
+    inner = profiler.materials["steel"]["inner"]
+    assert outer["calls"] == inner["calls"] == 1
+    assert inner["peak_memory_bytes"] >= 4 * MIB
+    assert outer["peak_memory_bytes"] >= inner["peak_memory_bytes"]
+    assert outer["concurrent_calls"] == inner["concurrent_calls"] == 0
+
+
+def test_concurrent_stages_record_process_peak():
+    profiler = Profiler("unused.json")
+    barrier = threading.Barrier(2)
+
+    def write(name, size):
+        with profiler.stage(name):
+            barrier.wait()
+            block = bytearray(size)
+            barrier.wait()
+            del block
+
+    threads = [
+        threading.Thread(target=write, args=("write_a", 2 * MIB)),
+        threading.Thread(target=write, args=("write_b", 6 * MIB)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for name in ("write_a", "write_b"):
+        total = profiler.stages[name]
+        assert total["concurrent_calls"] == 1
+        assert total["peak_memory_bytes"] == 0
+        assert total["process_peak_memory_bytes"] >= 8 * MIB
+    out = io.StringIO()
+    profiler.summary(out)
+    assert "ran concurrently" in out.getvalue()
+
+
+def test_collect_and_merge():
+    worker = Profiler("unused.json")
+    with worker.stage("write_openmc", "steel"):
+        pass
+    stages = worker.collect()
+    assert worker.stages == {} and worker.materials == {}
+
+    parent = Profiler("unused.json")
+    parent.merge(stages)
+    parent.merge(stages)
+    assert parent.stages["write_openmc"]["calls"] == 2
+    assert parent.materials["steel"]["write_openmc"]["calls"] == 2
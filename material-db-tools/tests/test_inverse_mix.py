@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("pyne")
+
+from pyne.material import Material  # noqa: E402
+from pyne.material_library import MaterialLibrary  # noqa: E402
+
+import material_db_tools as mdbt  # noqa: E402
+from inverse_mix import (  # noqa: E402
+    fit_vol_fracs,
+    fitted_mixtures,
+    library_jacobian,
+    project_simplex,
+)
+
+CONSTITUENTS = ["steel", "water", "tungsten"]
+
+VOL_FRACS = np.array(
+    [
+        [0.34, 0.66, 0.0],
+        [0.2, 0.3, 0.5],
+        [0.0, 0.0, 1.0],
+        [0.6, 0.1, 0.3],
+    ]
+)
+
+
+def constituent_library():
+    mat_lib = MaterialLibrary()
+    for name, nucvec, density in (
+        ("steel", {"Fe56": 0.9, "Cr52": 0.1}, 7.9),
+        ("water", {"H1": 0.111, "O16": 0.889}, 1.0),
+        ("tungsten", {"W184": 1.0}, 19.3),
+    ):
+        mat = Material(nucvec, density=density)
+        mat.metadata["citation"] = name + "_ref"
+        mat_lib[name] = mat
+    return mat_lib
+
+
+def targets(mat_lib, vol_fracs):
+    names = [f"target{row}" for row in range(len(vol_fracs))]
+    mixtures = fitted_mixtures(names, CONSTITUENTS, vol_fracs, "targets")
+    mix_lib = mdbt.mix_by_volume_batch(mat_lib, mixtures)
+    _, nucids, number_densities = mdbt.library_matrix(mix_lib, names)
+    return nucids, number_densities, [mix_lib[name].density for name in names]
+
+
+def test_fit_recovers_known_fractions():
+    mat_lib = constituent_library()
+    nucids, number_densities, densities = targets(mat_lib, VOL_FRACS)
+    vol_fracs, residuals = fit_vol_fracs(
+        mat_lib, CONSTITUENTS, nucids, number_densities, densities
+    )
+    np.testing.assert_allclose(vol_fracs, VOL_FRACS, atol=1e-6)
+    np.testing.assert_allclose(vol_fracs.sum(axis=1), 1.0)
+    assert np.all(residuals < 1e-10)
+
+
+def test_fit_density_only():
+    mat_lib = constituent_library()
+    vol_fracs, residuals = fit_vol_fracs(
+        mat_lib, ["steel", "tungsten"], target_density=[7.9, 13.6, 19.3]
+    )
+    np.testing.assert_allclose(
+        vol_fracs, [[1.0, 0.0], [0.5, 0.5], [0.0, 1.0]], atol=1e-6
+    )
+    assert np.all(residuals < 1e-10)
+
+
+def test_jacobian_matches_finite_differences():
+    mat_lib = constituent_library()
+    vol_fracs = VOL_FRACS[1:2]
+    _, mixed, jacobian, density, density_jacobian = library_jacobian(
+        mat_lib, CONSTITUENTS, vol_fracs
+    )
+    step = 1e-6
+    for col in range(len(CONSTITUENTS)):
+        shifted = vol_fracs.copy()
+        shifted[0, col] += step
+        _, mixed_step, _, density_step, _ = library_jacobian(
+            mat_lib, CONSTITUENTS, shifted
+        )
+        np.testing.assert_allclose(
+            (mixed_step - mixed)[0] / step,
+            jacobian[0, col],
+            rtol=1e-4,
+            atol=1e-6 * np.abs(mixed).max(),
+        )
+        assert (density_step - density)[0] / step == pytest.approx(
+            density_jacobian[0, col], rel=1e-4
+        )
+
+
+def test_project_simplex():
+    points = np.array([[0.2, 0.3, 0.5], [2.0, 0.0, 0.0], [-1.0, 0.5, 0.7]])
+    projected = project_simplex(points)
+    np.testing.assert_allclose(projected[0], points[0])
+    np.testing.assert_allclose(projected[1], [1.0, 0.0, 0.0])
+    np.testing.assert_allclose(projected[2], [0.0, 0.4, 0.6])
@@ -0,0 +1,122 @@
+import json
+
+import pytest
+
+from library_diff import diff_libraries, has_differences, load_library_arrays
+
+LIBRARY = {
+    "steel": {
+        "comp": {"Fe56": 0.9, "Cr52": 0.1},
+        "density": 7.9,
+        "metadata": {"citation": "steel_ref"},
+    },
+    "water": {
+        "comp": {"H1": 0.111, "O16": 0.889},
+        "density": 1.0,
+        "metadata": {"mixture_citation": "water_ref"},
+    },
+    "tungsten": {
+        "comp": {"W184": 1.0},
+        "density": 19.3,
+        "metadata": {"citation": "tungsten_ref"},
+    },
+}
+
+
+def arrays(tmp_path, name, library):
+    filename = tmp_path / (name + ".json")
+    filename.write_text(json.dumps(library))
+    return load_library_arrays(str(filename))
+
+
+def diff(tmp_path, old, new, **tolerances):
+    return diff_libraries(
+        arrays(tmp_path, "old", old), arrays(tmp_path, "new", new), **tolerances
+    )
+
+
+def changed(**changes):
+    library = json.loads(json.dumps(LIBRARY))
+    for name, record in changes.items():
+        library[name].update(record)
+    return library
+
+
+def test_identical_libraries(tmp_path):
+    report = diff(tmp_path, LIBRARY, LIBRARY)
+    assert not has_differences(report)
+
+
+def test_added_and_removed_materials(tmp_path):
+    new = {name: LIBRARY[name] for name in ("steel", "water")}
+    new["lead"] = {"comp": {"Pb208": 1.0}, "density": 11.3, "metadata": {}}
+    report = diff(tmp_path, LIBRARY, new)
+    assert report["added"] == ["lead"]
+    assert report["removed"] == ["tungsten"]
+    assert report["densities"] == report["fractions"] == report["citations"] == []
+
+
+def test_density_tolerance(tmp_path):
+    # |new - old| = 7.9e-6 and rtol * max(|old|, |new|) is just above or below
+    report = diff(tmp_path, LIBRARY, changed(steel={"density": 7.9 + 7.9e-6}))
+    assert report["densities"] == []
+    report = diff(tmp_path, LIBRARY, changed(steel={"density": 7.9 + 8.0e-6}))
+    assert report["densities"] == [["steel", 7.9, 7.9 + 8.0e-6]]
+    report = diff(
+        tmp_path,
+        LIBRARY,
+        changed(steel={"density": 7.95}),
+        density_rtol=0.0,
+        density_atol=0.05 + 1e-12,
+    )
+    assert report["densities"] == []
+    report = diff(
+        tmp_path,
+        LIBRARY,
+        changed(steel={"density": 7.95}),
+        density_atol=0.049,
+    )
+    assert report["densities"] == [["steel", 7.9, 7.95]]
+
+
+def test_fraction_tolerance(tmp_path):
+    at = changed(water={"comp": {"H1": 0.111, "O16": 0.889 + 0.889e-6}})
+    report = diff(tmp_path, LIBRARY, at, atol=0.0)
+    assert report["fractions"] == []
+    past = changed(water={"comp": {"H1": 0.111, "O16": 0.889 + 0.9e-6}})
+    report = diff(tmp_path, LIBRARY, past, atol=0.0)
+    assert report["fractions"] == [["water", "O16", 0.889, 0.889 + 0.9e-6]]
+    assert report["densities"] == []
+
+
+def test_nuclide_added_to_a_material(tmp_path):
+    new = changed(tungsten={"comp": {"W184": 0.99, "W186": 0.01}})
+    report = diff(tmp_path, LIBRARY, new)
+    assert report["fractions"] == [
+        ["tungsten", "W184", 1.0, 0.99],
+        ["tungsten", "W186", 0.0, 0.01],
+    ]
+
+
+def test_citation_change(tmp_path):
+    new = changed(water={"metadata": {"citation": "water_ref_2"}})
+    report = diff(tmp_path, LIBRARY, new)
+    assert report["citations"] == [["water", "water_ref", "water_ref_2"]]
+
+
+def test_disjoint_libraries(tmp_path):
+    new = {"lead": {"comp": {"Pb208": 1.0}, "density": 11.3, "metadata": {}}}
+    report = diff(tmp_path, LIBRARY, new)
+    assert report["added"] == ["lead"]
+    assert report["removed"] == sorted(LIBRARY)
+    assert report["densities"] == report["fractions"] == report["citations"] == []
+
+
+@pytest.mark.parametrize("empty_side", ["old", "new", "both"])
+def test_empty_library(tmp_path, empty_side):
+    old = {} if empty_side in ("old", "both") else LIBRARY
+    new = {} if empty_side in ("new", "both") else LIBRARY
+    report = diff(tmp_path, old, new)
+    assert report["added"] == sorted(new)
+    assert report["removed"] == sorted(old)
+    assert report["densities"] == report["fractions"] == report["citations"] == []
@@ -0,0 +1,160 @@
+import json
+import os
+
+import pytest
+
+from library_io import (
+    JsonLibraryWriter,
+    LazyMaterialLibrary,
+    composition_hash,
+    filter_property_index,
+    material_properties,
+    property_index_filename,
+    read_property_index,
+    scan_library_offsets,
+    write_json_stream,
+    write_property_index,
+)
+
+RECORDS = {
+    "steel": {
+        "atoms_per_molecule": -1.0,
+        "comp": {"Fe56": 0.9, "Cr52": 0.1},
+        "density": 7.9,
+        "mass": 1.0,
+        "metadata": {"citation": "steel_ref"},
+    },
+    "water {odd} \"name\"": {
+        "atoms_per_molecule": 3.0,
+        "comp": {"H1": 0.111, "O16": 0.889},
+        "density": 1.0,
+        "mass": 1.0,
+        "metadata": {"citation": "[water]", "mat_number": 42},
+    },
+    "tungsten": {
+        "atoms_per_molecule": -1.0,
+        "comp": {"W184": 1.0},
+        "density": 19.3,
+        "mass": 1.0,
+        "metadata": {"citation": "tungsten_ref"},
+    },
+}
+
+
+def test_stream_then_lazy_index_round_trip(tmp_path):
+    filename = str(tmp_path / "lib.json")
+    assert write_json_stream(RECORDS.items(), filename) == len(RECORDS)
+
+    lazy = LazyMaterialLibrary(filename)
+    assert list(lazy) == list(RECORDS)
+    with open(filename) as lib_file:
+        assert json.load(lib_file) == {name: lazy.record(name) for name in lazy}
+    for position, (name, record) in enumerate(RECORDS.items(), start=1):
+        read = lazy.record(name)
+        assert read["comp"] == record["comp"]
+        assert read["density"] == record["density"]
+        assert read["metadata"]["name"] == name
+        # an existing mat_number is kept, others get their stream position
+        assert read["metadata"]["mat_number"] == record["metadata"].get(
+            "mat_number", position
+        )
+        assert read["metadata"]["citation"] == record["metadata"]["citation"]
+
+
+def test_index_is_reused_then_rebuilt_when_the_library_changes(tmp_path):
+    filename = str(tmp_path / "lib.json")
+    write_json_stream(RECORDS.items(), filename)
+    LazyMaterialLibrary(filename)
+    index_filename = filename + ".index"
+    assert os.path.exists(index_filename)
+    with open(index_filename) as index_file:
+        assert json.load(index_file)["offsets"] == scan_library_offsets(filename)
+
+    with JsonLibraryWriter(filename) as writer:
+        writer.write("tungsten", RECORDS["tungsten"])
+    lazy = LazyMaterialLibrary(filename)
+    assert list(lazy) == ["tungsten"]
+    assert lazy.record("tungsten")["comp"] == {"W184": 1.0}
+
+
+def test_lazy_library_builds_pyne_materials(tmp_path):
+    pytest.importorskip("pyne")
+    from pyne import nucname
+
+    filename = str(tmp_path / "lib.json")
+    write_json_stream(RECORDS.items(), filename)
+    lazy = LazyMaterialLibrary(filename)
+    for name, record in RECORDS.items():
+        mat = lazy[name]
+        assert mat is lazy[name]
+        assert {nucname.name(nuc): frac for nuc, frac in mat.comp.items()} == (
+            record["comp"]
+        )
+        assert mat.density == record["density"]
+
+
+def test_property_index_round_trip(tmp_path):
+    pytest.importorskip("pyne")
+    filename = str(tmp_path / "lib.json")
+    write_json_stream(RECORDS.items(), filename)
+    lazy = LazyMaterialLibrary(filename)
+    assert read_property_index(filename) is None
+
+    index_filename = write_property_index(lazy, filename)
+    assert index_filename == str(tmp_path / "lib.props.json")
+    assert index_filename == property_index_filename(filename)
+    index = read_property_index(filename)
+    assert list(index) == list(RECORDS)
+    for name in RECORDS:
+        assert index[name] == pytest.approx(material_properties(lazy[name]))
+    assert index["tungsten"]["nuclides"] == 1
+    assert index["tungsten"]["mass_density"] == pytest.approx(19.3)
+    assert index["water {odd} \"name\""]["mat_number"] == 42
+
+    # an index older than its library is ignored
+    write_json_stream(list(RECORDS.items())[:2], filename)
+    assert read_property_index(filename) is None
+
+
+def test_filter_property_index_with_open_bounds():
+    index = {
+        "steel": {"mass_density": 7.9, "nuclides": 20},
+        "water": {"mass_density": 1.0, "nuclides": 2},
+        "tungsten": {"mass_density": 19.3, "nuclides": 5},
+    }
+    assert filter_property_index(index) == index
+    assert list(filter_property_index(index, ["w*", "steel"])) == [
+        "steel",
+        "water",
+    ]
+    ranges = {"mass_density": (5.0, None)}
+    assert list(filter_property_index(index, ranges=ranges)) == [
+        "steel",
+        "tungsten",
+    ]
+    ranges = {"mass_density": (float("-inf"), 7.9)}
+    assert list(filter_property_index(index, ranges=ranges)) == ["steel", "water"]
+    ranges = {"mass_density": (None, float("inf")), "nuclides": (3, 10)}
+    assert list(filter_property_index(index, ["*n*"], ranges)) == ["tungsten"]
+
+
+def test_composition_hash_ignores_order():
+    comp = {260560000: 0.9, 240520000: 0.1, 10010000: 1.0e-5}
+    reordered = dict(reversed(list(comp.items())))
+    assert list(reordered) != list(comp)
+    assert composition_hash(reordered) == composition_hash(comp)
+    # nuclide ids as strings, as read back from JSON
+    assert composition_hash({str(nuc): f for nuc, f in comp.items()}) == (
+        composition_hash(comp)
+    )
+    assert composition_hash({**comp, 10010000: 2.0e-5}) != composition_hash(comp)
+
+
+def test_filter_property_index_skips_missing_values():
+    index = {
+        "steel": {"mass_density": 7.9, "mat_number": 1},
+        "water": {"mass_density": 1.0, "mat_number": None},
+        "tungsten": {"mass_density": 19.3},
+    }
+    ranges = {"mat_number": (0.0, float("inf"))}
+    assert list(filter_property_index(index, ranges=ranges)) == ["steel"]
@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("pyne")
+
+from pyne.material_library import MaterialLibrary  # noqa: E402
+
+import material_db_tools as mdbt  # noqa: E402
+from mesh_homogenize import homogenize, homogenize_blocks  # noqa: E402
+
+MATERIALS = ["steel", "water", "tungsten"]
+
+# one row per voxel: pure, mixed, unnormalized and void voxels
+VOL_FRACS = np.array(
+    [
+        [1.0, 0.0, 0.0],
+        [0.6, 0.4, 0.0],
+        [0.2, 0.3, 0.5],
+        [0.0, 0.0, 0.0],
+        [0.1, 0.1, 0.2],
+        [0.0, 0.25, 0.75],
+        [0.5, 0.0, 0.5],
+    ]
+)
+
+
+@pytest.fixture
+def library():
+    mat_lib = MaterialLibrary()
+    mat_lib["steel"] = mdbt.make_mat({"Fe": 0.9, "Cr": 0.1}, 7.9, "steel_ref")
+    mat_lib["water"] = mdbt.make_mat({"H1": 0.111, "O16": 0.889}, 1.0, "water_ref")
+    mat_lib["tungsten"] = mdbt.make_mat({"W": 1.0}, 19.3, "tungsten_ref")
+    return mat_lib
+
+
+def expected_voxels(library):
+    mixtures = {
+        f"voxel{row}": {
+            "vol_fracs": {
+                name: frac for name, frac in zip(MATERIALS, fracs) if frac > 0
+            },
+            "mixture_citation": "",
+        }
+        for row, fracs in enumerate(VOL_FRACS.tolist())
+        if any(fracs)
+    }
+    return mdbt.mix_by_volume_batch(library, mixtures)
+
+
+def test_blocks_cover_every_voxel(library):
+    _, nucids, number_densities = mdbt.library_matrix(library, MATERIALS)
+    blocks = list(homogenize_blocks(VOL_FRACS, number_densities, nucids, 3))
+    # the last block holds the one voxel left over
+    assert [start for start, _, _ in blocks] == [0, 3, 6]
+    assert [len(densities) for _, densities, _ in blocks] == [3, 3, 1]
+    (_, whole_densities, whole_mixed), = homogenize_blocks(
+        VOL_FRACS, number_densities, nucids, len(VOL_FRACS)
+    )
+    np.testing.assert_allclose(
+        np.concatenate([densities for _, densities, _ in blocks]), whole_densities
+    )
+    np.testing.assert_allclose(
+        np.concatenate([mixed for _, _, mixed in blocks]), whole_mixed
+    )
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 100])
+def test_homogenize_matches_mix_by_volume(tmp_path, library, chunk_size):
+    input_filename = str(tmp_path / "fracs.npy")
+    np.save(input_filename, VOL_FRACS)
+    output = str(tmp_path / "mesh")
+    n_voxels = homogenize(
+        library, input_filename, output, MATERIALS, chunk_size=chunk_size
+    )
+    assert n_voxels == len(VOL_FRACS)
+
+    nucids = np.load(output + "_nucids.npy")
+    densities = np.load(output + "_density.npy")
+    mass_fracs = np.load(output + "_mass_fracs.npy")
+    assert mass_fracs.shape == (len(VOL_FRACS), len(nucids))
+
+    expected = expected_voxels(library)
+    for row in range(len(VOL_FRACS)):
+        if not VOL_FRACS[row].any():
+            assert densities[row] == 0.0
+            assert not mass_fracs[row].any()
+            continue
+        mat = expected[f"voxel{row}"]
+        assert densities[row] == pytest.approx(mat.density, rel=1e-9)
+        comp = dict(zip(nucids.tolist(), mass_fracs[row].tolist()))
+        assert {nuc: frac for nuc, frac in comp.items() if frac > 0} == (
+            pytest.approx(dict(mat.comp), rel=1e-9)
+        )
+
+
+def test_homogenize_without_normalizing(tmp_path, library):
+    input_filename = str(tmp_path / "fracs.npy")
+    np.save(input_filename, VOL_FRACS)
+    normalized = str(tmp_path / "normalized")
+    void = str(tmp_path / "void")
+    homogenize(library, input_filename, normalized, MATERIALS, chunk_size=3)
+    homogenize(
+        library, input_filename, void, MATERIALS, chunk_size=3, normalize=False
+    )
+    # the voxel whose volume fractions sum to 0.4 is 60% void
+    np.testing.assert_allclose(
+        np.load(void + "_density.npy"),
+        np.load(normalized + "_density.npy") * VOL_FRACS.sum(axis=1),
+    )
+    np.testing.assert_allclose(
+        np.load(void + "_mass_fracs.npy"), np.load(normalized + "_mass_fracs.npy")
+    )
@@ -0,0 +1,122 @@
+import pytest
+
+pytest.importorskip("pyne")
+
+from pyne.material import Material  # noqa: E402
+from pyne.material_library import MaterialLibrary  # noqa: E402
+
+import material_db_tools as mdbt  # noqa: E402
+from mix_graph import mixing_generations, remix  # noqa: E402
+
+
+STEEL = {"Fe56": 0.9, "Cr52": 0.1}
+
+
+def pure_library(steel=STEEL, steel_density=7.9):
+    mat_lib = MaterialLibrary()
+    for name, nucvec, density in (
+        ("steel", steel, steel_density),
+        ("water", {"H1": 0.111, "O16": 0.889}, 1.0),
+    ):
+        mat = Material(nucvec, density=density)
+        mat.metadata["citation"] = name + "_ref"
+        mat_lib[name] = mat
+    return mat_lib
+
+
+MAT_DATA = {
+    # collides with the pure water, which constituents keep referring to
+    "water": {"vol_fracs": {"steel": 1.0}, "mixture_citation": "water_mix"},
+    "shield": {
+        "vol_fracs": {"steel": 0.6, "water": 0.4},
+        "mixture_citation": "shield_mix",
+    },
+    "module": {
+        "vol_fracs": {"shield": 0.5, "steel": 0.5},
+        "mixture_citation": "module_mix",
+    },
+}
+
+
+# three generations that depend on steel, and two mixtures of water only
+NESTED = {
+    "armor": {"vol_fracs": {"steel": 0.7, "water": 0.3}, "mixture_citation": ""},
+    "coolant": {"vol_fracs": {"water": 1.0}, "mixture_citation": ""},
+    "blanket": {
+        "vol_fracs": {"armor": 0.5, "coolant": 0.5},
+        "mixture_citation": "",
+    },
+    "manifold": {
+        "vol_fracs": {"coolant": 0.9, "water": 0.1},
+        "mixture_citation": "",
+    },
+    "module": {
+        "vol_fracs": {"blanket": 0.8, "water": 0.2},
+        "mixture_citation": "",
+    },
+}
+
+
+def test_pure_material_takes_precedence():
+    pure_lib = pure_library()
+    assert mixing_generations(MAT_DATA, pure_lib) == [
+        ["water", "shield"],
+        ["module"],
+    ]
+    mix_lib, _ = remix(pure_lib, MAT_DATA)
+    expected = mdbt.mix_by_volume(
+        pure_lib, {"steel": 0.6, "water": 0.4}, "shield_mix"
+    )
+    assert mix_lib["shield"].density == pytest.approx(expected.density)
+    for nuc, frac in expected.comp.items():
+        assert mix_lib["shield"].comp[nuc] == pytest.approx(frac)
+
+    nested = MaterialLibrary()
+    nested["shield"] = mix_lib["shield"]
+    nested["steel"] = pure_lib["steel"]
+    expected = mdbt.mix_by_volume(nested, {"shield": 0.5, "steel": 0.5}, "")
+    assert mix_lib["module"].density == pytest.approx(expected.density)
+    for nuc, frac in expected.comp.items():
+        assert mix_lib["module"].comp[nuc] == pytest.approx(frac)
+
+
+def test_remix_only_changed_mixtures(tmp_path):
+    state = str(tmp_path / "state.json")
+    pure_lib = pure_library()
+    _, remixed = remix(pure_lib, MAT_DATA, state)
+    assert remixed == ["water", "shield", "module"]
+    _, remixed = remix(pure_lib, MAT_DATA, state)
+    assert remixed == []
+
+    changed = dict(MAT_DATA)
+    changed["shield"] = dict(MAT_DATA["shield"], density_factor=0.9)
+    _, remixed = remix(pure_lib, changed, state)
+    assert remixed == ["shield", "module"]
+
+
+@pytest.mark.parametrize(
+    "changed_lib",
+    [
+        pure_library(steel_density=8.0),
+        pure_library(steel={"Fe56": 0.8, "Cr52": 0.2}),
+    ],
+    ids=["density", "composition"],
+)
+def test_remix_after_a_pure_material_changes(tmp_path, changed_lib):
+    state = str(tmp_path / "state.json")
+    assert mixing_generations(NESTED, changed_lib) == [
+        ["armor", "coolant"],
+        ["blanket", "manifold"],
+        ["module"],
+    ]
+    _, remixed = remix(pure_library(), NESTED, state)
+    assert remixed == ["armor", "coolant", "blanket", "manifold", "module"]
+
+    mix_lib, remixed = remix(changed_lib, NESTED, state)
+    # every mixture that depends on steel, in every later generation, is
+    # re-mixed and the mixtures of water only are reused
+    assert remixed == ["armor", "blanket", "module"]
+    expected, _ = remix(changed_lib, NESTED)
+    for name in NESTED:
+        assert mix_lib[name].density == pytest.approx(expected[name].density)
+        assert dict(mix_lib[name].comp) == pytest.approx(dict(expected[name].comp))
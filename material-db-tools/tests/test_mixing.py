@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("pyne")
+
+from pyne.material import Material, MultiMaterial  # noqa: E402
+from pyne.material_library import MaterialLibrary  # noqa: E402
+
+import material_db_tools as mdbt  # noqa: E402
+
+
+def constituent_library():
+    mat_lib = MaterialLibrary()
+    for name, nucvec, density in (
+        ("steel", {"Fe56": 0.9, "Cr52": 0.1}, 7.9),
+        ("water", {"H1": 0.111, "O16": 0.889}, 1.0),
+        ("tungsten", {"W184": 1.0}, 19.3),
+        ("helium", {"He4": 1.0}, 1.0e-3),
+    ):
+        mat = Material(nucvec, density=density)
+        mat.metadata["citation"] = name + "_ref"
+        mat_lib[name] = mat
+    return mat_lib
+
+
+MIXTURES = {
+    "fw": {"steel": 0.34, "helium": 0.66},
+    "shield": {"steel": 0.6, "water": 0.4},
+    "armor": {"tungsten": 0.9, "helium": 0.1},
+    "three": {"steel": 0.2, "water": 0.3, "tungsten": 0.5},
+    "single": {"water": 1.0},
+}
+
+
+def mixtures(field):
+    return {
+        name: {field: fracs, "mixture_citation": name + "_mix"}
+        for name, fracs in MIXTURES.items()
+    }
+
+
+def assert_same_material(mat, expected):
+    assert mat.density == pytest.approx(expected.density, rel=1e-10)
+    expected_comp = {nuc: frac for nuc, frac in expected.comp.items() if frac > 0}
+    assert set(mat.comp) == set(expected_comp)
+    for nuc, frac in expected_comp.items():
+        assert mat.comp[nuc] == pytest.approx(frac, rel=1e-10)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, mdbt.MIX_CHUNK_SIZE])
+def test_volume_batch_matches_mix_by_volume(chunk_size):
+    mat_lib = constituent_library()
+    mix_lib = mdbt._mix_batch(
+        mat_lib, mixtures("vol_fracs"), "vol_fracs", None, 1, chunk_size
+    )
+    for name, fracs in MIXTURES.items():
+        expected = mdbt.mix_by_volume(mat_lib, fracs, name + "_mix")
+        assert_same_material(mix_lib[name], expected)
+        assert mix_lib[name].metadata["mixture_citation"] == name + "_mix"
+        assert (
+            mix_lib[name].metadata["constituent_citation"]
+            == expected.metadata["constituent_citation"]
+        )
+
+
+def test_volume_batch_density_factor_per_mixture():
+    mat_lib = constituent_library()
+    factors = np.linspace(0.5, 1.0, len(MIXTURES))
+    mix_lib = mdbt.mix_by_volume_batch(mat_lib, mixtures("vol_fracs"), factors)
+    for factor, (name, fracs) in zip(factors, MIXTURES.items()):
+        expected = mdbt.mix_by_volume(mat_lib, fracs, name + "_mix", factor)
+        assert_same_material(mix_lib[name], expected)
+
+
+def test_mass_batch_matches_mix_by_mass():
+    mat_lib = constituent_library()
+    mix_lib = mdbt.mix_by_mass_batch(mat_lib, mixtures("mass_fracs"))
+    for name, fracs in MIXTURES.items():
+        expected = MultiMaterial(
+            {mat_lib[con]: frac for con, frac in fracs.items()}
+        ).mix_by_mass()
+        assert_same_material(mix_lib[name], expected)
+
+
+def test_atom_batch_matches_mix_by_mass_of_converted_fractions():
+    mat_lib = constituent_library()
+    mix_lib = mdbt.mix_by_atom_batch(mat_lib, mixtures("atom_fracs"))
+    for name, fracs in MIXTURES.items():
+        # the mass of a constituent is its atoms times its mass per atom
+        mass_fracs = {
+            mat_lib[con]: frac * mat_lib[con].density / mat_lib[con].number_density()
+            for con, frac in fracs.items()
+        }
+        expected = MultiMaterial(mass_fracs).mix_by_mass()
+        assert_same_material(mix_lib[name], expected)
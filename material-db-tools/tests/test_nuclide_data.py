@@ -0,0 +1,76 @@
+import sys
+
+import numpy as np
+import pytest
+
+import material_db_tools as mdbt
+
+
+def test_missing_table_without_pyne(tmp_path, monkeypatch):
+    for module in ("pyne", "pyne.data", "pyne.nucname"):
+        monkeypatch.setitem(sys.modules, module, None)
+    table = mdbt.NuclideData(str(tmp_path / "missing.npz"))
+    with pytest.raises(ImportError, match="has not been generated"):
+        table.masses([260560000])
+    with pytest.raises(ImportError, match="write_nuclide_data"):
+        table.name(260560000)
+
+
+def test_table_matches_pyne(tmp_path):
+    pytest.importorskip("pyne")
+    from pyne import data, nucname
+
+    filename = str(tmp_path / "nuclide_data.npz")
+    assert mdbt.ensure_nuclide_data(filename)
+    assert not mdbt.ensure_nuclide_data(filename)
+
+    table = mdbt.NuclideData(filename)
+    nucids = [10010000, 80160000, 260560000, 260000000, 741840000]
+    np.testing.assert_allclose(
+        table.masses(nucids), [data.atomic_mass(nuc) for nuc in nucids]
+    )
+    for nuc in nucids:
+        assert table.name(nuc) == nucname.name(nuc)
+        assert table.id(nucname.name(nuc)) == nuc
+    assert table.n_a() == data.N_A
+
+    record = {
+        "atoms_per_molecule": -1.0,
+        "comp": {"Fe56": 0.9, "Cr52": 0.1},
+        "density": 7.9,
+        "mass": 1.0,
+        "metadata": {"citation": "steel_ref"},
+    }
+    assert mdbt.CompactMaterial.from_record(record).to_record() == record
+
+
+def test_natural_abundances_and_isotopes(tmp_path, monkeypatch):
+    pytest.importorskip("pyne")
+    from pyne import data
+    from pyne.material import Material
+
+    filename = str(tmp_path / "nuclide_data.npz")
+    mdbt.write_nuclide_data(filename)
+    table = mdbt.NuclideData(filename)
+    nucids = [10010000, 10020000, 260000000, 260560000, 430990000]
+    np.testing.assert_array_equal(
+        table.abundances(nucids), [data.natural_abund(nuc) for nuc in nucids]
+    )
+    for elem in (10000000, 260000000, 740000000):
+        assert table.natural_isotopes(elem) == mdbt.ElementExpansionCache()[elem]
+    # without the table the isotopes come from PyNE
+    missing = mdbt.NuclideData(str(tmp_path / "missing.npz"))
+    assert missing.natural_isotopes(260000000) == table.natural_isotopes(260000000)
+
+    steel = Material({"Fe": 0.7, "Cr": 0.2, "Ni58": 0.1}, density=7.9)
+    steel.metadata["citation"] = "steel_ref"
+    monkeypatch.setattr(mdbt, "_nuclide_data", table)
+    compact = mdbt.CompactMaterial.from_material(steel)
+    expected = mdbt.expand_elements(steel)
+    # the table alone expands the elements
+    for module in ("pyne", "pyne.data", "pyne.nucname"):
+        monkeypatch.setitem(sys.modules, module, None)
+    expanded = compact.expand_elements()
+    assert expanded.comp == dict(expected.comp)
+    assert expanded.density == 7.9
+    assert expanded.metadata == {"citation": "steel_ref"}
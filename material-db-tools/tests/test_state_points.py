@@ -0,0 +1,53 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pyne")
+
+import state_points  # noqa: E402
+
+PURE_MATERIALS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "pureMaterials",
+)
+sys.path.insert(0, PURE_MATERIALS)
+from createPurematlib import mat_data  # noqa: E402
+
+
+def test_helium_matches_existing_entries():
+    points = state_points.state_point_materials(
+        "He", mat_data["HeT410P80"], "helium", 410, [1, 80]
+    )
+    for name, mat in points:
+        assert mat.density == pytest.approx(mat_data[name]["density"], rel=1e-5)
+        assert mat.metadata["citation"] == mat_data[name]["citation"]
+
+
+def test_helium_is_less_dense_than_an_ideal_gas():
+    temperature = [20.0, 410.0, 410.0, 800.0]
+    pressure = [1.0, 1.0, 80.0, 80.0]
+    helium = state_points.helium_density(temperature, pressure)
+    ideal = state_points.ideal_gas_density(temperature, pressure, 4.002602)
+    assert np.all(helium < ideal)
+    # compressibility factor of helium at 410 C and 80 bar
+    assert ideal[2] / helium[2] == pytest.approx(1.0141, abs=1e-3)
+    assert ideal[0] / helium[0] == pytest.approx(1.0, abs=1e-3)
+
+
+def test_lithium_matches_existing_entry():
+    (name, mat), = state_points.state_point_materials(
+        "LiNat", mat_data["LiNatT500"], "Li", 500
+    )
+    assert name == "LiNatT500"
+    assert mat.density == pytest.approx(mat_data[name]["density"], rel=1e-3)
+
+
+def test_citations_are_in_bibliography():
+    with open(os.path.join(PURE_MATERIALS, "simplebibliography.txt")) as bib:
+        keys = {line.split()[1].rstrip(",") for line in bib if line.strip()}
+    citations = [state_points.HELIUM_CORRELATION[2]] + [
+        correlation[3] for correlation in state_points.LIQUID_CORRELATIONS.values()
+    ]
+    assert set(citations) <= keys
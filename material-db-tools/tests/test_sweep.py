@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("pyne")
+
+from pyne import data, nucname  # noqa: E402
+
+import material_db_tools as mdbt  # noqa: E402
+from sweep import sweep_material  # noqa: E402
+
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        "pureMaterials",
+    ),
+)
+from createPurematlib import mat_data  # noqa: E402
+
+LI6 = nucname.id("Li6")
+LI7 = nucname.id("Li7")
+
+
+def atoms(mat, znum):
+    return sum(
+        frac / data.atomic_mass(nuc)
+        for nuc, frac in mat.comp.items()
+        if nucname.znum(nuc) == znum
+    )
+
+
+def test_sweep_li6_enrichment_of_pb157li90():
+    # the Li of Pb157Li90 is a material key, li_enriched_90
+    enrichments = [0.075, 0.3, 0.6, 0.9]
+    family = dict(
+        sweep_material("Pb157Li90", mat_data["Pb157Li90"], li6_enrichment=enrichments)
+    )
+    assert list(family) == [f"Pb157Li90_Li6_{value:.6g}" for value in enrichments]
+    for enrichment, mat in zip(enrichments, family.values()):
+        li6 = mat.comp.get(LI6, 0.0)
+        assert li6 / (li6 + mat.comp[LI7]) == pytest.approx(enrichment, rel=1e-9)
+        assert atoms(mat, 3) / atoms(mat, 82) == pytest.approx(0.157 / 0.843)
+        assert mat.density == mat_data["Pb157Li90"]["density"]
+        assert sum(mat.comp.values()) == pytest.approx(1.0)
+
+
+def test_sweep_at_the_entry_enrichment_matches_the_built_material():
+    _, mat = next(
+        sweep_material("Pb157Li90", mat_data["Pb157Li90"], li6_enrichment=[0.9])
+    )
+    built = mdbt.build_material(mat_data["Pb157Li90"])
+    assert set(mat.comp) == set(built.comp)
+    for nuc, frac in built.comp.items():
+        assert mat.comp[nuc] == pytest.approx(frac, rel=1e-9)
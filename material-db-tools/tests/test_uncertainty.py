@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("pyne")
+
+from uncertainty import _draw, sample_compositions  # noqa: E402
+
+N = 200000
+
+
+@pytest.mark.parametrize(
+    "nominal", [0.0, 17.0, 17.5, 18.0, 25.0, -1.0e6, 1.0e6]
+)
+def test_normal_draws_stay_in_range(nominal):
+    rng = np.random.default_rng(1)
+    values = _draw(rng, 17.0, 18.0, nominal, N, "normal")
+    assert values.shape == (N,)
+    assert np.all((values >= 17.0) & (values <= 18.0))
+
+
+def test_normal_draws_are_truncated_normal():
+    rng = np.random.default_rng(2)
+    # nominal in the middle: range of +-2 sigma
+    values = _draw(rng, 17.0, 18.0, 17.5, N, "normal")
+    sigma = 0.25
+    assert values.mean() == pytest.approx(17.5, abs=5e-3)
+    assert values.std() == pytest.approx(0.8796 * sigma, rel=1e-2)
+    # nominal at the lower bound: half normal over 4 sigma
+    values = _draw(rng, 17.0, 18.0, 17.0, N, "normal")
+    assert values.mean() == pytest.approx(17.0 + 0.7979 * sigma, rel=1e-3)
+
+
+def test_normal_draws_of_degenerate_ranges():
+    rng = np.random.default_rng(3)
+    values = _draw(
+        rng,
+        np.array([1.0, 2.0, 3.0]),
+        np.array([1.0, 2.0 + 1e-300, 4.0]),
+        np.array([0.5, 2.0, 3.5]),
+        (10, 3),
+        "normal",
+    )
+    assert values.shape == (10, 3)
+    assert np.all(values[:, 0] == 1.0)
+    assert np.all((values[:, 1] >= 2.0) & (values[:, 1] <= 2.0 + 1e-300))
+    assert np.all((values[:, 2] >= 3.0) & (values[:, 2] <= 4.0))
+
+
+def test_sample_compositions_with_nominal_outside_tolerance():
+    mat_input = {
+        "nucvec": {"Fe": 70.0, "Cr": 17.0, "Ni": 13.0},
+        "density": 7.9,
+        "citation": "steel_ref",
+    }
+    samples = sample_compositions(
+        "steel",
+        mat_input,
+        {"Cr": (17.0, 18.0), "Ni": (12.0, 12.5)},
+        1000,
+        density_range=(7.8, 8.0),
+        distribution="normal",
+        seed=4,
+    )
+    cr, ni = samples.weights[:, 1], samples.weights[:, 2]
+    assert np.all((cr >= 17.0) & (cr <= 18.0))
+    assert np.all((ni >= 12.0) & (ni <= 12.5))
+    np.testing.assert_allclose(samples.weights.sum(axis=1), 100.0)
+    np.testing.assert_allclose(samples.mass_fracs.sum(axis=1), 1.0)
+    assert np.all((samples.densities >= 7.8) & (samples.densities <= 8.0))
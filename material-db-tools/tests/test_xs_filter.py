@@ -0,0 +1,112 @@
+import os
+
+import pytest
+
+from xs_filter import availability_index, read_xsdir, resolve_nuclides
+
+XSDIR = """\
+atomic weight ratios
+    1001  0.999167
+directory
+ 1001.80c 0.999167 endf80/H/1001.800nc 0 1 1 2345 0 0 2.5301E-08
+ 8016.80c 15.857510 endf80/O/8016.800nc 0 1 1 +
+   34567 0 0 2.5301E-08
+ 8016.70c 15.857510 endf70/O/8016.700nc 0 1 1 34567 0 0 2.5301E-08
+ 26056.80c 55.454440 endf80/Fe/26056.800nc 0 1 1 45678 0 0 2.5301E-08
+ 73181.80c 179.393600 endf80/Ta/73181.800nc 0 1 1 56789 0 0 2.5301E-08
+ 74182.80c 180.385000 endf80/W/74182.800nc 0 1 1 56789 0 0 2.5301E-08
+ 74186.80c 184.352000 endf80/W/74186.800nc 0 1 1 56789 0 0 2.5301E-08
+ 95642.80c 240.015000 endf80/Am/95642.800nc 0 1 1 56789 0 0 2.5301E-08
+ 6000.80c 11.896910 endf80/C/6000.800nc 0 1 1 56789 0 0 2.5301E-08
+ 1001.80t 0.999167 endf80/H/1001.800nt 0 1 1 56789 0 0 2.5301E-08
+"""
+
+H1, O16, FE56, FE54 = 10010000, 80160000, 260560000, 260540000
+TA180, TA181 = 731800000, 731810000
+W182, W184, W186 = 741820000, 741840000, 741860000
+C12, C0, AM242M = 60120000, 60000000, 952420001
+NB93 = 410930000
+
+
+@pytest.fixture
+def xsdir(tmp_path):
+    filename = tmp_path / "xsdir"
+    filename.write_text(XSDIR)
+    return str(filename)
+
+
+def test_read_xsdir(xsdir):
+    assert read_xsdir(xsdir, "80c") == {H1, O16, FE56, TA181, W182, W186, AM242M, C0}
+    assert read_xsdir(xsdir, "70c") == {O16}
+    assert read_xsdir(xsdir) == read_xsdir(xsdir, "80c")
+
+
+def test_availability_index_cache(xsdir, tmp_path, monkeypatch):
+    monkeypatch.setenv("FMDB_XS_INDEX_CACHE", str(tmp_path / "cache"))
+    available = availability_index(xsdir, "80c")
+    assert available == read_xsdir(xsdir, "80c")
+    assert len(os.listdir(tmp_path / "cache")) == 1
+    assert availability_index(xsdir, "80c") == available
+    assert availability_index(xsdir, "70c") == {O16}
+
+
+def test_resolve_nuclides(xsdir):
+    available = read_xsdir(xsdir, "80c")
+    nucids = [H1, FE54, FE56, TA180, W184, C12, NB93]
+    assert resolve_nuclides(nucids, available) == {
+        FE54: FE56,
+        TA180: TA181,
+        # equally close to W182 and W186, the heavier isotope wins
+        W184: W186,
+        C12: C0,
+        NB93: None,
+    }
+    assert resolve_nuclides(nucids, available, {TA180: None, H1: O16}) == {
+        FE54: FE56,
+        TA180: None,
+        H1: O16,
+        W184: W186,
+        C12: C0,
+        NB93: None,
+    }
+    assert resolve_nuclides(nucids, available, mode="remove") == {
+        FE54: None,
+        TA180: None,
+        W184: None,
+        C12: None,
+        NB93: None,
+    }
+    with pytest.raises(ValueError):
+        resolve_nuclides(nucids, available, mode="drop")
+
+
+def test_filter_material_renormalizes(xsdir):
+    pytest.importorskip("pyne")
+    from pyne.material import Material
+
+    from xs_filter import filter_material
+
+    mat = Material(
+        {FE56: 0.6, FE54: 0.2, NB93: 0.15, W184: 0.05}, density=7.9
+    )
+    mat.metadata["citation"] = "steel_ref"
+    mapping = resolve_nuclides(mat.comp, read_xsdir(xsdir, "80c"))
+    filtered, changes = filter_material(mat, mapping)
+
+    # Fe54 merges into Fe56 and W184 maps to W186 with their mass, Nb93 is
+    # removed and the rest renormalized
+    assert set(filtered.comp) == {FE56, W186}
+    assert filtered.comp[FE56] == pytest.approx(0.8 / 0.85)
+    assert filtered.comp[W186] == pytest.approx(0.05 / 0.85)
+    assert sum(filtered.comp.values()) == pytest.approx(1.0)
+    assert filtered.density == mat.density
+    assert filtered.metadata["citation"] == "steel_ref"
+    assert sorted(changes) == sorted(
+        [(FE54, FE56, 0.2), (NB93, None, 0.15), (W184, W186, 0.05)]
+    )
+
+    unchanged = Material({FE56: 1.0}, density=7.9)
+    assert filter_material(unchanged, mapping) == (unchanged, [])
+
+    with pytest.raises(ValueError):
+        filter_material(Material({NB93: 1.0}, density=8.6), mapping)
@@ -0,0 +1,376 @@
+"""
+Monte Carlo sampling of material compositions within their specification
+tolerances, for uncertainty quantification.
+
+The constituents of a mat_data entry that have a tolerance are drawn from
+their (min, max) range, in the units of the entry (e.g. wt%), and a balance
+constituent takes the rest so every sample sums to the same total as the
+nominal composition, e.g. 100 wt%. Each constituent is expanded to its
+isotopes once and all the samples are expanded together as one matrix
+product:
+
+    tolerances = {"Cr": (17.0, 18.0), "Ni": (12.0, 12.5), "Mn": (1.6, 2.0)}
+    samples = sample_compositions(
+        "SS316LNIG", mat_data["SS316LNIG"], tolerances, 10000, seed=1
+    )
+    samples.write("SS316LNIG_samples.npz")
+
+The samples are held as arrays, a row per sample, and are written as one
+.npz file, converted to a CompactLibrary, or streamed to a JSON library
+with library_io.write_json_stream(samples.materials(), filename).
+"""
+import statistics
+
+import numpy as np
+from pyne import data, nucname
+from pyne.material import Material
+
+import material_db_tools as mdbt
+
+DISTRIBUTIONS = ("uniform", "normal")
+
+_STANDARD_NORMAL = statistics.NormalDist()
+_normal_cdf = np.frompyfunc(_STANDARD_NORMAL.cdf, 1, 1)
+_normal_inv_cdf = np.frompyfunc(_STANDARD_NORMAL.inv_cdf, 1, 1)
+
+
+def _key_label(key):
+    """
+    Returns the label of a nucvec or atom_frac key in the samples, e.g. "Cr".
+    """
+    if isinstance(key, Material):
+        return key.metadata["name"] if "name" in key.metadata.keys() else repr(key)
+    return nucname.name(nucname.id(key))
+
+
+def _find_key(keys, key):
+    """
+    Returns the position of a tolerance key, a nuclide or element name or id
+    or a material, among the keys of a mat_data entry.
+    """
+    for index, entry_key in enumerate(keys):
+        if entry_key is key:
+            return index
+        if not isinstance(key, Material) and not isinstance(entry_key, Material):
+            if nucname.id(entry_key) == nucname.id(key):
+                return index
+    raise KeyError(f"{key} is not a constituent of the material")
+
+
+def _truncated_normal(rng, low, high, mean, sigma, shape):
+    """
+    Draws values of a normal distribution truncated to [low, high] by
+    inverting its cumulative distribution, so every draw lands in the range
+    even when the mean is at or outside it. Where the range holds no
+    representable probability, e.g. for a zero sigma, the values are the
+    mean clipped to the range.
+    """
+    low, high, mean, sigma = np.broadcast_arrays(
+        *(np.asarray(value, dtype=float) for value in (low, high, mean, sigma))
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lower = (low - mean) / sigma
+        upper = (high - mean) / sigma
+    # work in the lower tail, where the cumulative distribution is precise
+    flip = lower + upper > 0
+    lower, upper = np.where(flip, -upper, lower), np.where(flip, -lower, upper)
+    cdf_lower = np.asarray(_normal_cdf(lower), dtype=float)
+    cdf_upper = np.asarray(_normal_cdf(upper), dtype=float)
+    valid = cdf_upper > cdf_lower
+    quantiles = np.where(
+        valid, cdf_lower + (cdf_upper - cdf_lower) * rng.random(shape), 0.5
+    )
+    standard = np.asarray(
+        _normal_inv_cdf(
+            np.clip(quantiles, np.finfo(float).tiny, 1.0 - np.finfo(float).eps)
+        ),
+        dtype=float,
+    )
+    values = np.where(
+        valid, mean + sigma * np.where(flip, -standard, standard), mean
+    )
+    return np.clip(values, low, high)
+
+
+def _draw(rng, low, high, nominal, shape, distribution):
+    """
+    Draws values in [low, high], uniformly or from a normal distribution
+    around the nominal values with a standard deviation of a quarter of the
+    range, truncated to the range.
+    """
+    if distribution == "uniform":
+        return low + (high - low) * rng.random(shape)
+    return _truncated_normal(rng, low, high, nominal, (high - low) / 4.0, shape)
+
+
+def sample_weights(
+    nominal,
+    tolerances,
+    n_samples,
+    balance,
+    distribution="uniform",
+    rng=None,
+    max_rounds=100,
+):
+    """
+    Draws constituent amounts that keep the total of the nominal amounts.
+
+    Arguments:
+        nominal (numpy array of float): nominal amount of each constituent.
+        tolerances (dict): dictionary where the keys are positions in
+            nominal and the values are (min, max) ranges.
+        n_samples (int): number of samples.
+        balance (int): position of the balance constituent, which takes the
+            rest of the total. Samples where it falls below zero, or outside
+            its own range if it has one, are drawn again.
+        distribution (str): "uniform" or "normal", see DISTRIBUTIONS.
+        rng (numpy Generator): random number generator.
+        max_rounds (int): number of redraws before giving up.
+
+    Returns:
+        weights (numpy array of float): (n_samples, constituents) amounts.
+    """
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"distribution must be one of {', '.join(DISTRIBUTIONS)}")
+    rng = rng or np.random.default_rng()
+    ranged = [index for index in tolerances if index != balance]
+    low = np.array([tolerances[index][0] for index in ranged], dtype=float)
+    high = np.array([tolerances[index][1] for index in ranged], dtype=float)
+    balance_low, balance_high = tolerances.get(balance, (0.0, np.inf))
+    total = nominal.sum()
+
+    weights = np.tile(nominal, (n_samples, 1))
+    redraw = np.arange(n_samples)
+    for _ in range(max_rounds):
+        weights[np.ix_(redraw, ranged)] = _draw(
+            rng,
+            low,
+            high,
+            nominal[ranged],
+            (len(redraw), len(ranged)),
+            distribution,
+        )
+        weights[redraw, balance] = 0.0
+        weights[redraw, balance] = total - weights[redraw].sum(axis=1)
+        amount = weights[redraw, balance]
+        redraw = redraw[(amount < max(balance_low, 0.0)) | (amount > balance_high)]
+        if not len(redraw):
+            return weights
+    raise ValueError(
+        "the tolerances leave no room for the balance constituent in "
+        f"{len(redraw)} of {n_samples} samples"
+    )
+
+
+class CompositionSamples(object):
+    """
+    Sampled compositions of one material, held as arrays with a row per
+    sample.
+
+    Arguments:
+        base_name (str): name of the sampled material.
+        labels (list of str): label of each constituent.
+        weights (numpy array of float): (samples, constituents) sampled
+            amounts, in the units of the mat_data entry.
+        nucids (numpy array of int): nuclide id of each isotope column.
+        mass_fracs (numpy array of float): (samples, isotopes) mass
+            fractions.
+        densities (numpy array of float): density [g/cm3] of each sample.
+        citation (str): citation of the material.
+    """
+
+    def __init__(
+        self, base_name, labels, weights, nucids, mass_fracs, densities, citation
+    ):
+        self.base_name = base_name
+        self.labels = list(labels)
+        self.weights = weights
+        self.nucids = mdbt.intern_nucids(nucids)
+        self.mass_fracs = mass_fracs
+        self.densities = densities
+        self.citation = citation
+
+    def __len__(self):
+        return len(self.densities)
+
+    def name(self, index):
+        return f"{self.base_name}_sample{index:0{len(str(len(self) - 1))}d}"
+
+    def write(self, filename, dtype=np.float64):
+        """
+        Writes the samples to a compressed .npz file. float32 halves the size.
+        """
+        np.savez_compressed(
+            filename,
+            base_name=np.array(self.base_name),
+            labels=np.array(self.labels),
+            weights=self.weights.astype(dtype),
+            nucids=self.nucids,
+            mass_fracs=self.mass_fracs.astype(dtype),
+            densities=self.densities,
+            citation=np.array(self.citation),
+        )
+
+    @classmethod
+    def read(cls, filename):
+        """
+        Reads samples written by write().
+        """
+        with np.load(filename) as arrays:
+            return cls(
+                str(arrays["base_name"]),
+                arrays["labels"].tolist(),
+                arrays["weights"].astype(np.float64),
+                arrays["nucids"],
+                arrays["mass_fracs"].astype(np.float64),
+                arrays["densities"],
+                str(arrays["citation"]),
+            )
+
+    def _metadata(self, index):
+        return {
+            "citation": self.citation,
+            "sample_base": self.base_name,
+            "sample_index": index,
+        }
+
+    def materials(self):
+        """
+        Yields (name, PyNE material) pairs of the samples, for streaming to
+        a library with library_io.write_json_stream.
+        """
+        for index in range(len(self)):
+            present = np.nonzero(self.mass_fracs[index])[0]
+            mat = Material(
+                {
+                    int(self.nucids[col]): float(self.mass_fracs[index, col])
+                    for col in present
+                },
+                mass=1.0,
+                density=float(self.densities[index]),
+                atoms_per_molecule=-1.0,
+            )
+            for key, value in self._metadata(index).items():
+                mat.metadata[key] = value
+            yield self.name(index), mat
+
+    def to_compact_library(self):
+        """
+        Returns the samples as a CompactLibrary, all sharing one nuclide id
+        array.
+        """
+        return mdbt.CompactLibrary(
+            (
+                self.name(index),
+                mdbt.CompactMaterial(
+                    self.nucids,
+                    self.mass_fracs[index],
+                    float(self.densities[index]),
+                    1.0,
+                    -1.0,
+                    self._metadata(index),
+                ),
+            )
+            for index in range(len(self))
+        )
+
+
+def sample_compositions(
+    base_name,
+    mat_input,
+    tolerances,
+    n_samples,
+    balance=None,
+    density_range=None,
+    distribution="uniform",
+    seed=None,
+):
+    """
+    Samples the composition of a mat_data entry within tolerances.
+
+    Arguments:
+        base_name (str): name of the material, used to name the samples.
+        mat_input (dict): mat_data entry with "nucvec" or "atom_frac",
+            "density" and "citation" entries, as in createPurematlib.py.
+        tolerances (dict): dictionary where the keys are constituents of the
+            entry, as nuclide or element names or ids or as the material
+            keys of the entry, and the values are (min, max) ranges in the
+            units of the entry.
+        n_samples (int): number of samples, e.g. 10**4.
+        balance: constituent that takes the rest of the total. Defaults to
+            the constituent with the largest nominal amount.
+        density_range ((float, float)): range of the density [g/cm3].
+            Defaults to None, which keeps the nominal density.
+        distribution (str): "uniform" or "normal", see DISTRIBUTIONS.
+        seed (int): seed of the random number generator.
+
+    Returns:
+        samples (CompositionSamples): the sampled compositions.
+    """
+    rng = np.random.default_rng(seed)
+    by_atom = "atom_frac" in mat_input
+    fracs = mat_input["atom_frac"] if by_atom else mat_input["nucvec"]
+    keys = list(fracs)
+    nominal = np.array([fracs[key] for key in keys], dtype=float)
+    if balance is None:
+        balance = int(np.argmax(nominal))
+    else:
+        balance = _find_key(keys, balance)
+    weights = sample_weights(
+        nominal,
+        {_find_key(keys, key): limits for key, limits in tolerances.items()},
+        n_samples,
+        balance,
+        distribution,
+        rng,
+    )
+
+    # isotopic mass fractions of one unit of each constituent
+    expansions = [
+        (
+            mdbt.make_mat_from_atom({key: 1.0}, 1.0, "")
+            if by_atom
+            else mdbt.make_mat({key: 1.0}, 1.0, "")
+        ).comp
+        for key in keys
+    ]
+    nucids = sorted({nuc for comp in expansions for nuc in comp})
+    columns = {nuc: col for col, nuc in enumerate(nucids)}
+    isotopes = np.zeros((len(keys), len(nucids)))
+    for row, comp in enumerate(expansions):
+        for nuc, frac in comp.items():
+            isotopes[row, columns[nuc]] = frac
+
+    masses = weights
+    if by_atom:
+        masses = weights * np.array(
+            [
+                key.molecular_mass()
+                if isinstance(key, Material)
+                else data.atomic_mass(nucname.id(key))
+                for key in keys
+            ]
+        )
+    mass_fracs = masses @ isotopes
+    mass_fracs /= mass_fracs.sum(axis=1, keepdims=True)
+
+    if density_range is None:
+        densities = np.full(n_samples, float(mat_input["density"]))
+    else:
+        densities = _draw(
+            rng,
+            density_range[0],
+            density_range[1],
+            mat_input["density"],
+            n_samples,
+            distribution,
+        )
+    return CompositionSamples(
+        base_name,
+        [_key_label(key) for key in keys],
+        weights,
+        nucids,
+        mass_fracs,
+        densities,
+        mat_input["citation"],
+    )
@@ -0,0 +1,373 @@
+"""
+Filtering of material compositions against the nuclides of a cross section
+library, applied at export time.
+
+Natural element expansion brings in nuclides, such as Ta180, W180 or Ba130,
+that some data libraries lack. The nuclides of a library are read from an
+MCNP xsdir file or an OpenMC cross_sections.xml file into an availability
+index, cached per library file under ~/.cache/fusion-material-db/xs_index
+(or the directory in FMDB_XS_INDEX_CACHE) until the file changes. Each
+unavailable nuclide of a material library is then resolved once, in this
+order:
+
+    1. an explicit substitution, e.g. {"Ta180": "Ta181"}
+    2. the natural element, if the library has an elemental table
+    3. the available isotope of the same element with the closest mass
+       number
+    4. removal
+
+Mapped nuclides keep their mass fraction, so densities are unchanged, and
+removed nuclides are dropped before renormalizing. Every substitution is
+reported.
+
+Usage (see also the --xs-library option of convertPyneMatLib.py):
+    python xs_filter.py PureFusionMaterials_libv1.json /data/xsdir \
+        filtered_libv1.json --suffix 80c --report substitutions.csv
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import sys
+import xml.etree.ElementTree as ET
+
+from library_io import LazyMaterialLibrary, write_json_stream
+
+MODES = ("map", "remove")
+
+# OpenMC nuclide names, e.g. "H1", "Am242_m1" or "C0" for natural carbon
+_OPENMC_NAME = re.compile(r"^([A-Z][a-z]?)(\d+)(?:_m(\d+))?$")
+
+
+def _nucid(znum, anum, state=0):
+    return znum * 10000000 + anum * 10000 + state
+
+
+def _znum(nuc):
+    return nuc // 10000000
+
+
+def _anum(nuc):
+    return (nuc // 10000) % 1000
+
+
+def read_xsdir(filename, suffix=None):
+    """
+    Returns the nuclide ids of the continuous energy neutron tables listed
+    in the directory section of an MCNP xsdir file.
+
+    Arguments:
+        filename (str): name of the xsdir file.
+        suffix (str): library suffix to keep, e.g. "80c". Defaults to None,
+            in which case every table whose suffix ends in "c" is kept.
+    """
+    nucids = set()
+    in_directory = False
+    continued = False
+    with open(filename) as xsdir:
+        for line in xsdir:
+            if not in_directory:
+                in_directory = line.strip().lower().startswith("directory")
+                continue
+            tokens = line.split()
+            if not tokens:
+                continue
+            if not continued:
+                zaid, _, table = tokens[0].partition(".")
+                wanted = table == suffix if suffix else table.endswith("c")
+                if wanted and zaid.isdigit():
+                    zaid = int(zaid)
+                    znum, anum = divmod(zaid, 1000)
+                    state = 0
+                    # MCNP numbers metastable states as A + 300 + 100 * m, the
+                    # state is the one that leaves A >= 2 Z
+                    if anum > 300:
+                        state = max((anum - 300 - 2 * znum) // 100, 1)
+                        anum -= 300 + 100 * state
+                    nucids.add(_nucid(znum, anum, state))
+            continued = tokens[-1] == "+"
+    return nucids
+
+
+def read_cross_sections_xml(filename):
+    """
+    Returns the nuclide ids of the neutron libraries listed in an OpenMC
+    cross_sections.xml file.
+    """
+    from pyne import nucname
+
+    nucids = set()
+    for library in ET.parse(filename).getroot().iter("library"):
+        if library.get("type", "neutron") != "neutron":
+            continue
+        for name in library.get("materials", "").split():
+            match = _OPENMC_NAME.match(name)
+            if match is None:
+                continue
+            symbol, anum, state = match.groups()
+            nucids.add(_nucid(_znum(nucname.id(symbol)), int(anum), int(state or 0)))
+    return nucids
+
+
+def _index_cache_filename(xs_filename, suffix):
+    directory = os.environ.get(
+        "FMDB_XS_INDEX_CACHE",
+        os.path.join(
+            os.path.expanduser("~"), ".cache", "fusion-material-db", "xs_index"
+        ),
+    )
+    key = f"{os.path.abspath(xs_filename)}:{suffix or ''}"
+    return os.path.join(
+        directory, hashlib.sha256(key.encode("utf8")).hexdigest() + ".json"
+    )
+
+
+def availability_index(xs_filename, suffix=None, use_cache=True):
+    """
+    Returns the nuclides available in a cross section library, read from
+    the cached index if the library file has not changed since.
+
+    Arguments:
+        xs_filename (str): MCNP xsdir or OpenMC cross_sections.xml file.
+        suffix (str): xsdir library suffix to keep, see read_xsdir.
+        use_cache (bool): read and write the cached index.
+
+    Returns:
+        nucids (frozenset of int): nuclide ids of the available nuclides,
+            where an element id stands for a natural element table.
+    """
+    stat = os.stat(xs_filename)
+    stamp = [stat.st_size, stat.st_mtime_ns]
+    cache_filename = _index_cache_filename(xs_filename, suffix)
+    if use_cache:
+        try:
+            with open(cache_filename) as cache_file:
+                cached = json.load(cache_file)
+            if cached["stamp"] == stamp:
+                return frozenset(cached["nucids"])
+        except (OSError, ValueError, KeyError):
+            pass
+    if xs_filename.lower().endswith(".xml"):
+        nucids = read_cross_sections_xml(xs_filename)
+    else:
+        nucids = read_xsdir(xs_filename, suffix)
+    if use_cache:
+        try:
+            os.makedirs(os.path.dirname(cache_filename), exist_ok=True)
+            with open(cache_filename, "w") as cache_file:
+                json.dump({"stamp": stamp, "nucids": sorted(nucids)}, cache_file)
+        except OSError:
+            pass
+    return frozenset(nucids)
+
+
+def resolve_nuclides(nucids, available, substitutions=None, mode="map"):
+    """
+    Decides what each unavailable nuclide becomes.
+
+    Arguments:
+        nucids (iterable of int): nuclide ids to resolve.
+        available (set of int): available nuclide ids, see
+            availability_index.
+        substitutions (dict): explicit substitutions by nuclide id, a value
+            of None removes the nuclide. They take precedence.
+        mode (str): "map" to map unavailable nuclides to their element or
+            closest available isotope, or "remove" to only remove them.
+
+    Returns:
+        mapping (dict): dictionary where the keys are the unavailable
+            nuclide ids and the values are their substitutes, or None for
+            removed nuclides.
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {', '.join(MODES)}")
+    substitutions = substitutions or {}
+    isotopes = {}
+    for nuc in available:
+        if _anum(nuc) > 0 and nuc % 10000 == 0:
+            isotopes.setdefault(_znum(nuc), []).append(nuc)
+    mapping = {}
+    for nuc in set(nucids):
+        if nuc in substitutions:
+            mapping[nuc] = substitutions[nuc]
+        elif nuc in available:
+            continue
+        elif mode == "remove":
+            mapping[nuc] = None
+        elif _nucid(_znum(nuc), 0) in available:
+            mapping[nuc] = _nucid(_znum(nuc), 0)
+        elif _znum(nuc) in isotopes:
+            # closest mass number, the heavier isotope on a tie
+            mapping[nuc] = min(
+                isotopes[_znum(nuc)],
+                key=lambda iso: (abs(_anum(iso) - _anum(nuc)), -iso),
+            )
+        else:
+            mapping[nuc] = None
+    return mapping
+
+
+def filter_material(mat, mapping):
+    """
+    Applies a nuclide mapping to a material.
+
+    Returns:
+        filtered (PyNE material): copy of the material with the mapped
+            nuclides replaced and the removed ones dropped, renormalized.
+        changes (list): (nuclide id, substitute id or None, mass fraction)
+            of each changed nuclide.
+    """
+    from pyne.material import Material
+
+    comp = {}
+    changes = []
+    for nuc, frac in mat.comp.items():
+        if nuc in mapping:
+            changes.append((nuc, mapping[nuc], frac))
+            nuc = mapping[nuc]
+            if nuc is None:
+                continue
+        comp[nuc] = comp.get(nuc, 0.0) + frac
+    if not changes:
+        return mat, changes
+    if not comp:
+        raise ValueError("every nuclide of the material is unavailable")
+    total = sum(comp.values())
+    filtered = Material(
+        {nuc: frac / total for nuc, frac in comp.items()},
+        mass=mat.mass,
+        density=mat.density,
+        atoms_per_molecule=mat.atoms_per_molecule,
+    )
+    for key in mat.metadata.keys():
+        filtered.metadata[key] = mat.metadata[key]
+    return filtered, changes
+
+
+def filter_library(material_library, available, substitutions=None, mode="map"):
+    """
+    Removes or maps the unavailable nuclides of every material of a library.
+    Each distinct nuclide is resolved once for the whole library.
+
+    Arguments:
+        material_library (PyNE material library or LazyMaterialLibrary):
+            library to filter.
+        available (set of int): available nuclide ids, see
+            availability_index.
+        substitutions (dict): explicit substitutions by nuclide name or id,
+            see resolve_nuclides.
+        mode (str): see resolve_nuclides.
+
+    Returns:
+        filtered_lib (PyNE material library): the filtered library, with
+            unchanged materials shared with the input library.
+        report (list): (material name, nuclide, substitute or "", mass
+            fraction) of every substitution, with nuclide names.
+    """
+    from pyne import nucname
+    from pyne.material_library import MaterialLibrary
+
+    substitutions = {
+        nucname.id(nuc): None if sub is None else nucname.id(sub)
+        for nuc, sub in (substitutions or {}).items()
+    }
+    materials = [
+        (key.decode("utf8") if isinstance(key, bytes) else key, mat)
+        for key, mat in material_library.items()
+    ]
+    mapping = resolve_nuclides(
+        {nuc for _, mat in materials for nuc in mat.comp},
+        available,
+        substitutions,
+        mode,
+    )
+    filtered_lib = MaterialLibrary()
+    report = []
+    for name, mat in materials:
+        try:
+            filtered, changes = filter_material(mat, mapping)
+        except ValueError as error:
+            raise ValueError(f"{name}: {error}") from None
+        filtered_lib[name] = filtered
+        report.extend(
+            (name, nucname.name(nuc), "" if sub is None else nucname.name(sub), frac)
+            for nuc, sub, frac in changes
+        )
+    return filtered_lib, report
+
+
+def write_report(report, filename):
+    """
+    Writes the substitutions of filter_library to a CSV file.
+    """
+    with open(filename, "w", newline="") as report_file:
+        writer = csv.writer(report_file)
+        writer.writerow(["material", "nuclide", "substitute", "mass_fraction"])
+        writer.writerows(report)
+
+
+def print_summary(report, out):
+    """
+    Writes one line per substituted or removed nuclide with the number of
+    materials it affects.
+    """
+    counts = {}
+    for _, nuc, sub, _ in report:
+        counts[nuc, sub] = counts.get((nuc, sub), 0) + 1
+    for (nuc, sub), count in sorted(counts.items()):
+        out.write(f"   {nuc:8s} -> {sub or 'removed':8s} in {count} materials\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Maps or removes the nuclides of a JSON material library "
+        "that a cross section library lacks"
+    )
+    parser.add_argument("library", help="JSON material library to filter")
+    parser.add_argument("xs_library", help="MCNP xsdir or cross_sections.xml")
+    parser.add_argument("output", help="JSON library of the filtered materials")
+    parser.add_argument("--suffix", help="xsdir library suffix, e.g. 80c")
+    parser.add_argument(
+        "--mode",
+        choices=MODES,
+        default="map",
+        help="Map unavailable nuclides to available ones or remove them",
+    )
+    parser.add_argument(
+        "--substitute",
+        nargs=2,
+        action="append",
+        metavar=("NUCLIDE", "SUBSTITUTE"),
+        help="Explicit substitution, e.g. --substitute Ta180 Ta181, a substitute "
+        "of none removes the nuclide",
+    )
+    parser.add_argument("--report", help="CSV file of every substitution")
+    parser.add_argument(
+        "--no-cache", help="Reread the cross section library", action="store_true"
+    )
+    args = parser.parse_args()
+
+    available = availability_index(args.xs_library, args.suffix, not args.no_cache)
+    filtered_lib, report = filter_library(
+        LazyMaterialLibrary(args.library),
+        available,
+        {
+            nuc: None if sub.lower() == "none" else sub
+            for nuc, sub in args.substitute or []
+        },
+        args.mode,
+    )
+    write_json_stream(
+        ((name, filtered_lib[name]) for name in LazyMaterialLibrary(args.library)),
+        args.output,
+    )
+    print(f" {len(report)} substitutions for {args.xs_library}:")
+    print_summary(report, sys.stdout)
+    if args.report:
+        write_report(report, args.report)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
+import argparse
 import os
 
 import material_db_tools as mdbt
+from build_cache import BuildCache
+from instrumentation import profiler
+from library_io import read_property_index, write_property_index
 from pyne.material import Material
 from pyne.material_library import MaterialLibrary
 
@@ -295,15 +299,19 @@ mat_data["HeNIST"] = {
 
 # high pressure He gas ref.
 # reference: WidodoJoPCS_2018 doi:10.1088/1742-6596/962/1/012039 and KTA Standards 1986
+# densities from the KTA 3102.1 correlation rho = 48.14 p/T / (1 + 0.4446 p/T^1.2)
+# (state_points.helium_density). Earlier versions multiplied by the
+# compressibility term instead of dividing, giving 0.00007048 and 0.00571698,
+# above the ideal gas density.
 mat_data["HeT410P1"] = {
     "nucvec": {20000000: 100},
-    "density": 0.00007048,  # at 410 C, 1 bar
+    "density": 0.000070455,  # at 410 C, 1 bar
     "citation": "WidodoJoPCS_2018",
 }
 
 mat_data["HeT410P80"] = {
     "nucvec": {20000000: 100},
-    "density": 0.00571698,  # at 410 C, 80 bar
+    "density": 0.00555896,  # at 410 C, 80 bar
     "citation": "WidodoJoPCS_2018",
 }
 
@@ -648,37 +656,82 @@ mat_data["YBa2Cu3O7"] = {
 }
 
 # --------------------------------------------------------
-def main():
+def main(use_cache=True, processes=1):
+    lib_file = "PureFusionMaterials_libv1.json"
+    cache = BuildCache(
+        "PureFusionMaterials_libv1.buildcache.json" if use_cache else None
+    )
+
+    # nuclide table used by the compact materials without PyNE
+    if mdbt.ensure_nuclide_data(mdbt.NUCLIDE_DATA_FILE):
+        print(f" Wrote the nuclide table {mdbt.NUCLIDE_DATA_FILE}")
+
     # create material library object
     mat_lib = MaterialLibrary()
     print("\n Creating Pure Fusion Materials...")
     #
-    # get material definition
-    for mat_name, mat_input in mat_data.items():
-        if "nucvec" in mat_input:
-            mat_lib[mat_name] = mdbt.make_mat(
-                mat_input["nucvec"],
-                mat_input["density"],
-                mat_input["citation"],
-                mat_input.get("molecular_mass"),
-            )
-        if "atom_frac" in mat_input:
-            mat_lib[mat_name] = mdbt.make_mat_from_atom(
-                mat_input["atom_frac"],
-                mat_input["density"],
-                mat_input["citation"],
-            )
+    # get material definition, re-expanding only new or changed entries
+    mats = {
+        mat_name: cache.get(mat_name, mat_input)
+        for mat_name, mat_input in mat_data.items()
+    }
+    changed = {
+        mat_name: mat_data[mat_name] for mat_name, mat in mats.items() if mat is None
+    }
+    for mat_name, mat in mdbt.build_materials(changed, processes).items():
+        cache.put(mat_name, mat_data[mat_name], mat)
+        mats[mat_name] = mat
+    for mat_name, mat in mats.items():
+        mat_lib[mat_name] = mat
+    cache.prune(mat_data)
+    print(f" Rebuilt {len(changed)} of {len(mat_data)} materials")
+
+    if not cache.modified and os.path.exists(lib_file):
+        if read_property_index(lib_file) is None:
+            write_property_index(mat_lib, lib_file)
+        print("Library is up to date, all done!")
+        profiler.finish()
+        return
 
     # remove lib
     try:
-        os.remove("PureFusionMaterials_libv1.json")
+        os.remove(lib_file)
     except:
         pass
 
     # write material library
-    mat_lib.write_json("PureFusionMaterials_libv1.json")
+    with profiler.stage("write_json"):
+        mat_lib.write_json(lib_file)
+    with profiler.stage("write_property_index"):
+        write_property_index(mat_lib, lib_file)
+    cache.save()
     print("All done!")
+    profiler.finish()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(
+        description="Builds the pure fusion materials library"
+    )
+    parser.add_argument(
+        "--no-cache",
+        help="Rebuild every material instead of only new or changed ones",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--persist-expansion",
+        help="Keep the natural element expansions on disk between builds "
+        "(FMDB_EXPANSION_CACHE or ~/.cache/fusion-material-db)",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes used to build materials, 0 for every CPU",
+    )
+    args = parser.parse_args()
+    if args.persist_expansion:
+        mdbt.persist_expansion_cache()
+    main(use_cache=not args.no_cache, processes=args.jobs or None)